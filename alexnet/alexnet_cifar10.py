@@ -18,21 +18,30 @@ from tensorflow import keras
 from keras import Input, Sequential
 from keras.layers import Conv2D, Dense, Dropout, Flatten, MaxPool2D
 
-from typing import Type
+from typing import Optional, Type
 
 
 def AlexNet(lrn: Type = LocalResponseNormalization,
-            lrn_name: str = 'TF-NN-LRN') -> Sequential:
+            lrn_name: str = 'TF-NN-LRN',
+            precision: Optional[str] = None) -> Sequential:
+    """Constructs AlexNet for CIFAR-10 with the given LRN layer.
+
+    Args:
+      lrn: class of the local response normalization layers
+      lrn_name: name of the LRN variant, used in the model name
+      precision: dtype policy of all but the output layer, e.g.,
+        `'mixed_bfloat16'`; by default, the global policy is used
+    """
     return Sequential([
         Input(shape=(32, 32, 3)),
-        Conv2D(filters=64, kernel_size=5, strides=1, padding='same', activation='relu', name='Conv1'),
-        MaxPool2D(pool_size=3, strides=2, padding='valid', name='MaxPool1'),
-        lrn(name='LRN1'),
-        Conv2D(filters=64, kernel_size=(5, 5), padding='same', activation='relu', name='Conv2'),
-        lrn(name='LRN2'),
-        MaxPool2D(pool_size=3, strides=2, padding='valid', name='MaxPool2'),
-        Conv2D(filters=64, kernel_size=3, padding='same', activation='relu', name='Local3'),
-        Conv2D(filters=32, kernel_size=3, padding='same', activation='relu', name='Local4'),
-        Flatten(name='Flatten'),
-        Dense(10, activation='softmax', name='FC10'),
+        Conv2D(filters=64, kernel_size=5, strides=1, padding='same', activation='relu', name='Conv1', dtype=precision),
+        MaxPool2D(pool_size=3, strides=2, padding='valid', name='MaxPool1', dtype=precision),
+        lrn(name='LRN1', dtype=precision),
+        Conv2D(filters=64, kernel_size=(5, 5), padding='same', activation='relu', name='Conv2', dtype=precision),
+        lrn(name='LRN2', dtype=precision),
+        MaxPool2D(pool_size=3, strides=2, padding='valid', name='MaxPool2', dtype=precision),
+        Conv2D(filters=64, kernel_size=3, padding='same', activation='relu', name='Local3', dtype=precision),
+        Conv2D(filters=32, kernel_size=3, padding='same', activation='relu', name='Local4', dtype=precision),
+        Flatten(name='Flatten', dtype=precision),
+        Dense(10, activation='softmax', name='FC10', dtype='float32'),
     ], name=f'CIFAR-10-{lrn_name}')
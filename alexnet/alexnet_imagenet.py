@@ -14,28 +14,38 @@
 
 from local_response_normalization import LocalResponseNormalization
 
+from typing import Optional
+
 from tensorflow import keras
 from keras import Input, Sequential
 from keras.layers import Conv2D, Dense, Dropout, Flatten, MaxPool2D
 
 
-def AlexNet() -> Sequential:
+def AlexNet(precision: Optional[str] = None, lrn_implementation: str = 'tf') -> Sequential:
+    """Constructs AlexNet for ImageNet.
+
+    Args:
+      precision: dtype policy of all but the output layer, e.g.,
+        `'mixed_bfloat16'`; by default, the global policy is used
+      lrn_implementation: implementation of the LRN layers; see
+        `LocalResponseNormalization`
+    """
     return Sequential([
         Input(shape=(227, 227, 3)),
-        Conv2D(filters=96, kernel_size=(11, 11), strides=(4, 4), padding='valid', activation='relu', name='Conv1'),
-        LocalResponseNormalization(name='LRN1'),
-        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='valid', name='MaxPool1'),
-        Conv2D(filters=256, kernel_size=(5, 5), padding='same', activation='relu', name='Conv2'),
-        LocalResponseNormalization(name='LRN2'),
-        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='valid', name='MaxPool2'),
-        Conv2D(filters=384, kernel_size=(3, 3), padding='same', activation='relu', name='Conv3'),
-        Conv2D(filters=384, kernel_size=(3, 3), padding='same', activation='relu', name='Conv4'),
-        Conv2D(filters=256, kernel_size=(3, 3), padding='same', activation='relu', name='Conv5'),
-        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='valid', name='MaxPool3'),
-        Flatten(name='Flatten'),
-        Dense(4096, activation='relu', name='Dense1'),
-        Dropout(0.5, name='Dropout1'),
-        Dense(4096, activation='relu', name='Dense2'),
-        Dropout(0.5, name='Dropout2'),
-        Dense(1000, activation='softmax', name='Output'),
+        Conv2D(filters=96, kernel_size=(11, 11), strides=(4, 4), padding='valid', activation='relu', name='Conv1', dtype=precision),
+        LocalResponseNormalization(implementation=lrn_implementation, name='LRN1', dtype=precision),
+        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='valid', name='MaxPool1', dtype=precision),
+        Conv2D(filters=256, kernel_size=(5, 5), padding='same', activation='relu', name='Conv2', dtype=precision),
+        LocalResponseNormalization(implementation=lrn_implementation, name='LRN2', dtype=precision),
+        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='valid', name='MaxPool2', dtype=precision),
+        Conv2D(filters=384, kernel_size=(3, 3), padding='same', activation='relu', name='Conv3', dtype=precision),
+        Conv2D(filters=384, kernel_size=(3, 3), padding='same', activation='relu', name='Conv4', dtype=precision),
+        Conv2D(filters=256, kernel_size=(3, 3), padding='same', activation='relu', name='Conv5', dtype=precision),
+        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='valid', name='MaxPool3', dtype=precision),
+        Flatten(name='Flatten', dtype=precision),
+        Dense(4096, activation='relu', name='Dense1', dtype=precision),
+        Dropout(0.5, name='Dropout1', dtype=precision),
+        Dense(4096, activation='relu', name='Dense2', dtype=precision),
+        Dropout(0.5, name='Dropout2', dtype=precision),
+        Dense(1000, activation='softmax', name='Output', dtype='float32'),
     ], name='AlexNet')
@@ -0,0 +1,46 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import alexnet_cifar10
+import alexnet_imagenet
+
+import tensorflow as tf
+from tensorflow import keras
+import unittest
+
+
+class AlexNetTest(unittest.TestCase):
+
+    def assertMixedPrecision(self, make_model, input_shape):
+        policy = keras.mixed_precision.global_policy().name
+        model = make_model(precision='mixed_bfloat16')
+        self.assertEqual(keras.mixed_precision.global_policy().name, policy)
+
+        for layer in model.layers[:-1]:
+            self.assertEqual(layer.compute_dtype, 'bfloat16', layer.name)
+        for variable in model.weights:
+            self.assertEqual(variable.dtype, tf.float32, variable.name)
+        self.assertEqual(model(tf.zeros((1,) + input_shape)).dtype, tf.float32)
+
+    def testCifar10MixedPrecision(self):
+        self.assertMixedPrecision(alexnet_cifar10.AlexNet, (32, 32, 3))
+
+    def testImageNetMixedPrecision(self):
+        self.assertMixedPrecision(alexnet_imagenet.AlexNet, (227, 227, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
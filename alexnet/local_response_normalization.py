@@ -12,26 +12,186 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import numpy as np
 import tensorflow as tf
 from keras.layers import Layer
 
+# Ways of computing the normalization; see `LocalResponseNormalization`.
+IMPLEMENTATION_TF = 'tf'
+IMPLEMENTATION_CUMSUM = 'cumsum'
+IMPLEMENTATION_CONV = 'conv'
+
 
 class LocalResponseNormalization(Layer):
+    """Local response normalization across channels, as in AlexNet.
+
+    Computes the same function as `tf.nn.local_response_normalization()`:
+
+        sqr_sum[..., d] = sum(input[..., d - n : d + n + 1] ** 2)
+        output = input / (k + alpha * sqr_sum) ** beta
+
+    i.e., `n` is the depth radius, and the window spans `2 * n + 1` channels.
+
+    Args:
+      implementation: how the windowed sum of squares is computed:
+        * `'tf'`: via `tf.nn.local_response_normalization()` itself;
+        * `'cumsum'`: as the difference of two entries of a prefix sum
+          along the channels, with a cost independent of `n`;
+        * `'conv'`: as a 1x1 convolution (i.e., a matrix multiplication)
+          with a fixed banded kernel, whose cost is independent of `n` as
+          well, but quadratic in the number of channels.
+      data_format: either `'channels_last'` or `'channels_first'`; only the
+        former is supported natively by `'tf'`, so with the latter, `'tf'`
+        transposes the input to channels-last and back.
+      recompute: if set, the gradient is computed by hand, from just the
+        input, recomputing the normalization in the backward pass;
+        otherwise, autodiff keeps several full-size intermediate tensors
+        (e.g., the squares, their sums and the scale) of each LRN layer
+        alive until the backward pass, which adds up in large batches.
+        This matters for `'cumsum'` and `'conv'`; the gradient of `'tf'` is
+        a native op which already only needs the input and output.
+    """
+
     bias: float
     depth_radius: int
     alpha: float
     beta: float
+    implementation: str
+    data_format: str
+    recompute: bool
 
-    def __init__(self, k=2, n=5, alpha=1e-4, beta=0.75, **kwargs):
+    def __init__(self, k=2, n=5, alpha=1e-4, beta=0.75,
+                 implementation=IMPLEMENTATION_TF, data_format='channels_last',
+                 recompute=False, **kwargs):
         super().__init__(**kwargs)
+        assert implementation in (IMPLEMENTATION_TF, IMPLEMENTATION_CUMSUM, IMPLEMENTATION_CONV), (
+            f"`implementation` must be one of 'tf', 'cumsum' or 'conv'; received: {implementation}")
+        assert data_format in ('channels_last', 'channels_first'), (
+            f"`data_format` must be either 'channels_last' or 'channels_first'; received: {data_format}")
         self.bias = k
         self.depth_radius = n
         self.alpha = alpha
         self.beta = beta
+        self.implementation = implementation
+        self.data_format = data_format
+        self.recompute = recompute
+
+    def build(self, input_shape):
+        if self.implementation == IMPLEMENTATION_CONV:
+            channels = input_shape[-1 if self.data_format == 'channels_last' else 1]
+            # band[i, j] == 1 iff channel i is within the window of channel j.
+            offsets = np.arange(channels)
+            self._band = tf.constant(
+                np.abs(offsets[:, np.newaxis] - offsets) <= self.depth_radius,
+                dtype=tf.float32)
 
     def call(self, input_):
+        # With mixed precision, normalize in float32 anyway: there's no
+        # bfloat16 kernel, and in float16, the sum of squares overflows once
+        # activations exceed ~115.
+        dtype = input_.dtype
+        if dtype in (tf.float16, tf.bfloat16):
+            input_ = tf.cast(input_, tf.float32)
+
+        if self.recompute:
+            output = self._lrn_with_recomputing_gradient(input_)
+        else:
+            output = self._lrn(input_)
+        return tf.cast(output, dtype)
+
+    def _lrn(self, input_):
+        if self.implementation == IMPLEMENTATION_TF:
+            return self._tf_lrn(input_)
+        return input_ * self._inverse_power(self._scale(input_))
+
+    def _lrn_with_recomputing_gradient(self, input_):
+        @tf.custom_gradient
+        def lrn(x):
+            def grad(upstream):
+                if self.implementation == IMPLEMENTATION_TF:
+                    return self._tf_lrn_grad(upstream, x)
+                # With y[i] = x[i] * scale[i] ** -beta, where scale[i] sums
+                # x[j] ** 2 over the window of i, and since j is in the window
+                # of i iff i is in the window of j:
+                #
+                #   dx[j] = dy[j] * scale[j] ** -beta - 2 * alpha * beta * x[j] *
+                #           sum(dy[i] * x[i] * scale[i] ** (-beta - 1))
+                #
+                # summing over the window of j.
+                scale = self._scale(x)
+                inverse_power = self._inverse_power(scale)
+                window_sum = self._window_sum(upstream * x * inverse_power / scale)
+                return (upstream * inverse_power -
+                        2 * self.alpha * self.beta * x * window_sum)
+
+            return self._lrn(x), grad
+
+        return lrn(input_)
+
+    def _tf_lrn(self, input_):
         # Interestingly enough, the documentation for this function:
         # https://www.tensorflow.org/api_docs/python/tf/nn/local_response_normalization
         # actually cites the AlexNet paper for the implementation.
-        return tf.nn.local_response_normalization(
+        if self.data_format == 'channels_first':
+            input_ = tf.transpose(input_, (0, 2, 3, 1))
+        output = tf.nn.local_response_normalization(
+            input_, self.depth_radius, self.bias, self.alpha, self.beta)
+        if self.data_format == 'channels_first':
+            output = tf.transpose(output, (0, 3, 1, 2))
+        return output
+
+    def _tf_lrn_grad(self, upstream, input_):
+        if self.data_format == 'channels_first':
+            upstream = tf.transpose(upstream, (0, 2, 3, 1))
+            input_ = tf.transpose(input_, (0, 2, 3, 1))
+        output = tf.nn.local_response_normalization(
             input_, self.depth_radius, self.bias, self.alpha, self.beta)
+        gradient = tf.raw_ops.LRNGrad(
+            input_grads=upstream, input_image=input_, output_image=output,
+            depth_radius=self.depth_radius, bias=self.bias, alpha=self.alpha,
+            beta=self.beta)
+        if self.data_format == 'channels_first':
+            gradient = tf.transpose(gradient, (0, 3, 1, 2))
+        return gradient
+
+    def _scale(self, input_):
+        """Returns `k + alpha * sqr_sum`, as in the class docstring."""
+        sqr_sum = self._window_sum(tf.square(input_))
+        if self.implementation == IMPLEMENTATION_CUMSUM:
+            # Rounding in the prefix sums may leave tiny negative sums.
+            sqr_sum = tf.maximum(sqr_sum, 0)
+        return self.bias + self.alpha * sqr_sum
+
+    def _inverse_power(self, scale):
+        """Returns `scale ** -beta`, avoiding the slow `pow()` where possible."""
+        # Like the `tf.nn` kernel, special-case the common values of `beta`,
+        # including AlexNet's 0.75, as square roots are much cheaper.
+        if self.beta == 0.75:
+            inverse_sqrt = tf.math.rsqrt(scale)
+            return inverse_sqrt * tf.sqrt(inverse_sqrt)
+        if self.beta == 0.5:
+            return tf.math.rsqrt(scale)
+        return scale ** -self.beta
+
+    def _window_sum(self, values):
+        """Returns the sum of `values` over the window of each channel."""
+        channels_last = self.data_format == 'channels_last'
+        if self.implementation == IMPLEMENTATION_CONV:
+            band = tf.cast(self._band, values.dtype)
+            if channels_last:
+                return tf.einsum('nhwc,cd->nhwd', values, band)
+            return tf.einsum('nchw,cd->ndhw', values, band)
+
+        # Pad the channels so that the prefix sum `sums` starts with a zero,
+        # and each window, including those at the edges, is
+        # `sums[d + 2 * n + 1] - sums[d]`.
+        r = self.depth_radius
+        window = 2 * r + 1
+        axis = -1 if channels_last else 1
+        paddings = [[0, 0]] * 4
+        paddings[axis] = [r + 1, r]
+        sums = tf.cumsum(tf.pad(values, paddings), axis=axis)
+        channels = tf.shape(values)[axis]
+        if channels_last:
+            return sums[..., window:] - sums[..., :channels]
+        return sums[:, window:] - sums[:, :channels]
@@ -0,0 +1,230 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the implementations of LRN on real model shapes; prints JSON.
+
+Times the forward pass, and the forward and backward pass, of each
+implementation of `LocalResponseNormalization`, as well as of an `n`-pass
+equivalent of the `LRN2D` layer ported from pylearn2, on the input shapes of
+the LRN layers of `alexnet_cifar10.AlexNet`, `alexnet_imagenet.AlexNet` and
+`GoogLeNet`, for each batch size and number of threads.
+
+Each measurement runs in a separate process, as TensorFlow's thread pools
+can't be resized once created. The peak RSS (resident set size) reported for
+it is above the RSS of that process before the measurement; on Linux, the peak
+is reset first, so that it isn't masked by a higher peak while loading
+TensorFlow, but elsewhere, it may be.
+
+Usage:
+
+    python local_response_normalization_benchmark.py [--batch-sizes 1,32] \\
+        [--threads 1,4] [--iterations N] [--output FILE]
+"""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+import tensorflow as tf
+
+import alexnet_cifar10
+import alexnet_imagenet
+from local_response_normalization import LocalResponseNormalization
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'googlenet', 'keras'))
+import googlenet  # noqa: E402
+
+# Constructor arguments of `LocalResponseNormalization` for each variant; the
+# `n`-pass variant doesn't use the layer.
+_IMPLEMENTATIONS: Dict[str, Dict[str, Any]] = {
+    'tf': {'implementation': 'tf'},
+    'cumsum': {'implementation': 'cumsum'},
+    'cumsum_recompute': {'implementation': 'cumsum', 'recompute': True},
+    'conv': {'implementation': 'conv'},
+    'conv_recompute': {'implementation': 'conv', 'recompute': True},
+    'n_pass': {},
+}
+
+
+def _lrn_shapes() -> List[Dict[str, Any]]:
+    """Returns the distinct input shapes of the LRN layers of each model."""
+    models: Dict[str, Callable[[], Any]] = {
+        'alexnet_cifar10': alexnet_cifar10.AlexNet,
+        'alexnet_imagenet': alexnet_imagenet.AlexNet,
+        'googlenet': googlenet.GoogLeNet,
+    }
+    shapes = []
+    for model_name, model_fn in models.items():
+        seen = set()
+        for layer in model_fn().layers:
+            if isinstance(layer, LocalResponseNormalization):
+                shape = tuple(layer.input_shape[1:])
+                if shape not in seen:
+                    seen.add(shape)
+                    shapes.append({'model': model_name, 'layer': layer.name,
+                                   'shape': shape})
+    return shapes
+
+
+def _n_pass_lrn(input_: tf.Tensor, depth_radius: int = 5, bias: float = 2,
+                alpha: float = 1e-4, beta: float = 0.75) -> tf.Tensor:
+    """Channels-last equivalent of pylearn2's `LRN2D`, with `tf.nn` semantics.
+
+    Like `LRN2D`, adds up the squares of the zero-padded input one shifted
+    slice at a time, i.e., in `2 * depth_radius + 1` passes.
+    """
+    channels = input_.shape[-1]
+    squares = tf.pad(tf.square(input_),
+                     [[0, 0], [0, 0], [0, 0], [depth_radius, depth_radius]])
+    scale = bias
+    for i in range(2 * depth_radius + 1):
+        scale += alpha * squares[..., i:i + channels]
+    return input_ / scale ** beta
+
+
+def _rss_mb(field: str) -> float:
+    """Returns a memory size from /proc/self/status in MB; falls back to the
+    peak RSS from `getrusage()` where that isn't available."""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # On Linux, `ru_maxrss` is in kilobytes; on macOS, in bytes.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def _reset_peak_rss() -> None:
+    """Resets the peak RSS of this process to its current RSS, if possible."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+    except OSError:
+        pass
+
+
+def _time(fn: Callable[[], Any], iterations: int) -> float:
+    """Returns the mean time of `fn()` in milliseconds, after a warm-up call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def _measure(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs the measurement described by `config`, in this process."""
+    # This must precede running any ops, which creates the thread pools.
+    tf.config.threading.set_intra_op_parallelism_threads(config['threads'])
+    tf.config.threading.set_inter_op_parallelism_threads(config['threads'])
+
+    baseline_rss_mb = _rss_mb('VmRSS')
+    _reset_peak_rss()
+    if config['implementation'] == 'n_pass':
+        lrn: Callable[[tf.Tensor], tf.Tensor] = _n_pass_lrn
+    else:
+        lrn = LocalResponseNormalization(**_IMPLEMENTATIONS[config['implementation']])
+    inputs = tf.nn.relu(tf.random.stateless_normal(
+        [config['batch_size']] + config['shape'], seed=(1, 2), stddev=30))
+
+    @tf.function
+    def forward() -> tf.Tensor:
+        return lrn(inputs)
+
+    @tf.function
+    def forward_backward() -> tf.Tensor:
+        with tf.GradientTape() as tape:
+            tape.watch(inputs)
+            loss = tf.reduce_sum(lrn(inputs))
+        return tape.gradient(loss, inputs)
+
+    forward_ms = _time(lambda: forward().numpy(), config['iterations'])
+    forward_backward_ms = _time(lambda: forward_backward().numpy(), config['iterations'])
+    return dict(config, forward_ms=forward_ms, forward_backward_ms=forward_backward_ms,
+                peak_rss_mb=_rss_mb('VmHWM') - baseline_rss_mb)
+
+
+def _parse_ints(value: str) -> List[int]:
+    return [int(item) for item in value.split(',')]
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-sizes', type=_parse_ints, default=[1, 32])
+    parser.add_argument('--threads', type=_parse_ints,
+                        default=sorted({1, os.cpu_count() or 1}))
+    parser.add_argument('--iterations', type=int, default=10)
+    parser.add_argument('--implementations', type=lambda value: value.split(','),
+                        default=list(_IMPLEMENTATIONS))
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    # Internal: run a single measurement, given as JSON, and print its result.
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.measure:
+        print(json.dumps(_measure(json.loads(args.measure))))
+        return
+
+    for implementation in args.implementations:
+        assert implementation in _IMPLEMENTATIONS, (
+            f'unknown implementation: {implementation}; expected one of: '
+            f'{", ".join(_IMPLEMENTATIONS)}')
+
+    results = []
+    for shape in _lrn_shapes():
+        for batch_size in args.batch_sizes:
+            for threads in args.threads:
+                for implementation in args.implementations:
+                    config = dict(shape, shape=list(shape['shape']), batch_size=batch_size,
+                                  threads=threads, implementation=implementation,
+                                  iterations=args.iterations)
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), '--measure',
+                         json.dumps(config)],
+                        check=True, stdout=subprocess.PIPE, text=True).stdout
+                    results.append(json.loads(output.splitlines()[-1]))
+
+    report = {
+        'python': platform.python_version(),
+        'tensorflow': tf.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
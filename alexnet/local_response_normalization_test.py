@@ -0,0 +1,118 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from local_response_normalization import LocalResponseNormalization
+
+import itertools
+
+import numpy as np
+import tensorflow as tf
+import unittest
+
+
+class LocalResponseNormalizationTest(unittest.TestCase):
+
+    def assertMatchesTfNn(self, shape, **kwargs):
+        # ReLU activations, as LRN follows in AlexNet, with some large enough
+        # for the normalization to matter.
+        inputs = tf.nn.relu(tf.random.stateless_normal(shape, seed=(1, 2), stddev=30))
+        expected = tf.nn.local_response_normalization(
+            inputs, depth_radius=kwargs.get('n', 5), bias=kwargs.get('k', 2),
+            alpha=kwargs.get('alpha', 1e-4), beta=kwargs.get('beta', 0.75))
+        for implementation, data_format in itertools.product(
+                ('tf', 'cumsum', 'conv'), ('channels_last', 'channels_first')):
+            with self.subTest(implementation=implementation, data_format=data_format, **kwargs):
+                lrn = LocalResponseNormalization(
+                    implementation=implementation, data_format=data_format, **kwargs)
+                if data_format == 'channels_last':
+                    actual = lrn(inputs)
+                else:
+                    actual = tf.transpose(lrn(tf.transpose(inputs, (0, 3, 1, 2))), (0, 2, 3, 1))
+                np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-6)
+
+    def testDefaults(self):
+        self.assertMatchesTfNn((2, 5, 4, 16))
+
+    def testWindowWiderThanChannels(self):
+        self.assertMatchesTfNn((2, 3, 3, 4), n=5)
+
+    def testParameters(self):
+        self.assertMatchesTfNn((2, 4, 4, 12), k=1, n=2, alpha=1e-3, beta=0.5)
+
+    def testNoWindow(self):
+        self.assertMatchesTfNn((1, 2, 2, 3), n=0)
+
+    def testMixedPrecision(self):
+        inputs = tf.random.stateless_uniform((2, 4, 4, 8), seed=(3, 4), maxval=200)
+        for implementation in ('tf', 'cumsum', 'conv'):
+            with self.subTest(implementation=implementation):
+                expected = LocalResponseNormalization(implementation=implementation)(inputs)
+                lrn = LocalResponseNormalization(implementation=implementation,
+                                                 dtype='mixed_float16')
+                actual = lrn(inputs)
+                self.assertEqual(actual.dtype, tf.float16)
+                np.testing.assert_allclose(tf.cast(actual, tf.float32), expected, rtol=1e-3)
+
+    def testGradients(self):
+        inputs = tf.random.stateless_normal((2, 3, 3, 10), seed=(5, 6), stddev=30)
+        gradients = []
+        for implementation in ('tf', 'cumsum', 'conv'):
+            with tf.GradientTape() as tape:
+                tape.watch(inputs)
+                outputs = LocalResponseNormalization(implementation=implementation, n=2)(inputs)
+                loss = tf.reduce_sum(outputs * outputs)
+            gradients.append(tape.gradient(loss, inputs))
+        for actual in gradients[1:]:
+            np.testing.assert_allclose(actual, gradients[0], rtol=1e-4, atol=1e-5)
+
+    def testRecomputedGradientMatchesAutodiff(self):
+        inputs = tf.nn.relu(tf.random.stateless_normal((2, 4, 3, 12), seed=(7, 8), stddev=30))
+        weights = tf.random.stateless_normal(inputs.shape, seed=(9, 10))
+        for implementation, data_format, beta in itertools.product(
+                ('tf', 'cumsum', 'conv'), ('channels_last', 'channels_first'), (0.75, 0.6)):
+            with self.subTest(implementation=implementation, data_format=data_format, beta=beta):
+                gradients = []
+                for recompute in (False, True):
+                    lrn = LocalResponseNormalization(
+                        n=2, beta=beta, implementation=implementation,
+                        data_format=data_format, recompute=recompute)
+                    with tf.GradientTape() as tape:
+                        tape.watch(inputs)
+                        loss = tf.reduce_sum(lrn(inputs) * weights)
+                    gradients.append(tape.gradient(loss, inputs))
+                np.testing.assert_allclose(gradients[1], gradients[0], rtol=1e-4, atol=1e-6)
+
+    def testRecomputedGradientInGraph(self):
+        inputs = tf.random.stateless_normal((2, 3, 3, 8), seed=(11, 12), stddev=30)
+        expected = None
+        for recompute in (False, True):
+            lrn = LocalResponseNormalization(implementation='conv', recompute=recompute)
+
+            @tf.function
+            def gradient(x):
+                with tf.GradientTape() as tape:
+                    tape.watch(x)
+                    loss = tf.reduce_sum(tf.square(lrn(x)))
+                return tape.gradient(loss, x)
+
+            if expected is None:
+                expected = gradient(inputs)
+            else:
+                np.testing.assert_allclose(gradient(inputs), expected, rtol=1e-4, atol=1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
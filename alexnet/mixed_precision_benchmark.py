@@ -0,0 +1,122 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks AlexNet training throughput per dtype policy; prints JSON results.
+
+Measures the number of CIFAR-10-sized images per second of training steps of
+`alexnet_cifar10.AlexNet`, in float32, and with the `mixed_bfloat16` and
+`mixed_float16` policies, on whatever device TensorFlow picks by default (e.g.,
+CPU). Mixed bfloat16 is expected to pay off only on CPUs with native bfloat16
+support, e.g., AVX512-BF16 or AMX, which are reported along with the results.
+
+Mixed float16 is only measured if requested via `--precision mixed_float16`:
+it's meant for GPUs, and on CPUs, TensorFlow lacks fast float16 kernels for
+most ops, so it can be orders of magnitude slower than float32.
+
+Usage:
+
+    python mixed_precision_benchmark.py [--batch-size B] [--iterations N]
+"""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import tensorflow as tf
+
+from alexnet_cifar10 import AlexNet
+
+_PRECISIONS = ('float32', 'mixed_bfloat16', 'mixed_float16')
+_DEFAULT_PRECISIONS = ('float32', 'mixed_bfloat16')
+
+# CPU flags (as listed in /proc/cpuinfo on Linux) for native 16-bit arithmetic.
+_CPU_FLAGS = ('avx512_bf16', 'avx512_fp16', 'amx_bf16', 'amx_tile', 'f16c')
+
+
+def _cpu_flags() -> Optional[List[str]]:
+    """Returns which of `_CPU_FLAGS` the CPU supports, or `None` if unknown."""
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                if line.startswith('flags'):
+                    flags = set(line.split(':', 1)[1].split())
+                    return [flag for flag in _CPU_FLAGS if flag in flags]
+    except OSError:
+        pass
+    return None
+
+
+def _benchmark(precision: str, batch_size: int, iterations: int) -> Dict[str, Any]:
+    model = AlexNet(precision=precision)
+    model.compile(optimizer='sgd', loss='categorical_crossentropy')
+    rng = np.random.default_rng(0)
+    x = tf.constant(rng.random((batch_size, 32, 32, 3), dtype=np.float32))
+    y = tf.one_hot(rng.integers(0, 10, size=batch_size), 10)
+
+    # Trace the training step before timing.
+    model.train_on_batch(x, y)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        # Returns the loss as a Python number, so each step completes in turn.
+        model.train_on_batch(x, y)
+    seconds = time.perf_counter() - start
+
+    return {
+        'precision': precision,
+        'batch_size': batch_size,
+        'step_ms': seconds / iterations * 1000,
+        'images_per_second': batch_size * iterations / seconds,
+    }
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=128)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--precision', action='append', choices=_PRECISIONS,
+                        help='policy to benchmark (repeatable); default: %s' %
+                        ', '.join(_DEFAULT_PRECISIONS))
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = [_benchmark(precision, args.batch_size, args.iterations)
+               for precision in args.precision or _DEFAULT_PRECISIONS]
+
+    report = {
+        'python': platform.python_version(),
+        'tensorflow': tf.__version__,
+        'platform': platform.platform(),
+        'cpu_flags': _cpu_flags(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
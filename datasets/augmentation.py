@@ -0,0 +1,116 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Random image augmentation, applied to an entire batch at a time."""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+def random_crop_and_flip(x: np.ndarray, rng: np.random.Generator,
+                         padding: int = 4, flip: bool = True) -> np.ndarray:
+    """Returns a random crop of each image in `x`, flipped horizontally at random.
+
+    `x` is a batch of images of shape `(batch_size, height, width, ...)`. Each
+    image is cropped to its original size from a copy zero-padded by `padding`
+    pixels on each side, and if `flip` is set, mirrored with probability 1/2.
+
+    The whole batch is transformed with a single gather, rather than image by
+    image: crop offsets and flips only determine which source pixel each output
+    pixel comes from.
+    """
+    assert padding >= 0, f'padding must be >= 0; received: {padding}'
+    batch_size, height, width = x.shape[:3]
+    offsets = rng.integers(-padding, padding + 1, size=(2, batch_size))
+    rows = offsets[0][:, np.newaxis] + np.arange(height)
+    cols = offsets[1][:, np.newaxis] + np.arange(width)
+    if flip:
+        flipped = rng.random(batch_size) < 0.5
+        cols[flipped] = cols[flipped, ::-1]
+
+    # Gather whole pixels by their index into the flattened batch, which is
+    # much faster than indexing the height and width axes separately.
+    pixels = ((np.arange(batch_size)[:, np.newaxis, np.newaxis] * height +
+               np.clip(rows, 0, height - 1)[:, :, np.newaxis]) * width +
+              np.clip(cols, 0, width - 1)[:, np.newaxis, :])
+    augmented = np.take(x.reshape((batch_size * height * width, -1)),
+                        pixels.reshape(-1), axis=0, mode='clip').reshape(x.shape)
+    if padding > 0:
+        # Pixels taken from the padding were clipped to the nearest edge above;
+        # zero them out a whole row or column at a time.
+        images, padded_rows = np.nonzero((rows < 0) | (rows >= height))
+        augmented[images, padded_rows] = 0
+        images, padded_cols = np.nonzero((cols < 0) | (cols >= width))
+        augmented[images, :, padded_cols] = 0
+    return augmented
+
+
+class AugmentingSequence:
+    """Wraps a sequence of `(x, y)` batches to randomly crop and flip each `x`.
+
+    See `random_crop_and_flip()` for the details of the augmentation.
+
+    Random numbers for each batch come from a generator seeded by `seed`, the
+    epoch and the batch index, so augmentation is reproducible, and doesn't
+    depend on which thread computes which batch. To overlap augmentation with
+    training, wrap this sequence in a `PrefetchingSequence`, which computes
+    batches (and so, augments them) on its worker threads.
+
+    Note that padding is filled with zeros, i.e., black for raw pixels, or the
+    mean for standardized ones.
+    """
+
+    sequence: Any
+    padding: int
+    flip: bool
+    seed: int
+    epoch: int
+
+    def __init__(self, sequence: Any, padding: int = 4, flip: bool = True,
+                 seed: Optional[int] = None):
+        self.sequence = sequence
+        self.padding = padding
+        self.flip = flip
+        self.seed = seed if seed is not None else int(np.random.SeedSequence().generate_state(1)[0])
+        self.epoch = 0
+
+    def __len__(self) -> int:
+        return len(self.sequence)
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, Any]:
+        x, y = self.sequence[index]
+        rng = np.random.default_rng([self.seed, self.epoch, index])
+        return random_crop_and_flip(x, rng, padding=self.padding, flip=self.flip), y
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        on_epoch_end = getattr(self.sequence, 'on_epoch_end', None)
+        if on_epoch_end is not None:
+            on_epoch_end()
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {'seed': self.seed, 'epoch': self.epoch,
+                'sequence': self.sequence.state_dict()}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        self.seed = state['seed']
+        self.epoch = state['epoch']
+        self.sequence.load_state_dict(state['sequence'])
@@ -0,0 +1,89 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from augmentation import AugmentingSequence, random_crop_and_flip
+from numpy_data_sequence import NumpyBatchSequence, NumpyDataSequence
+from prefetch_sequence import PrefetchingSequence
+
+import numpy as np
+import unittest
+
+
+def crop_and_flip_image(image, row_offset, col_offset, padding, flipped):
+    height, width = image.shape[:2]
+    padded = np.pad(image, [(padding, padding), (padding, padding)] +
+                    [(0, 0)] * (image.ndim - 2))
+    crop = padded[padding + row_offset:padding + row_offset + height,
+                  padding + col_offset:padding + col_offset + width]
+    return crop[:, ::-1] if flipped else crop
+
+
+class RandomCropAndFlipTest(unittest.TestCase):
+
+    def testMatchesPerImageCropAndFlip(self):
+        x = np.random.default_rng(1).integers(1, 256, size=(64, 8, 6, 3), dtype=np.uint8)
+        augmented = random_crop_and_flip(x, np.random.default_rng(2), padding=3)
+        self.assertEqual(augmented.shape, x.shape)
+        self.assertEqual(augmented.dtype, x.dtype)
+
+        # Recover each image's transformation by brute force: every image has
+        # exactly one match, as the pixels are nonzero and random.
+        for image, result in zip(x, augmented):
+            matches = [(row_offset, col_offset, flipped)
+                       for row_offset in range(-3, 4)
+                       for col_offset in range(-3, 4)
+                       for flipped in (False, True)
+                       if np.array_equal(
+                           crop_and_flip_image(image, row_offset, col_offset, 3, flipped),
+                           result)]
+            self.assertEqual(len(matches), 1)
+
+    def testNoPaddingNoFlipIsIdentity(self):
+        x = np.arange(4 * 5 * 5, dtype=np.float32).reshape((4, 5, 5))
+        augmented = random_crop_and_flip(x, np.random.default_rng(), padding=0, flip=False)
+        np.testing.assert_array_equal(augmented, x)
+
+
+class AugmentingSequenceTest(unittest.TestCase):
+
+    def testReproducibleAcrossPrefetchWorkers(self):
+        x = np.random.default_rng(0).integers(0, 256, size=(100, 8, 8, 3), dtype=np.uint8)
+        y = np.arange(100)
+
+        def epochs(num_workers):
+            sequence = NumpyDataSequence(num_items=100, batch_size=16, seed=5)
+            augmented = AugmentingSequence(
+                NumpyBatchSequence(sequence, x, y, num_buffers=8), seed=7)
+            with PrefetchingSequence(augmented, num_workers=num_workers) as prefetched:
+                result = []
+                for _ in range(2):
+                    # Labels are views into the ring buffers, so keep copies.
+                    result.append([(x_batch, y_batch.copy()) for x_batch, y_batch in
+                                   (prefetched[index] for index in range(len(prefetched)))])
+                    prefetched.on_epoch_end()
+            return result
+
+        single, multiple = epochs(num_workers=1), epochs(num_workers=3)
+        for epoch_single, epoch_multiple in zip(single, multiple):
+            for (x_single, y_single), (x_multiple, y_multiple) in zip(epoch_single, epoch_multiple):
+                np.testing.assert_array_equal(x_single, x_multiple)
+                np.testing.assert_array_equal(y_single, y_multiple)
+        # Each epoch is augmented differently.
+        self.assertFalse(np.array_equal(single[0][0][0], single[1][0][0]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Helpers shared by the readers of the datasets' original file formats."""
+
+from typing import BinaryIO
+
+
+def readinto_exactly(binary_file: BinaryIO, view: memoryview) -> int:
+    """Fills `view` from `binary_file`, without an intermediate copy.
+
+    A single `readinto()` may return fewer bytes than requested (e.g., from a
+    gzip file), so this reads until `view` is full or the file ends. Returns
+    the number of bytes read, which is less than `len(view)` only if the file
+    ended first.
+    """
+    filled = 0
+    while filled < len(view):
+        count = binary_file.readinto(view[filled:])  # type: ignore[attr-defined]
+        if not count:
+            break
+        filled += count
+    return filled
@@ -0,0 +1,97 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Reader for the binary version of the CIFAR-10 dataset.
+
+See https://www.cs.toronto.edu/~kriz/cifar.html for the format description:
+each batch file is a sequence of records, each consisting of a 1-byte label
+followed by a 32x32 image as 3 planes (red, green, blue) of 1024 bytes each.
+"""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import os
+from typing import Iterator, List
+
+import numpy as np
+
+# Shared with the other readers.
+from binary_io import readinto_exactly
+
+# Layout of a single record in a batch file.
+RECORD_DTYPE = np.dtype([('label', 'u1'), ('image', 'u1', (3, 32, 32))])
+
+# Names of the batch files in the CIFAR-10 binary distribution.
+TRAIN_BATCHES = [f'data_batch_{i}.bin' for i in range(1, 6)]
+TEST_BATCHES = ['test_batch.bin']
+
+
+class Cifar10FormatError(ValueError):
+    pass
+
+
+def _from_records(buffer: bytearray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns `(images, labels)` as views of `buffer`, like Keras does.
+
+    Images have shape `(N, 32, 32, 3)` (i.e., channels last) and labels have
+    shape `(N, 1)`, matching `keras.datasets.cifar10.load_data()`; both are
+    strided views into the records, so no data is copied.
+    """
+    records = np.frombuffer(buffer, dtype=RECORD_DTYPE)
+    return (records['image'].transpose((0, 2, 3, 1)),
+            records['label'].reshape((-1, 1)))
+
+
+def read_batches(paths: List[str]) -> tuple[np.ndarray, np.ndarray]:
+    """Reads batch files into a single buffer; returns `(images, labels)`."""
+    sizes = [os.path.getsize(path) for path in paths]
+    for path, size in zip(paths, sizes):
+        if size % RECORD_DTYPE.itemsize:
+            raise Cifar10FormatError(
+                f'{path}: size {size} is not a multiple of the record size '
+                f'{RECORD_DTYPE.itemsize}')
+
+    buffer = bytearray(sum(sizes))
+    view = memoryview(buffer)
+    offset = 0
+    for path, size in zip(paths, sizes):
+        with open(path, 'rb') as batch_file:
+            if readinto_exactly(batch_file, view[offset:offset + size]) < size:
+                raise Cifar10FormatError(f'{path}: file truncated')
+        offset += size
+    return _from_records(buffer)
+
+
+def iter_batch(path: str, chunk_size: int) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """Yields `(images, labels)` from a batch file, `chunk_size` records at a time."""
+    with open(path, 'rb') as batch_file:
+        while True:
+            buffer = bytearray(batch_file.read(chunk_size * RECORD_DTYPE.itemsize))
+            if not buffer:
+                return
+            if len(buffer) % RECORD_DTYPE.itemsize:
+                raise Cifar10FormatError(f'{path}: file truncated')
+            yield _from_records(buffer)
+
+
+def load_data(data_dir: str) -> tuple[tuple[np.ndarray, np.ndarray],
+                                      tuple[np.ndarray, np.ndarray]]:
+    """Loads CIFAR-10 from batch files, like `keras.datasets.cifar10.load_data()`."""
+    train = read_batches([os.path.join(data_dir, name) for name in TRAIN_BATCHES])
+    test = read_batches([os.path.join(data_dir, name) for name in TEST_BATCHES])
+    return train, test
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+# Provides `binary_io`, as imported by `cifar10_binary`.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import cifar10_binary  # noqa: E402
+
+import tempfile
+import unittest
+
+import numpy as np
+
+
+def write_batch(path, images, labels):
+    """Writes images of shape (N, 32, 32, 3) in the CIFAR-10 binary format."""
+    records = np.empty(len(images), dtype=cifar10_binary.RECORD_DTYPE)
+    records['label'] = labels
+    records['image'] = images.transpose((0, 3, 1, 2))
+    with open(path, 'wb') as batch_file:
+        batch_file.write(records.tobytes())
+
+
+class Cifar10BinaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.images = rng.integers(0, 256, size=(12, 32, 32, 3), dtype=np.uint8)
+        self.labels = rng.integers(0, 10, size=(12,), dtype=np.uint8)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def testLoadData(self):
+        for i, name in enumerate(cifar10_binary.TRAIN_BATCHES):
+            write_batch(self._path(name), self.images[2 * i:2 * i + 2],
+                        self.labels[2 * i:2 * i + 2])
+        write_batch(self._path(cifar10_binary.TEST_BATCHES[0]),
+                    self.images[10:], self.labels[10:])
+
+        (x_train, y_train), (x_test, y_test) = cifar10_binary.load_data(self.temp_dir.name)
+        self.assertEqual(x_train.shape, (10, 32, 32, 3))
+        self.assertEqual(y_train.shape, (10, 1))
+        np.testing.assert_array_equal(x_train, self.images[:10])
+        np.testing.assert_array_equal(y_train[:, 0], self.labels[:10])
+        np.testing.assert_array_equal(x_test, self.images[10:])
+        np.testing.assert_array_equal(y_test[:, 0], self.labels[10:])
+
+    def testIterBatch(self):
+        write_batch(self._path('batch.bin'), self.images, self.labels)
+        chunks = list(cifar10_binary.iter_batch(self._path('batch.bin'), chunk_size=5))
+        self.assertEqual([len(images) for images, _ in chunks], [5, 5, 2])
+        np.testing.assert_array_equal(
+            np.concatenate([images for images, _ in chunks]), self.images)
+        np.testing.assert_array_equal(
+            np.concatenate([labels for _, labels in chunks])[:, 0], self.labels)
+
+    def testTruncatedFile(self):
+        write_batch(self._path('batch.bin'), self.images, self.labels)
+        with open(self._path('batch.bin'), 'r+b') as batch_file:
+            batch_file.truncate(5000)
+        with self.assertRaises(cifar10_binary.Cifar10FormatError):
+            cifar10_binary.read_batches([self._path('batch.bin')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,9 +20,11 @@
 # (added in PEP 563) for Python 3.7 and higher.
 from __future__ import annotations
 
+import abc
+import array
 import math
 import random
-from typing import Any, Callable, List, Optional, Sequence, Tuple
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union, overload
 
 
 # No type annotations for these type aliases, as `TypeAlias` only became
@@ -32,7 +34,25 @@ from typing import Any, Callable, List, Optional, Sequence, Tuple
 # int params, so we don't need to express a more complex type alias.
 _Range = Callable[[int, int], Sequence[int]]
 
-_Shuffle = Callable[[List[Any]], None]
+# Shuffles indexes in place; see `Strategy.indexes()` for the types of indexes.
+_Shuffle = Callable[[Any], None]
+
+# Given a seed, returns a shuffle function which is deterministic for that seed.
+_SeededShuffle = Callable[[int], _Shuffle]
+
+
+def _seeded_random_shuffle(seed: int) -> _Shuffle:
+    return random.Random(seed).shuffle
+
+
+def epoch_seed(seed: int, epoch: int) -> int:
+    """Derives the seed used to shuffle the items in the given epoch.
+
+    The result is a 32-bit int, as some random number generators (e.g.,
+    `numpy.random.RandomState`) do not accept larger seeds; it is the same
+    across processes, machines and Python versions.
+    """
+    return random.Random(f'{seed}:{epoch}').getrandbits(32)
 
 
 class Strategy:
@@ -40,10 +60,227 @@ class Strategy:
 
     range: _Range
     shuffle: _Shuffle
+    seeded_shuffle: _SeededShuffle
+    rng: random.Random
 
-    def __init__(self, range_fn: _Range = range, shuffle_fn: _Shuffle = random.shuffle):
+    def __init__(self, range_fn: _Range = range, shuffle_fn: Optional[_Shuffle] = None,
+                 seeded_shuffle_fn: _SeededShuffle = _seeded_random_shuffle,
+                 rng: Optional[random.Random] = None):
+        # A private generator, rather than the global one of the `random`
+        # module, so that saving and restoring its state affects nothing else.
+        self.rng = rng or random.Random()
         self.range = range_fn
-        self.shuffle = shuffle_fn
+        self.shuffle = shuffle_fn or self.rng.shuffle
+        self.seeded_shuffle = seeded_shuffle_fn
+
+    def indexes(self, num_items: int) -> Sequence[int]:
+        """Returns the identity permutation of `num_items` items, to be shuffled."""
+        return list(self.range(0, num_items))
+
+    def save_indexes(self, indexes: Sequence[int]) -> Any:
+        """Returns a copy of `indexes` to be saved; see `load_indexes()`."""
+        return list(indexes)
+
+    def load_indexes(self, num_items: int, saved: Any) -> Sequence[int]:
+        """Restores indexes previously returned by `save_indexes()`."""
+        return list(saved)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the state of `rng`, which the default `shuffle` uses.
+
+        A custom `shuffle` which uses another generator must override this and
+        `load_state_dict()` to resume with the same shuffles.
+        """
+        return {'rng_state': self.rng.getstate()}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restores the state previously returned by `state_dict()`."""
+        self.rng.setstate(state['rng_state'])
+
+
+class CompactStrategy(Strategy):
+    """Stores indexes in a typed array, rather than in a list.
+
+    A list holds a pointer to a separate int object for each item, taking about
+    36 bytes per item; an `array.array` of unsigned 32-bit ints takes 4 bytes
+    per item, or 8 bytes if there are more than 2**32 items. Shuffling still
+    takes O(n) time per epoch; see `FeistelStrategy` to avoid that.
+    """
+
+    def indexes(self, num_items: int) -> Sequence[int]:
+        typecode = 'I' if num_items <= 2**32 else 'Q'
+        return array.array(typecode, self.range(0, num_items))
+
+    def save_indexes(self, indexes: Sequence[int]) -> Any:
+        assert isinstance(indexes, array.array)
+        return (indexes.typecode, indexes.tobytes())
+
+    def load_indexes(self, num_items: int, saved: Any) -> Sequence[int]:
+        typecode, data = saved
+        indexes = array.array(typecode)
+        indexes.frombytes(data)
+        return indexes
+
+
+def _mix64(x: int) -> int:
+    """Scrambles the bits of a 64-bit int (SplitMix64 finalizer)."""
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+    return x ^ (x >> 31)
+
+
+class FeistelPermutation(Sequence[int]):
+    """Pseudo-random permutation of `range(num_items)`, computed on demand.
+
+    Each position is mapped to an item by a keyed Feistel network over the
+    smallest space of `2**(2 * half_bits)` ints which covers all items; as a
+    Feistel network is a bijection for any round function, so is the mapping.
+    Results outside of `range(num_items)` are mapped again ("cycle walking"),
+    which takes fewer than 4 rounds on average, as the space is less than 4
+    times as large as the number of items.
+
+    Thus, computing each position takes O(1) time, and the permutation takes
+    O(1) memory regardless of the number of items. Setting `key` to `None`
+    gives the identity permutation; setting it to an int selects a new
+    permutation, which is what shuffling does.
+    """
+
+    num_items: int
+
+    _ROUNDS = 4
+
+    def __init__(self, num_items: int, key: Optional[int] = None):
+        self.num_items = num_items
+        self._half_bits = max(1, ((num_items - 1).bit_length() + 1) // 2)
+        self._half_mask = (1 << self._half_bits) - 1
+        self.key = key
+
+    @property
+    def key(self) -> Optional[int]:
+        return self._key
+
+    @key.setter
+    def key(self, key: Optional[int]) -> None:
+        self._key = key
+        self._round_keys = [] if key is None else [
+            _mix64(key + r * 0x9E3779B97F4A7C15) for r in range(self._ROUNDS)]
+
+    def __len__(self) -> int:
+        return self.num_items
+
+    @overload
+    def __getitem__(self, index: int) -> int: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> list[int]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[int, list[int]]:
+        if isinstance(index, slice):
+            return [self._permute(i) for i in range(*index.indices(self.num_items))]
+        if index < 0:
+            index += self.num_items
+        if not 0 <= index < self.num_items:
+            raise IndexError(f'index {index} out of range for {self.num_items} items')
+        return self._permute(index)
+
+    def _permute(self, index: int) -> int:
+        if self._key is None:
+            return index
+        half_bits, half_mask = self._half_bits, self._half_mask
+        item = index
+        while True:
+            left, right = item >> half_bits, item & half_mask
+            for round_key in self._round_keys:
+                left, right = right, left ^ (_mix64(right ^ round_key) & half_mask)
+            item = (left << half_bits) | right
+            if item < self.num_items:
+                return item
+
+
+class FeistelStrategy(Strategy):
+    """Never materializes the permutation of indexes; see `FeistelPermutation`.
+
+    Shuffling just picks a new key for the permutation, so it takes O(1) time,
+    rather than O(n) time.
+    """
+
+    def __init__(self, rng: Optional[random.Random] = None):
+        def seeded_shuffle(seed: int) -> _Shuffle:
+            def shuffle_with_seed(permutation: FeistelPermutation) -> None:
+                permutation.key = random.Random(seed).getrandbits(64)
+            return shuffle_with_seed
+
+        super().__init__(shuffle_fn=self._shuffle, seeded_shuffle_fn=seeded_shuffle, rng=rng)
+
+    def _shuffle(self, permutation: FeistelPermutation) -> None:
+        permutation.key = self.rng.getrandbits(64)
+
+    def indexes(self, num_items: int) -> Sequence[int]:
+        return FeistelPermutation(num_items)
+
+    def save_indexes(self, indexes: Sequence[int]) -> Any:
+        # The key is all we need to regenerate the permutation.
+        assert isinstance(indexes, FeistelPermutation)
+        return indexes.key
+
+    def load_indexes(self, num_items: int, saved: Any) -> Sequence[int]:
+        return FeistelPermutation(num_items, key=saved)
+
+
+class BlockShuffleStrategy(Strategy):
+    """Shuffles the order of contiguous blocks, then items within windows.
+
+    A full random permutation makes every batch read items scattered across the
+    entire dataset, which is slow if the data is memory-mapped or otherwise
+    read from disk. Instead, this strategy splits the indexes into contiguous
+    blocks of `block_size` items, shuffles the order of the blocks, and then
+    shuffles the items within each consecutive window of `window_size` items.
+
+    Thus, each window (and hence each batch within it) only reads from about
+    `window_size / block_size` contiguous regions of the data; larger windows
+    and smaller blocks give more randomness, at the cost of less locality.
+    """
+
+    block_size: int
+    window_size: int
+
+    def __init__(self, block_size: int, window_size: int,
+                 rng: Optional[random.Random] = None):
+        assert block_size >= 1, f'block_size must be >= 1; received: {block_size}'
+        assert window_size >= 1, f'window_size must be >= 1; received: {window_size}'
+        self.block_size = block_size
+        self.window_size = window_size
+
+        def seeded_shuffle(seed: int) -> _Shuffle:
+            rng = random.Random(seed)
+            return lambda indexes: self._block_shuffle(indexes, rng)
+
+        super().__init__(shuffle_fn=lambda indexes: self._block_shuffle(indexes, self.rng),
+                         seeded_shuffle_fn=seeded_shuffle, rng=rng)
+
+    def _block_shuffle(self, indexes: Any, rng: random.Random) -> None:
+        num_items = len(indexes)
+        blocks = [indexes[low:low + self.block_size]
+                  for low in range(0, num_items, self.block_size)]
+        rng.shuffle(blocks)
+        low = 0
+        for block in blocks:
+            indexes[low:low + len(block)] = block
+            low += len(block)
+
+        if self.window_size > 1:
+            for low in range(0, num_items, self.window_size):
+                window = indexes[low:low + self.window_size]
+                rng.shuffle(window)
+                indexes[low:low + self.window_size] = window
+
+
+def _check_state(sequence: Any, state: Dict[str, Any]) -> None:
+    for name in ('num_items', 'batch_size', 'seed',
+                 'total_num_items', 'rank', 'world_size', 'pad_remainder'):
+        if name in state and state[name] != getattr(sequence, name, None):
+            raise ValueError(f'cannot load state with {name} = {state[name]} into a '
+                             f'sequence with {name} = {getattr(sequence, name, None)}')
 
 
 class DataSequence:
@@ -51,44 +288,73 @@ class DataSequence:
 
     num_items: int
     batch_size: int
+    cursor: int
 
     def __init__(self, num_items: int, batch_size: int):
         self.num_items = num_items
         self.batch_size = batch_size
+        self.cursor = 0
 
     def __len__(self) -> int:
         return math.ceil(self.num_items / self.batch_size)
 
     def __getitem__(self, index: int) -> Tuple[int, int]:
+        self.cursor = index + 1
         low = self.batch_size * index
         # Cap upper bound at array length; the last batch may be smaller
         # if the total number of items is not a multiple of batch size.
         high = min(low + self.batch_size, self.num_items)
         return (low, high)
 
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the state needed to resume after the last batch requested.
+
+        A resumed run should continue by requesting batch `cursor`.
+        """
+        return {'num_items': self.num_items, 'batch_size': self.batch_size,
+                'cursor': self.cursor}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restores the state previously returned by `state_dict()`."""
+        _check_state(self, state)
+        self.cursor = state['cursor']
+
 
 class DataSequenceWithShuffling:
-    """Simple implementation of `keras.utils.Sequence` with optional shuffling."""
+    """Simple implementation of `keras.utils.Sequence` with optional shuffling.
+
+    By default, items are reshuffled in place at the end of every epoch. If a
+    `seed` is provided, each epoch's permutation is instead derived only from
+    the seed and the epoch number, so it is reproducible, and identical across
+    processes using the same seed.
+    """
 
     num_items: int
     batch_size: int
     should_shuffle: bool
     strategy: Strategy
-    indexes: list[int]
+    seed: Optional[int]
+    epoch: int
+    cursor: int
+    indexes: Sequence[int]
 
     def __init__(self, num_items: int, batch_size: int, shuffle: bool = True,
-                 strategy: Optional[Strategy] = None):
+                 strategy: Optional[Strategy] = None, seed: Optional[int] = None):
         self.num_items = num_items
         self.batch_size = batch_size
         self.should_shuffle = shuffle
         self.strategy = strategy or Strategy()
-        self.indexes = list(self.strategy.range(0, self.num_items))
-        self.on_epoch_end()
+        self.seed = seed
+        self.epoch = 0
+        self.cursor = 0
+        self.indexes = self.strategy.indexes(self.num_items)
+        self._prepare_epoch()
 
     def __len__(self) -> int:
         return math.ceil(self.num_items / self.batch_size)
 
-    def __getitem__(self, index: int) -> tuple[tuple[int, int], list[int]]:
+    def __getitem__(self, index: int) -> tuple[tuple[int, int], Sequence[int]]:
+        self.cursor = index + 1
         low = self.batch_size * index
         # Cap upper bound at array length; the last batch may be smaller
         # if the total number of items is not a multiple of batch size.
@@ -96,6 +362,266 @@ class DataSequenceWithShuffling:
         positions = self.indexes[low:high]
         return (low, high), positions
 
+    def _prepare_epoch(self) -> None:
+        """Updates `indexes` for the start of the current epoch."""
+        if not self.should_shuffle:
+            return
+        if self.seed is None:
+            self.strategy.shuffle(self.indexes)
+        else:
+            # Start over from the identity permutation, so that the result
+            # doesn't depend on the permutations of previous epochs.
+            self.indexes = self.strategy.indexes(self.num_items)
+            self.strategy.seeded_shuffle(epoch_seed(self.seed, self.epoch))(self.indexes)
+
     def on_epoch_end(self):
+        self.epoch += 1
+        self.cursor = 0
+        self._prepare_epoch()
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the state needed to resume after the last batch requested.
+
+        A resumed run should continue by requesting batch `cursor`. If the
+        permutation can be regenerated from the seed and epoch number, it is
+        not saved; otherwise, it is saved in the form chosen by the strategy.
+        """
+        state = {'num_items': self.num_items, 'batch_size': self.batch_size,
+                 'seed': self.seed, 'epoch': self.epoch, 'cursor': self.cursor,
+                 'strategy': self.strategy.state_dict()}
+        if self.should_shuffle and self.seed is None:
+            state['indexes'] = self.strategy.save_indexes(self.indexes)
+        return state
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restores the state previously returned by `state_dict()`."""
+        _check_state(self, state)
+        self.epoch = state['epoch']
+        self.cursor = state['cursor']
+        self.strategy.load_state_dict(state['strategy'])
+        if 'indexes' in state:
+            self.indexes = self.strategy.load_indexes(self.num_items, state['indexes'])
+        else:
+            self.indexes = self.strategy.indexes(self.num_items)
+            self._prepare_epoch()
+
+
+class ShardedDataSequence(DataSequenceWithShuffling):
+    """Splits each epoch's items between data-parallel workers.
+
+    All `world_size` workers derive the same permutation of all items in each
+    epoch from the shared `seed` and the epoch number; the worker with the
+    given `rank` then owns every `world_size`-th item of that permutation,
+    starting at `rank`, so the shards are disjoint.
+
+    Every shard has the same number of items (and hence the same number of
+    batches), so that steps which synchronize all workers can't deadlock. If
+    the total number of items isn't a multiple of `world_size`, the remaining
+    items are either dropped (by default), or if `pad_remainder` is set, the
+    shards are padded by reusing items from the start of the permutation.
+
+    Here, `num_items` refers to the number of items in this worker's shard;
+    the total number of items is `total_num_items`, and `indexes` holds the
+    permutation of all items, which is never copied for each shard, so it can
+    be used with any `Strategy`, including `FeistelStrategy`.
+    """
+
+    total_num_items: int
+    rank: int
+    world_size: int
+    pad_remainder: bool
+
+    def __init__(self, num_items: int, batch_size: int, rank: int, world_size: int,
+                 seed: int = 0, shuffle: bool = True, pad_remainder: bool = False,
+                 strategy: Optional[Strategy] = None):
+        assert 0 <= rank < world_size, (
+            f'rank must be in [0, {world_size}); received: {rank}')
+        self.total_num_items = num_items
+        self.rank = rank
+        self.world_size = world_size
+        self.pad_remainder = pad_remainder
+        if pad_remainder:
+            shard_size = math.ceil(num_items / world_size)
+        else:
+            shard_size = num_items // world_size
+        super().__init__(num_items=shard_size, batch_size=batch_size,
+                         shuffle=shuffle, strategy=strategy, seed=seed)
+
+    def _prepare_epoch(self) -> None:
+        self.indexes = self.strategy.indexes(self.total_num_items)
         if self.should_shuffle:
-            self.strategy.shuffle(self.indexes)
+            assert self.seed is not None
+            self.strategy.seeded_shuffle(epoch_seed(self.seed, self.epoch))(self.indexes)
+
+    def __getitem__(self, index: int) -> tuple[tuple[int, int], Sequence[int]]:
+        self.cursor = index + 1
+        low = self.batch_size * index
+        high = min(low + self.batch_size, self.num_items)
+        # Positions past the end of the permutation wrap around to its start,
+        # which pads the shards when `pad_remainder` is set.
+        positions = [self.indexes[(self.rank + i * self.world_size) % self.total_num_items]
+                     for i in range(low, high)]
+        return (low, high), positions
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the state needed to resume after the last batch requested.
+
+        Includes the shard's `rank`, `world_size` and `pad_remainder`, so that
+        one worker's state can't be loaded into another worker's sequence.
+        """
+        state = super().state_dict()
+        state.update(total_num_items=self.total_num_items, rank=self.rank,
+                     world_size=self.world_size, pad_remainder=self.pad_remainder)
+        return state
+
+
+class AliasTable:
+    """Samples integers in `[0, len(weights))`, proportionally to `weights`.
+
+    Uses Vose's variant of the alias method: after `O(n)` preprocessing, each
+    draw takes a single random number, one table lookup and one comparison,
+    regardless of the number or distribution of the weights. The tables are
+    stored as `array.array`s, as in `CompactStrategy`, so that tens of millions
+    of weights fit in a modest amount of memory.
+    """
+
+    def __init__(self, weights: Sequence[float]):
+        num_items = len(weights)
+        assert num_items > 0, 'weights must not be empty'
+        total = math.fsum(weights)
+        assert total > 0 and all(weight >= 0 for weight in weights), (
+            'weights must be non-negative, with a positive sum')
+        typecode = 'I' if num_items <= 2**32 else 'Q'
+        # `probability[i]` is the chance of keeping `i` once it's drawn
+        # uniformly; otherwise, `alias[i]` is returned instead.
+        self._probability = array.array('d', (weight * num_items / total for weight in weights))
+        self._alias = array.array(typecode, range(num_items))
+        small = array.array(typecode, (i for i, p in enumerate(self._probability) if p < 1.0))
+        large = array.array(typecode, (i for i, p in enumerate(self._probability) if p >= 1.0))
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self._alias[less] = more
+            self._probability[more] -= 1.0 - self._probability[less]
+            (small if self._probability[more] < 1.0 else large).append(more)
+        # Whatever remains is only off from 1.0 due to rounding errors.
+        for i in (*small, *large):
+            self._probability[i] = 1.0
+
+    def __len__(self) -> int:
+        return len(self._probability)
+
+    def sample(self, rng: random.Random) -> int:
+        scaled = rng.random() * len(self._probability)
+        index = int(scaled)
+        # The fractional part is itself uniform, and independent of `index`.
+        return index if scaled - index < self._probability[index] else self._alias[index]
+
+
+class _SamplingDataSequence(abc.ABC):
+    """Base class of sequences which draw the items of each batch at random.
+
+    Rather than permuting all items at the start of every epoch, the items of
+    each batch are drawn when the batch is requested, from a random number
+    generator seeded by `seed`, the epoch and the batch index, so every item
+    costs the same, regardless of the total number of items, and any batch can
+    be recomputed, e.g., when resuming mid-epoch.
+    """
+
+    num_items: int
+    batch_size: int
+    seed: int
+    epoch: int
+    cursor: int
+
+    def __init__(self, num_items: int, batch_size: int, seed: Optional[int]):
+        self.num_items = num_items
+        self.batch_size = batch_size
+        self.seed = seed if seed is not None else random.getrandbits(32)
+        self.epoch = 0
+        self.cursor = 0
+
+    def __len__(self) -> int:
+        return math.ceil(self.num_items / self.batch_size)
+
+    def __getitem__(self, index: int) -> tuple[tuple[int, int], Sequence[int]]:
+        self.cursor = index + 1
+        low = self.batch_size * index
+        high = min(low + self.batch_size, self.num_items)
+        rng = random.Random(f'{epoch_seed(self.seed, self.epoch)}:{index}')
+        return (low, high), self._sample(rng, high - low)
+
+    @abc.abstractmethod
+    def _sample(self, rng: random.Random, count: int) -> list[int]:
+        """Returns `count` positions drawn with `rng`."""
+
+    def on_epoch_end(self):
+        self.epoch += 1
+        self.cursor = 0
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the state needed to resume after the last batch requested."""
+        return {'num_items': self.num_items, 'batch_size': self.batch_size,
+                'seed': self.seed, 'epoch': self.epoch, 'cursor': self.cursor}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restores the state previously returned by `state_dict()`."""
+        _check_state(self, state)
+        self.epoch = state['epoch']
+        self.cursor = state['cursor']
+
+
+class WeightedDataSequence(_SamplingDataSequence):
+    """Draws each item with probability proportional to its weight.
+
+    Items are drawn with replacement, `num_items` per epoch (by default, as many
+    as there are weights), in `O(1)` time per item; see `AliasTable`.
+    """
+
+    def __init__(self, weights: Sequence[float], batch_size: int,
+                 num_items: Optional[int] = None, seed: Optional[int] = None):
+        self._table = AliasTable(weights)
+        super().__init__(num_items=len(weights) if num_items is None else num_items,
+                         batch_size=batch_size, seed=seed)
+
+    def _sample(self, rng: random.Random, count: int) -> list[int]:
+        return [self._table.sample(rng) for _ in range(count)]
+
+
+class ClassBalancedDataSequence(_SamplingDataSequence):
+    """Draws batches with an equal share of items from each class.
+
+    The positions of the items of each class are indexed once, up front; each
+    batch then takes `batch_size // num_classes` items of every class, and one
+    more item from each of the remaining `batch_size % num_classes` classes,
+    chosen at random. Within a class, items are drawn uniformly with
+    replacement, so rare classes are oversampled; `num_items` items are drawn
+    per epoch (by default, as many as there are labels).
+    """
+
+    def __init__(self, labels: Sequence[Any], batch_size: int,
+                 num_items: Optional[int] = None, seed: Optional[int] = None):
+        typecode = 'I' if len(labels) <= 2**32 else 'Q'
+        positions_by_class: Dict[Any, array.array] = {}
+        for position, label in enumerate(labels):
+            if label not in positions_by_class:
+                positions_by_class[label] = array.array(typecode)
+            positions_by_class[label].append(position)
+        assert positions_by_class, 'labels must not be empty'
+        self._class_positions = list(positions_by_class.values())
+        super().__init__(num_items=len(labels) if num_items is None else num_items,
+                         batch_size=batch_size, seed=seed)
+
+    @property
+    def num_classes(self) -> int:
+        return len(self._class_positions)
+
+    def _sample(self, rng: random.Random, count: int) -> list[int]:
+        classes = list(range(self.num_classes))
+        rng.shuffle(classes)
+        positions = []
+        for slot in range(count):
+            class_positions = self._class_positions[classes[slot % len(classes)]]
+            positions.append(class_positions[int(rng.random() * len(class_positions))])
+        # Otherwise, the classes would come in the same order, over and over.
+        rng.shuffle(positions)
+        return positions
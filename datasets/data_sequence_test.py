@@ -14,8 +14,12 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from data_sequence import DataSequence, DataSequenceWithShuffling
+from data_sequence import (AliasTable, BlockShuffleStrategy, ClassBalancedDataSequence, CompactStrategy,
+                           DataSequence, DataSequenceWithShuffling, FeistelPermutation, FeistelStrategy,
+                           ShardedDataSequence, WeightedDataSequence)
 
+import collections
+import random
 import unittest
 
 
@@ -143,6 +147,331 @@ class DataSequenceWithShuffleTest(unittest.TestCase):
         # Ensure that each position was represented exactly once.
         self.assertEqual(all_indices_seen, list(range(0, num_items)))
 
+    def testWithSeedIsReproducible(self):
+        data = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=42)
+        other = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=42)
+        self.assertEqual(data.indexes, other.indexes)
+
+        data.on_epoch_end()
+        self.assertEqual(data.epoch, 1)
+        self.assertNotEqual(data.indexes, other.indexes)
+        other.on_epoch_end()
+        self.assertEqual(data.indexes, other.indexes)
+
+
+class BlockShuffleStrategyTest(unittest.TestCase):
+
+    def testEachPositionSeenOnce(self):
+        for strategy in (BlockShuffleStrategy(block_size=10, window_size=30),
+                         BlockShuffleStrategy(block_size=7, window_size=1),
+                         BlockShuffleStrategy(block_size=8, window_size=8)):
+            data = DataSequenceWithShuffling(num_items=100, batch_size=32,
+                                             strategy=strategy)
+            for _ in range(2):
+                all_indices_seen = []
+                for index in range(len(data)):
+                    _, positions = data[index]
+                    all_indices_seen.extend(positions)
+                self.assertEqual(sorted(all_indices_seen), list(range(0, 100)))
+                data.on_epoch_end()
+
+    def testBlocksStayContiguous(self):
+        strategy = BlockShuffleStrategy(block_size=10, window_size=1)
+        data = DataSequenceWithShuffling(num_items=100, batch_size=10,
+                                         strategy=strategy)
+        for index in range(len(data)):
+            _, positions = data[index]
+            self.assertEqual(positions, list(range(positions[0], positions[0] + 10)))
+            self.assertEqual(positions[0] % 10, 0)
+
+    def testWindowsContainWholeBlocks(self):
+        strategy = BlockShuffleStrategy(block_size=5, window_size=20)
+        data = DataSequenceWithShuffling(num_items=100, batch_size=20,
+                                         strategy=strategy)
+        for index in range(len(data)):
+            _, positions = data[index]
+            blocks = sorted(set(position // 5 for position in positions))
+            self.assertEqual(len(blocks), 4)
+
+    def testWithSeed(self):
+        make_sequence = lambda: DataSequenceWithShuffling(
+            num_items=100, batch_size=32, seed=9,
+            strategy=BlockShuffleStrategy(block_size=10, window_size=20))
+        self.assertEqual(make_sequence().indexes, make_sequence().indexes)
+
+
+class StateDictTest(unittest.TestCase):
+
+    def _resume(self, make_sequence):
+        data = make_sequence()
+        _ = data[0]
+        _ = data[1]
+        state = data.state_dict()
+        self.assertEqual(state['cursor'], 2)
+        expected = [data[index] for index in range(state['cursor'], len(data))]
+        data.on_epoch_end()
+        expected_next_epoch = [data[index] for index in range(len(data))]
+
+        resumed = make_sequence()
+        resumed.load_state_dict(state)
+        actual = [resumed[index] for index in range(resumed.cursor, len(resumed))]
+        resumed.on_epoch_end()
+        actual_next_epoch = [resumed[index] for index in range(len(resumed))]
+
+        self.assertEqual([(r, list(p)) for r, p in expected], [(r, list(p)) for r, p in actual])
+        self.assertEqual([(r, list(p)) for r, p in expected_next_epoch],
+                         [(r, list(p)) for r, p in actual_next_epoch])
+        return state
+
+    def testDataSequence(self):
+        data = DataSequence(num_items=100, batch_size=32)
+        _ = data[2]
+        resumed = DataSequence(num_items=100, batch_size=32)
+        resumed.load_state_dict(data.state_dict())
+        self.assertEqual(resumed.cursor, 3)
+
+    def testWithoutSeedSavesIndexes(self):
+        state = self._resume(lambda: DataSequenceWithShuffling(num_items=100, batch_size=16))
+        self.assertEqual(len(state['indexes']), 100)
+
+    def testWithSeedDoesNotSaveIndexes(self):
+        state = self._resume(
+            lambda: DataSequenceWithShuffling(num_items=100, batch_size=16, seed=7))
+        self.assertNotIn('indexes', state)
+
+    def testLeavesGlobalRandomStateAlone(self):
+        random.seed(0)
+        expected = [random.random(), random.random()]
+        random.seed(0)
+        data = DataSequenceWithShuffling(num_items=100, batch_size=16)
+        state = data.state_dict()
+        data.on_epoch_end()
+        actual = [random.random()]
+        data.load_state_dict(state)
+        actual.append(random.random())
+        self.assertEqual(actual, expected)
+
+    def testCompactStrategy(self):
+        self._resume(lambda: DataSequenceWithShuffling(
+            num_items=100, batch_size=16, strategy=CompactStrategy()))
+
+    def testFeistelStrategySavesOnlyKey(self):
+        state = self._resume(lambda: DataSequenceWithShuffling(
+            num_items=100, batch_size=16, strategy=FeistelStrategy()))
+        self.assertIsInstance(state['indexes'], int)
+
+    def testShardedDataSequence(self):
+        state = self._resume(lambda: ShardedDataSequence(
+            num_items=100, batch_size=8, rank=1, world_size=3, seed=11))
+        self.assertNotIn('indexes', state)
+
+    def testMismatchedShard(self):
+        data = ShardedDataSequence(num_items=100, batch_size=8, rank=1, world_size=4)
+        for other in (
+                ShardedDataSequence(num_items=100, batch_size=8, rank=2, world_size=4),
+                # Same shard size (25), but a different world size.
+                ShardedDataSequence(num_items=75, batch_size=8, rank=1, world_size=3),
+                ShardedDataSequence(num_items=100, batch_size=8, rank=1, world_size=4,
+                                    pad_remainder=True),
+                DataSequenceWithShuffling(num_items=25, batch_size=8, seed=0)):
+            with self.subTest(other=other.state_dict()):
+                with self.assertRaises(ValueError):
+                    other.load_state_dict(data.state_dict())
+
+    def testMismatchedSequence(self):
+        data = DataSequenceWithShuffling(num_items=100, batch_size=16)
+        other = DataSequenceWithShuffling(num_items=100, batch_size=32)
+        with self.assertRaises(ValueError):
+            other.load_state_dict(data.state_dict())
+
+
+class ShardedDataSequenceTest(unittest.TestCase):
+
+    def _shards(self, num_items, batch_size, world_size, **kwargs):
+        return [ShardedDataSequence(num_items=num_items, batch_size=batch_size,
+                                    rank=rank, world_size=world_size, **kwargs)
+                for rank in range(world_size)]
+
+    def _positions(self, data):
+        positions = []
+        for index in range(len(data)):
+            _, batch_positions = data[index]
+            positions.extend(batch_positions)
+        return positions
+
+    def testShardsAreDisjointAndEqualSized(self):
+        shards = self._shards(num_items=100, batch_size=8, world_size=4, seed=1)
+
+        all_indices_seen = []
+        for data in shards:
+            self.assertEqual(data.num_items, 25)
+            self.assertEqual(len(data), 4)
+            all_indices_seen.extend(self._positions(data))
+
+        # Ensure that each position was represented exactly once.
+        self.assertEqual(sorted(all_indices_seen), list(range(0, 100)))
+
+    def testDropRemainder(self):
+        shards = self._shards(num_items=103, batch_size=10, world_size=4)
+
+        all_indices_seen = []
+        for data in shards:
+            self.assertEqual(data.num_items, 25)
+            self.assertEqual(len(data), 3)
+            all_indices_seen.extend(self._positions(data))
+
+        self.assertEqual(len(all_indices_seen), 100)
+        self.assertEqual(len(set(all_indices_seen)), 100)
+
+    def testPadRemainder(self):
+        shards = self._shards(num_items=103, batch_size=10, world_size=4,
+                              pad_remainder=True)
+
+        all_indices_seen = []
+        for data in shards:
+            self.assertEqual(data.num_items, 26)
+            self.assertEqual(len(data), 3)
+            all_indices_seen.extend(self._positions(data))
+
+        self.assertEqual(len(all_indices_seen), 104)
+        self.assertEqual(sorted(set(all_indices_seen)), list(range(0, 103)))
+
+    def testEpochsAreConsistentAcrossWorkers(self):
+        shards = self._shards(num_items=60, batch_size=7, world_size=3, seed=5)
+        first_epoch = [self._positions(data) for data in shards]
+        for data in shards:
+            data.on_epoch_end()
+
+        all_indices_seen = []
+        for data, previous in zip(shards, first_epoch):
+            positions = self._positions(data)
+            self.assertNotEqual(positions, previous)
+            all_indices_seen.extend(positions)
+        self.assertEqual(sorted(all_indices_seen), list(range(0, 60)))
+
+    def testWithoutShuffling(self):
+        data = ShardedDataSequence(num_items=10, batch_size=2, rank=1,
+                                   world_size=3, shuffle=False)
+        self.assertEqual(self._positions(data), [1, 4, 7])
+
+    def testWithFeistelStrategy(self):
+        shards = self._shards(num_items=100, batch_size=8, world_size=4,
+                              strategy=FeistelStrategy())
+
+        all_indices_seen = []
+        for data in shards:
+            all_indices_seen.extend(self._positions(data))
+        self.assertEqual(sorted(all_indices_seen), list(range(0, 100)))
+
+
+class StrategyTest(unittest.TestCase):
+
+    def _positions(self, data):
+        positions = []
+        for index in range(len(data)):
+            _, batch_positions = data[index]
+            positions.extend(batch_positions)
+        return positions
+
+    def testCompactStrategy(self):
+        data = DataSequenceWithShuffling(num_items=100, batch_size=32,
+                                         strategy=CompactStrategy())
+        self.assertEqual(data.indexes.itemsize, 4)
+        for _ in range(2):
+            self.assertEqual(sorted(self._positions(data)), list(range(0, 100)))
+            data.on_epoch_end()
+
+    def testFeistelPermutationIsBijection(self):
+        for num_items in (1, 2, 3, 7, 64, 100, 1000):
+            for key in (None, 0, 12345):
+                permutation = FeistelPermutation(num_items, key=key)
+                self.assertEqual(sorted(permutation[:]), list(range(0, num_items)))
+
+    def testFeistelPermutationIdentityWithoutKey(self):
+        permutation = FeistelPermutation(10)
+        self.assertEqual(permutation[2:5], [2, 3, 4])
+        self.assertEqual(permutation[-1], 9)
+        with self.assertRaises(IndexError):
+            _ = permutation[10]
+
+    def testFeistelStrategy(self):
+        data = DataSequenceWithShuffling(num_items=100, batch_size=32,
+                                         strategy=FeistelStrategy())
+        first_epoch = self._positions(data)
+        self.assertNotEqual(first_epoch, list(range(0, 100)))
+        self.assertEqual(sorted(first_epoch), list(range(0, 100)))
+
+        data.on_epoch_end()
+        second_epoch = self._positions(data)
+        self.assertNotEqual(first_epoch, second_epoch)
+        self.assertEqual(sorted(second_epoch), list(range(0, 100)))
+
+    def testFeistelStrategyWithSeed(self):
+        data = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3,
+                                         strategy=FeistelStrategy())
+        other = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3,
+                                          strategy=FeistelStrategy())
+        self.assertEqual(self._positions(data), self._positions(other))
+
+
+class WeightedDataSequenceTest(unittest.TestCase):
+
+    def testAliasTableMatchesWeights(self):
+        weights = [1.0, 2.0, 0.0, 3.0, 4.0]
+        table = AliasTable(weights)
+        rng = random.Random(0)
+        num_draws = 100_000
+        counts = collections.Counter(table.sample(rng) for _ in range(num_draws))
+        self.assertNotIn(2, counts)
+        for item, weight in enumerate(weights):
+            self.assertAlmostEqual(counts[item] / num_draws, weight / sum(weights), delta=0.01)
+
+    def testBatchesAreReproducible(self):
+        weights = [1.0] * 50 + [10.0] * 50
+        data = WeightedDataSequence(weights, batch_size=32, seed=4)
+        self.assertEqual(len(data), 4)
+        epoch = [data[index] for index in range(len(data))]
+        self.assertEqual([bounds for bounds, _ in epoch], [(0, 32), (32, 64), (64, 96), (96, 100)])
+        self.assertEqual(epoch, [WeightedDataSequence(weights, batch_size=32, seed=4)[index]
+                                 for index in range(len(data))])
+        # The heavier half should be drawn about 10 times as often.
+        heavy = sum(position >= 50 for _, positions in epoch for position in positions)
+        self.assertGreater(heavy, 75)
+
+        data.on_epoch_end()
+        self.assertNotEqual(data[0], epoch[0])
+
+    def testResume(self):
+        data = WeightedDataSequence([1.0, 2.0, 3.0], batch_size=4, num_items=40, seed=1)
+        data.on_epoch_end()
+        _ = data[0]
+        resumed = WeightedDataSequence([1.0, 2.0, 3.0], batch_size=4, num_items=40, seed=1)
+        resumed.load_state_dict(data.state_dict())
+        self.assertEqual(resumed[resumed.cursor], data[1])
+
+
+class ClassBalancedDataSequenceTest(unittest.TestCase):
+
+    def testBatchesAreStratified(self):
+        labels = [0] * 90 + [1] * 9 + [2] * 1
+        data = ClassBalancedDataSequence(labels, batch_size=30, num_items=90, seed=2)
+        self.assertEqual(data.num_classes, 3)
+        self.assertEqual(len(data), 3)
+        for epoch in range(2):
+            for index in range(len(data)):
+                _, positions = data[index]
+                counts = collections.Counter(labels[position] for position in positions)
+                self.assertEqual(counts, {0: 10, 1: 10, 2: 10})
+            data.on_epoch_end()
+
+    def testRemainderIsSpreadOverClasses(self):
+        labels = ['cat', 'dog'] * 10
+        data = ClassBalancedDataSequence(labels, batch_size=5, seed=0)
+        for index in range(len(data)):
+            _, positions = data[index]
+            counts = collections.Counter(labels[position] for position in positions)
+            self.assertEqual(sorted(counts.values()), [2, 3])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,389 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Base class of the Keras image dataset providers, e.g., `MNIST` and `CIFAR10`."""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import abc
+import os
+import tempfile
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Names of the raw arrays stored in the on-disk cache; see `__init__()`.
+_CACHED_ARRAYS = ('x_train', 'y_train', 'x_test', 'y_test')
+
+
+def _numpy_dtype(dtype: Any) -> np.dtype:
+    """Resolves `dtype`, including `'bfloat16'`, which NumPy lacks natively."""
+    if dtype == 'bfloat16':
+        try:
+            import ml_dtypes
+            return np.dtype(ml_dtypes.bfloat16)
+        except ImportError:
+            # Older versions of TensorFlow bundle their own NumPy bfloat16.
+            # TensorFlow is imported only here, and in the subclasses' `_load()`
+            # to download the dataset, as importing it takes several seconds and
+            # a lot of memory, which would otherwise be paid by any code using
+            # the providers at all.
+            import tensorflow as tf
+            return np.dtype(tf.bfloat16.as_numpy_dtype)
+    return np.dtype(dtype)
+
+
+def _compute_channel_stats(array: np.ndarray) -> np.ndarray:
+    """Returns the per-channel `[mean, std]` of `array`, in one streaming pass.
+
+    Rather than updating running moments (as in Welford's algorithm), this
+    counts how often each of the 256 pixel values occurs in each channel, a
+    chunk of rows at a time, from which the moments follow exactly, with no
+    float copy of `array` and no loss of precision as the count grows.
+    """
+    channels = array.shape[-1] if array.ndim == 4 else 1
+    counts = np.zeros((channels, 256), dtype=np.int64)
+    chunk_rows = max(1, 2**20 // max(1, array[:1].size))
+    for start in range(0, len(array), chunk_rows):
+        chunk = array[start:start + chunk_rows].reshape(-1, channels)
+        for channel in range(channels):
+            counts[channel] += np.bincount(chunk[:, channel], minlength=256)
+    values = np.arange(256, dtype=np.float64)
+    mean = counts @ values / counts.sum(axis=1)
+    variance = (counts * (values - mean[:, np.newaxis])**2).sum(axis=1) / counts.sum(axis=1)
+    return np.stack([mean, np.sqrt(variance)])
+
+
+class DatasetProvider(abc.ABC):
+    """Loads an image dataset and returns its splits in the formats models need.
+
+    Subclasses implement `_load()` for their dataset, and set `num_classes`
+    and `cache_prefix`, which names the files of the dataset in `cache_dir`.
+    """
+
+    num_classes: int
+    cache_prefix: str
+
+    x_train_raw_data: np.ndarray
+    x_test_raw_data: np.ndarray
+    y_train_raw_data: np.ndarray
+    y_test_raw_data: np.ndarray
+    cache_dir: Optional[str]
+    scale_cache_bytes: int
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 scale_cache_bytes: int = 0, data_dir: Optional[str] = None):
+        """Loads the dataset.
+
+        Args:
+          cache_dir: optional directory for an on-disk copy of the raw arrays.
+            On first use, the arrays are written there as `.npy` files; later
+            loads memory-map them read-only, so startup is nearly instant and
+            all processes on the same host share a single copy of the data via
+            the page cache. Per-channel statistics of the data (see
+            `x_train_channel_stats()`) are saved there as well.
+          scale_cache_bytes: memory budget for memoizing full-split scaled
+            arrays returned by the `x_*_scale_*()` methods; 0 (the default)
+            disables memoization, so each call returns a fresh array. Memoized
+            arrays are read-only and shared between callers; the least-recently
+            used ones are evicted to stay within the budget.
+          data_dir: optional directory containing the original files of the
+            dataset; if provided, the dataset is read from there instead of
+            via Keras. See `_load()` in each subclass for the expected files.
+        """
+        if cache_dir is None:
+            self._load(data_dir)
+        elif not self._load_from_cache(cache_dir):
+            self._load(data_dir)
+            self._save_to_cache(cache_dir)
+            # Switch over to the memory-mapped copy to release our private one.
+            self._load_from_cache(cache_dir)
+        self.cache_dir = cache_dir
+        self.scale_cache_bytes = scale_cache_bytes
+        self._scale_cache: Dict[Tuple[Any, ...], np.ndarray] = {}
+        self._categorical_cache: Dict[Tuple[str, np.dtype], np.ndarray] = {}
+        self._stats_cache: Dict[str, np.ndarray] = {}
+
+    @abc.abstractmethod
+    def _load(self, data_dir: Optional[str]) -> None:
+        """Sets the `*_raw_data` arrays, from `data_dir` if set, else via Keras."""
+
+    def _cache_path(self, cache_dir: str, array_name: str) -> str:
+        return os.path.join(cache_dir, f'{self.cache_prefix}-{array_name}.npy')
+
+    def _load_from_cache(self, cache_dir: str) -> bool:
+        paths = [self._cache_path(cache_dir, name) for name in _CACHED_ARRAYS]
+        if not all(os.path.exists(path) for path in paths):
+            return False
+        (self.x_train_raw_data, self.y_train_raw_data,
+         self.x_test_raw_data, self.y_test_raw_data) = [
+             np.load(path, mmap_mode='r') for path in paths]
+        return True
+
+    def _save_to_cache(self, cache_dir: str) -> None:
+        for array_name in _CACHED_ARRAYS:
+            self._save_array(cache_dir, array_name, getattr(self, f'{array_name}_raw_data'))
+
+    def _save_array(self, cache_dir: str, array_name: str, array: np.ndarray) -> None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file and rename it into place, so that other
+        # processes loading concurrently never see a partially-written file.
+        fd, temp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npy.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                np.save(temp_file, array)
+            os.replace(temp_path, self._cache_path(cache_dir, array_name))
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+    def _normalize(self, array: np.ndarray, scale: np.ndarray,
+                   offset: np.ndarray, out: np.ndarray) -> np.ndarray:
+        assert out.shape == array.shape, f'out has shape {out.shape}, expected {array.shape}'
+        if out.dtype.itemsize >= 4:
+            # Compute `array * scale + offset` directly into `out`, rather
+            # than casting first and allocating a full-size float temporary
+            # for each arithmetic operation.
+            result = out
+            if len(scale) > 1 and array.flags.c_contiguous and out.flags.c_contiguous:
+                # Broadcasting over the short channel axis is slow, so repeat
+                # the per-channel values along entire rows instead.
+                repeats = array[:1].size // len(scale)
+                scale, offset = np.tile(scale, repeats), np.tile(offset, repeats)
+                array, out = array.reshape(len(array), -1), out.reshape(len(out), -1)
+            np.multiply(array, scale.astype(out.dtype), out=out)
+            if np.any(offset):
+                np.add(out, offset.astype(out.dtype), out=out)
+            return result
+
+        # NumPy has no fast arithmetic in reduced-precision dtypes, and casting
+        # to them is slow, so instead look up the precomputed (and correctly
+        # rounded) result for each of the 256 possible pixel values, per
+        # channel, a chunk of rows at a time to bound the size of the indexes.
+        values = np.arange(256, dtype=np.float64)
+        lut = (values * scale[:, np.newaxis] + offset[:, np.newaxis]).astype(out.dtype)
+        if len(lut) > 1:
+            assert array.shape[-1] == len(lut), f'expected {array.shape[-1]} channels, got {len(lut)}'
+        lut = lut.reshape(-1)
+        channel_offsets = np.arange(0, lut.size, 256)
+        chunk_rows = max(1, 2**18 // max(1, array[:1].size))
+        for start in range(0, len(array), chunk_rows):
+            indexes = array[start:start + chunk_rows].astype(np.intp)
+            if len(channel_offsets) > 1:
+                indexes += channel_offsets
+            out[start:start + chunk_rows] = lut[indexes]
+        return out
+
+    def _scale(self, split: str, scale: Any, offset: Any, dtype: Any,
+               positions: Optional[Sequence[int]],
+               out: Optional[np.ndarray]) -> np.ndarray:
+        raw = getattr(self, f'{split}_raw_data')
+        scale, offset = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(scale, dtype=np.float64)),
+            np.atleast_1d(np.asarray(offset, dtype=np.float64)))
+        if positions is not None:
+            # Only convert the requested rows, so that peak memory use is
+            # proportional to the batch rather than to the entire split.
+            raw = np.take(raw, positions, axis=0)
+        if positions is not None or out is not None:
+            if out is None:
+                out = np.empty(raw.shape, dtype=_numpy_dtype(dtype))
+            return self._normalize(raw, scale, offset, out)
+
+        dtype = _numpy_dtype(dtype)
+        key = (split, tuple(scale), tuple(offset), dtype.name)
+        scaled = self._scale_cache.pop(key, None)
+        if scaled is None:
+            scaled = self._normalize(raw, scale, offset, np.empty(raw.shape, dtype=dtype))
+        self._memoize(key, scaled)
+        return scaled
+
+    def _memoize(self, key: Tuple[Any, ...], scaled: np.ndarray) -> None:
+        if scaled.nbytes > self.scale_cache_bytes:
+            return
+        # Entries are kept in least-recently-used order, oldest first.
+        while (sum(array.nbytes for array in self._scale_cache.values()) +
+               scaled.nbytes > self.scale_cache_bytes):
+            del self._scale_cache[next(iter(self._scale_cache))]
+        scaled.setflags(write=False)
+        self._scale_cache[key] = scaled
+
+    def clear_scale_cache(self) -> None:
+        """Drops all memoized scaled arrays; see `scale_cache_bytes`."""
+        self._scale_cache.clear()
+
+    def _scale_range(self, split: str, target_range: tuple[float, float],
+                     dtype: Any, positions: Optional[Sequence[int]],
+                     out: Optional[np.ndarray]) -> np.ndarray:
+        lower_bound, upper_bound = target_range
+        assert lower_bound < upper_bound, f'range {target_range} must be (low, high) with low < high'
+        return self._scale(split, (upper_bound - lower_bound) / 255.0,
+                           lower_bound, dtype, positions, out)
+
+    def _channel_stats(self, split: str) -> Tuple[np.ndarray, np.ndarray]:
+        if split not in self._stats_cache:
+            stats = None
+            array_name = f'{split}_stats'
+            if self.cache_dir is not None:
+                path = self._cache_path(self.cache_dir, array_name)
+                if os.path.exists(path):
+                    stats = np.load(path)
+            if stats is None:
+                stats = _compute_channel_stats(getattr(self, f'{split}_raw_data'))
+                if self.cache_dir is not None:
+                    self._save_array(self.cache_dir, array_name, stats)
+            self._stats_cache[split] = stats
+        mean, std = self._stats_cache[split]
+        return mean, std
+
+    def _standardize(self, split: str, mean: Any, std: Any, dtype: Any,
+                     positions: Optional[Sequence[int]],
+                     out: Optional[np.ndarray]) -> np.ndarray:
+        # Both splits are standardized with the train statistics by default,
+        # as the test data must go through the same transformation.
+        if mean is None or std is None:
+            train_mean, train_std = self._channel_stats('x_train')
+            mean = train_mean if mean is None else mean
+            std = train_std if std is None else std
+        std = np.asarray(std, dtype=np.float64)
+        assert np.all(std > 0), f'std {std} must be positive'
+        return self._scale(split, 1.0 / std, -np.asarray(mean, dtype=np.float64) / std,
+                           dtype, positions, out)
+
+    def x_train_raw(self) -> np.ndarray:
+        return self.x_train_raw_data
+
+    def x_train_scale_0_1(
+            self, positions: Optional[Sequence[int]] = None,
+            dtype: Any = 'float32', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns train data scaled to [0, 1], optionally only at `positions`.
+
+        The result has the given `dtype` (which may be `'float16'` or
+        `'bfloat16'`, to halve its size), or is written into `out`, if
+        provided, in the dtype of `out`.
+        """
+        return self._scale_range('x_train', (0.0, 1.0), dtype, positions, out)
+
+    def x_train_scale_custom(
+            self, target_range: tuple[float, float],
+            positions: Optional[Sequence[int]] = None,
+            dtype: Any = 'float32', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns train data scaled to `target_range`; see `x_train_scale_0_1()`."""
+        return self._scale_range('x_train', target_range, dtype, positions, out)
+
+    def x_train_channel_stats(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the per-channel `(mean, std)` of train data, in pixel units.
+
+        They are computed in one streaming pass over the raw data, and saved in
+        `cache_dir`, if any, so that later runs can skip recomputing them.
+        """
+        return self._channel_stats('x_train')
+
+    def x_train_standardize(
+            self, mean: Any = None, std: Any = None,
+            positions: Optional[Sequence[int]] = None,
+            dtype: Any = 'float32', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns train data as `(x - mean) / std`; see `x_train_scale_0_1()`.
+
+        `mean` and `std` are in raw pixel units (0-255), and are either scalars
+        or have one value per channel; they default to those of the train data
+        (see `x_train_channel_stats()`).
+        """
+        return self._standardize('x_train', mean, std, dtype, positions, out)
+
+    def x_test_raw(self) -> np.ndarray:
+        return self.x_test_raw_data
+
+    def x_test_scale_0_1(
+            self, positions: Optional[Sequence[int]] = None,
+            dtype: Any = 'float32', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns test data scaled to [0, 1]; see `x_train_scale_0_1()`."""
+        return self._scale_range('x_test', (0.0, 1.0), dtype, positions, out)
+
+    def x_test_scale_custom(
+            self, target_range: tuple[float, float],
+            positions: Optional[Sequence[int]] = None,
+            dtype: Any = 'float32', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns test data scaled to `target_range`; see `x_train_scale_0_1()`."""
+        return self._scale_range('x_test', target_range, dtype, positions, out)
+
+    def x_test_channel_stats(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the per-channel `(mean, std)` of test data, in pixel units."""
+        return self._channel_stats('x_test')
+
+    def x_test_standardize(
+            self, mean: Any = None, std: Any = None,
+            positions: Optional[Sequence[int]] = None,
+            dtype: Any = 'float32', out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns test data as `(x - mean) / std`; see `x_train_standardize()`.
+
+        Note that `mean` and `std` default to those of the *train* data.
+        """
+        return self._standardize('x_test', mean, std, dtype, positions, out)
+
+    def _categorical(self, split: str, dtype: Any,
+                     positions: Optional[Sequence[int]],
+                     out: Optional[np.ndarray]) -> np.ndarray:
+        labels = getattr(self, f'{split}_raw_data').reshape(-1)
+        if positions is not None:
+            labels = np.take(labels, positions)
+            if out is None:
+                out = np.empty((len(labels), self.num_classes), dtype=dtype)
+            out.fill(0)
+            out[np.arange(len(labels)), labels] = 1
+            return out
+
+        key = (split, np.dtype(dtype))
+        if key not in self._categorical_cache:
+            categorical = np.zeros((len(labels), self.num_classes), dtype=dtype)
+            categorical[np.arange(len(labels)), labels] = 1
+            categorical.setflags(write=False)
+            self._categorical_cache[key] = categorical
+        return self._categorical_cache[key]
+
+    def y_train_raw(self) -> np.ndarray:
+        return self.y_train_raw_data
+
+    def y_train_sparse(self) -> np.ndarray:
+        """Returns train labels as a 1-D array of class ids, for sparse losses."""
+        return self.y_train_raw_data.reshape(-1)
+
+    def y_train_categorical(self, dtype: Any = 'float32',
+                            positions: Optional[Sequence[int]] = None,
+                            out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns train labels one-hot encoded, like `keras.utils.to_categorical()`.
+
+        The full split is encoded once and cached, per `dtype`, as a read-only
+        array; a compact `dtype` such as `'uint8'` takes a quarter of the
+        memory of the default. If `positions` is given, only those labels are
+        encoded, into `out` if provided (e.g., to reuse a buffer per batch).
+        """
+        return self._categorical('y_train', dtype, positions, out)
+
+    def y_test_raw(self) -> np.ndarray:
+        return self.y_test_raw_data
+
+    def y_test_sparse(self) -> np.ndarray:
+        """Returns test labels as a 1-D array of class ids, for sparse losses."""
+        return self.y_test_raw_data.reshape(-1)
+
+    def y_test_categorical(self, dtype: Any = 'float32',
+                           positions: Optional[Sequence[int]] = None,
+                           out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Returns test labels one-hot encoded; see `y_train_categorical()`."""
+        return self._categorical('y_test', dtype, positions, out)
@@ -0,0 +1,304 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import struct
+import sys
+
+# Provides the dataset-specific providers, and their readers.
+_DATASETS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(_DATASETS_DIR, 'mnist'))
+sys.path.append(os.path.join(_DATASETS_DIR, 'cifar-10'))
+
+import cifar10_binary  # noqa: E402
+from cifar10_keras import CIFAR10  # noqa: E402
+from dataset_provider import DatasetProvider, _numpy_dtype  # noqa: E402
+import mnist_idx  # noqa: E402
+from mnist_keras import MNIST  # noqa: E402
+
+import subprocess  # noqa: E402
+import tempfile  # noqa: E402
+import unittest  # noqa: E402
+
+import numpy as np  # noqa: E402
+
+
+def write_mnist(data_dir, x_train, y_train, x_test, y_test):
+    """Writes uint8 arrays as the (uncompressed) IDX files of MNIST."""
+    for name, array in ((mnist_idx.TRAIN_IMAGES, x_train), (mnist_idx.TRAIN_LABELS, y_train),
+                        (mnist_idx.TEST_IMAGES, x_test), (mnist_idx.TEST_LABELS, y_test)):
+        header = struct.pack('>BBBB', 0, 0, 0x08, array.ndim)
+        header += struct.pack(f'>{array.ndim}I', *array.shape)
+        with open(os.path.join(data_dir, name), 'wb') as idx_file:
+            idx_file.write(header + array.tobytes())
+
+
+def write_cifar10(data_dir, x_train, y_train, x_test, y_test):
+    """Writes uint8 arrays as the batch files of CIFAR-10, splitting the train
+    data evenly between them."""
+    batches = list(zip(cifar10_binary.TRAIN_BATCHES,
+                       np.split(x_train, len(cifar10_binary.TRAIN_BATCHES)),
+                       np.split(y_train, len(cifar10_binary.TRAIN_BATCHES))))
+    batches.append((cifar10_binary.TEST_BATCHES[0], x_test, y_test))
+    for name, images, labels in batches:
+        records = np.empty(len(images), dtype=cifar10_binary.RECORD_DTYPE)
+        records['label'] = labels.reshape(-1)
+        records['image'] = images.transpose((0, 3, 1, 2))
+        with open(os.path.join(data_dir, name), 'wb') as batch_file:
+            batch_file.write(records.tobytes())
+
+
+class FakeProvider(DatasetProvider):
+    """Provides random 4x4 images with 3 channels, and counts the loads."""
+
+    num_classes = 10
+    cache_prefix = 'fake'
+
+    def __init__(self, *args, **kwargs):
+        self.num_loads = 0
+        super().__init__(*args, **kwargs)
+
+    def _load(self, data_dir):
+        self.num_loads += 1
+        rng = np.random.default_rng(0)
+        self.x_train_raw_data = rng.integers(0, 256, size=(10, 4, 4, 3), dtype=np.uint8)
+        self.y_train_raw_data = rng.integers(0, 10, size=(10, 1), dtype=np.uint8)
+        self.x_test_raw_data = rng.integers(0, 256, size=(5, 4, 4, 3), dtype=np.uint8)
+        self.y_test_raw_data = rng.integers(0, 10, size=(5, 1), dtype=np.uint8)
+
+
+def expected_channel_stats(array):
+    """Returns the per-channel mean and std of `array`, computed directly."""
+    channels = array.reshape(-1, array.shape[-1] if array.ndim == 4 else 1)
+    return channels.mean(axis=0), channels.std(axis=0)
+
+
+class DatasetProviderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+        # The same data, as loaded without a cache.
+        self.data = FakeProvider()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def testWithoutCache(self):
+        self.assertEqual(self.data.num_loads, 1)
+        self.assertNotIsInstance(self.data.x_train_raw(), np.memmap)
+
+    def testCacheIsMemoryMapped(self):
+        self.assertEqual(FakeProvider(cache_dir=self.cache_dir).num_loads, 1)
+        self.assertEqual(sorted(os.listdir(self.cache_dir)), [
+            'fake-x_test.npy', 'fake-x_train.npy', 'fake-y_test.npy', 'fake-y_train.npy'])
+
+        provider = FakeProvider(cache_dir=self.cache_dir)
+        self.assertEqual(provider.num_loads, 0)
+        for name in ('x_train', 'y_train', 'x_test', 'y_test'):
+            array = getattr(provider, f'{name}_raw')()
+            self.assertIsInstance(array, np.memmap)
+            self.assertFalse(array.flags.writeable)
+            np.testing.assert_array_equal(array, getattr(self.data, f'{name}_raw')())
+
+    def testScalePositions(self):
+        positions = [3, 0, 3]
+        np.testing.assert_allclose(
+            self.data.x_train_scale_custom((-1.0, 1.0), positions=positions),
+            self.data.x_train_raw()[positions] / 127.5 - 1, rtol=1e-6, atol=1e-6)
+        np.testing.assert_allclose(self.data.x_test_scale_0_1(positions=[4]),
+                                   self.data.x_test_raw()[[4]] / 255.0, rtol=1e-6)
+
+    def testScaleIsMemoized(self):
+        provider = FakeProvider(scale_cache_bytes=self.data.x_train_raw().size * 4)
+        scaled = provider.x_train_scale_0_1()
+        self.assertFalse(scaled.flags.writeable)
+        self.assertIs(provider.x_train_scale_0_1(), scaled)
+        np.testing.assert_allclose(scaled, self.data.x_train_raw() / 255.0, rtol=1e-6)
+        provider.clear_scale_cache()
+        self.assertIsNot(provider.x_train_scale_0_1(), scaled)
+
+    def testScaleCacheEvictsLeastRecentlyUsed(self):
+        # Room for two float32 train arrays.
+        provider = FakeProvider(scale_cache_bytes=self.data.x_train_raw().size * 8)
+        first = provider.x_train_scale_0_1()
+        second = provider.x_train_scale_custom((-1.0, 1.0))
+        self.assertIs(provider.x_train_scale_0_1(), first)
+        provider.x_train_scale_custom((0.0, 2.0))
+        # Evicts `second`, as `first` was used more recently.
+        self.assertIs(provider.x_train_scale_0_1(), first)
+        self.assertIsNot(provider.x_train_scale_custom((-1.0, 1.0)), second)
+
+    def testScaleTooLargeToMemoize(self):
+        provider = FakeProvider(scale_cache_bytes=self.data.x_train_raw().size * 4 - 1)
+        scaled = provider.x_train_scale_0_1()
+        self.assertTrue(scaled.flags.writeable)
+        self.assertIsNot(provider.x_train_scale_0_1(), scaled)
+
+    def testSparse(self):
+        np.testing.assert_array_equal(self.data.y_train_sparse(),
+                                      self.data.y_train_raw().reshape(-1))
+        np.testing.assert_array_equal(self.data.y_test_sparse(),
+                                      self.data.y_test_raw().reshape(-1))
+
+    def testCategorical(self):
+        categorical = self.data.y_train_categorical(dtype='uint8')
+        self.assertFalse(categorical.flags.writeable)
+        self.assertIs(self.data.y_train_categorical(dtype='uint8'), categorical)
+        np.testing.assert_array_equal(
+            categorical, np.eye(10, dtype=np.uint8)[self.data.y_train_sparse()])
+
+    def testCategoricalPositions(self):
+        labels = self.data.y_test_sparse()
+        positions = [2, 0, 2]
+        np.testing.assert_array_equal(self.data.y_test_categorical(positions=positions),
+                                      np.eye(10)[labels[positions]])
+
+        # A reused buffer is cleared before encoding the next batch.
+        out = np.ones((2, 10), dtype=np.float32)
+        self.assertIs(self.data.y_test_categorical(positions=[3, 4], out=out), out)
+        np.testing.assert_array_equal(out, np.eye(10)[labels[[3, 4]]])
+
+    def testScaleIntoOut(self):
+        x_test = self.data.x_test_raw()
+        out = np.empty((2,) + x_test.shape[1:], dtype=np.float64)
+        self.assertIs(self.data.x_test_scale_0_1(positions=[4, 1], out=out), out)
+        np.testing.assert_allclose(out, x_test[[4, 1]] / 255.0)
+
+        out = np.empty(x_test.shape, dtype=np.float32)
+        self.assertIs(self.data.x_test_scale_0_1(out=out), out)
+        np.testing.assert_allclose(out, x_test / 255.0, rtol=1e-6)
+
+    def testScaleReducedPrecision(self):
+        x_train = self.data.x_train_raw()
+        expected = x_train / 127.5 - 1
+        for dtype in ('float16', 'bfloat16'):
+            with self.subTest(dtype=dtype):
+                scaled = self.data.x_train_scale_custom((-1.0, 1.0), dtype=dtype)
+                self.assertEqual(scaled.dtype, _numpy_dtype(dtype))
+                # Correctly rounded, i.e., as if computed in float64 and cast.
+                np.testing.assert_array_equal(scaled, expected.astype(_numpy_dtype(dtype)))
+
+                out = np.empty((2,) + x_train.shape[1:], dtype=_numpy_dtype(dtype))
+                self.data.x_train_scale_custom((-1.0, 1.0), positions=[5, 2], out=out)
+                np.testing.assert_array_equal(out, expected[[5, 2]].astype(out.dtype))
+
+    def testChannelStats(self):
+        for (mean, std), array in ((self.data.x_train_channel_stats(), self.data.x_train_raw()),
+                                   (self.data.x_test_channel_stats(), self.data.x_test_raw())):
+            expected_mean, expected_std = expected_channel_stats(array)
+            np.testing.assert_allclose(mean, expected_mean)
+            np.testing.assert_allclose(std, expected_std)
+
+    def testChannelStatsAreCached(self):
+        FakeProvider(cache_dir=self.cache_dir).x_train_channel_stats()
+        path = os.path.join(self.cache_dir, 'fake-x_train_stats.npy')
+        np.testing.assert_allclose(
+            np.load(path), np.stack(expected_channel_stats(self.data.x_train_raw())))
+
+        # Later loads read the saved statistics rather than recomputing them.
+        np.save(path, np.array([[100.0] * 3, [50.0] * 3]))
+        provider = FakeProvider(cache_dir=self.cache_dir)
+        mean, std = provider.x_train_channel_stats()
+        np.testing.assert_array_equal(mean, 100.0)
+        np.testing.assert_array_equal(std, 50.0)
+        np.testing.assert_allclose(provider.x_test_standardize(),
+                                   (self.data.x_test_raw() - 100.0) / 50.0, rtol=1e-6, atol=1e-6)
+
+    def testStandardize(self):
+        # Both splits are standardized with the train statistics by default.
+        mean, std = expected_channel_stats(self.data.x_train_raw())
+        np.testing.assert_allclose(self.data.x_test_standardize(positions=[1, 2]),
+                                   (self.data.x_test_raw()[[1, 2]] - mean) / std,
+                                   rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(self.data.x_train_standardize(mean=128, std=64),
+                                   (self.data.x_train_raw() - 128.0) / 64, rtol=1e-6)
+
+
+class _DatasetTest:
+    """Tests of a `DatasetProvider` subclass, on random data written to
+    `data_dir` in the original format of the dataset.
+
+    Subclasses set `provider`, the class under test, `write_data`, which
+    writes the data files, and `image_shape`.
+    """
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.data_dir = os.path.join(self.temp_dir.name, 'data')
+        self.cache_dir = os.path.join(self.temp_dir.name, 'cache')
+        os.mkdir(self.data_dir)
+        rng = np.random.default_rng(0)
+        self.x_train = rng.integers(0, 256, size=(10,) + self.image_shape, dtype=np.uint8)
+        self.y_train = rng.integers(0, 10, size=(10,), dtype=np.uint8)
+        self.x_test = rng.integers(0, 256, size=(5,) + self.image_shape, dtype=np.uint8)
+        self.y_test = rng.integers(0, 10, size=(5,), dtype=np.uint8)
+        self.write_data(self.data_dir, self.x_train, self.y_train, self.x_test, self.y_test)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def testLoadFromDataDir(self):
+        provider = self.provider(data_dir=self.data_dir)
+        np.testing.assert_array_equal(provider.x_train_raw(), self.x_train)
+        np.testing.assert_array_equal(provider.x_test_raw(), self.x_test)
+        np.testing.assert_array_equal(provider.y_train_raw().reshape(-1), self.y_train)
+        np.testing.assert_array_equal(provider.y_test_raw().reshape(-1), self.y_test)
+
+    def testCacheFromDataDir(self):
+        self.provider(cache_dir=self.cache_dir, data_dir=self.data_dir)
+        # Once cached, the original files are no longer needed.
+        for name in os.listdir(self.data_dir):
+            os.unlink(os.path.join(self.data_dir, name))
+        provider = self.provider(cache_dir=self.cache_dir, data_dir=self.data_dir)
+        self.assertIsInstance(provider.x_train_raw(), np.memmap)
+        np.testing.assert_array_equal(provider.x_train_raw(), self.x_train)
+        self.assertTrue(os.path.exists(
+            os.path.join(self.cache_dir, f'{self.provider.cache_prefix}-x_train.npy')))
+
+    def testDoesNotImportTensorFlow(self):
+        code = (f'import sys\n'
+                f'from {self.provider.__module__} import {self.provider.__name__}\n'
+                f'{self.provider.__name__}(data_dir={self.data_dir!r}).x_train_scale_0_1()\n'
+                f'print("tensorflow" in sys.modules)\n')
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(sys.path))
+        output = subprocess.run([sys.executable, '-c', code], env=env, check=True,
+                                stdout=subprocess.PIPE, text=True).stdout
+        self.assertEqual(output.strip(), 'False')
+
+    def testChannelStats(self):
+        mean, std = self.provider(data_dir=self.data_dir).x_train_channel_stats()
+        expected_mean, expected_std = expected_channel_stats(self.x_train)
+        np.testing.assert_allclose(mean, expected_mean)
+        np.testing.assert_allclose(std, expected_std)
+
+
+class MnistTest(_DatasetTest, unittest.TestCase):
+
+    provider = MNIST
+    write_data = staticmethod(write_mnist)
+    image_shape = (28, 28)
+
+
+class Cifar10Test(_DatasetTest, unittest.TestCase):
+
+    provider = CIFAR10
+    write_data = staticmethod(write_cifar10)
+    image_shape = (32, 32, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
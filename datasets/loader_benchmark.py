@@ -0,0 +1,303 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the data sequences and dataset providers; prints JSON results.
+
+Each benchmark runs in a separate process, so that its peak RSS (resident set
+size) is measured independently of the others, and so that the time to import
+and load the dataset providers is measured from a cold start. The dataset
+providers are benchmarked on random data of the same shape as the real datasets,
+via their on-disk cache, so no download is needed.
+
+Usage:
+
+    python loader_benchmark.py [--num-items N ...] [--batch-sizes B ...]
+"""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List
+
+from data_sequence import DataSequence, DataSequenceWithShuffling
+from numpy_data_sequence import NumpyBatchSequence, NumpyDataSequence
+
+import numpy as np
+
+_DATASETS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Shapes of the train and test splits of the real datasets.
+_PROVIDER_SHAPES = {
+    'MNIST': ((60000, 28, 28), (60000,), (10000, 28, 28), (10000,)),
+    'CIFAR10': ((50000, 32, 32, 3), (50000, 1), (10000, 32, 32, 3), (10000, 1)),
+}
+
+_SEQUENCES: Dict[str, Callable[[int, int], Any]] = {
+    'DataSequence': lambda n, b: DataSequence(num_items=n, batch_size=b),
+    'DataSequenceWithShuffling': lambda n, b: DataSequenceWithShuffling(num_items=n, batch_size=b),
+    'NumpyDataSequence': lambda n, b: NumpyDataSequence(num_items=n, batch_size=b),
+}
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, but in kilobytes on Linux.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _percentile_ms(latencies: List[float], percentile: float) -> float:
+    return float(np.percentile(latencies, percentile)) * 1000
+
+
+def _benchmark_sequence(name: str, num_items: int, batch_size: int,
+                        num_epochs: int) -> Dict[str, Any]:
+    sequence = _SEQUENCES[name](num_items, batch_size)
+    latencies = []
+    epoch_end_seconds = []
+    start = time.perf_counter()
+    for _ in range(num_epochs):
+        for index in range(len(sequence)):
+            before = time.perf_counter()
+            _ = sequence[index]
+            latencies.append(time.perf_counter() - before)
+        before = time.perf_counter()
+        # `DataSequence` doesn't need to do anything at the end of an epoch.
+        if hasattr(sequence, 'on_epoch_end'):
+            sequence.on_epoch_end()
+        epoch_end_seconds.append(time.perf_counter() - before)
+    total_seconds = time.perf_counter() - start
+
+    return {
+        'benchmark': 'sequence',
+        'sequence': name,
+        'num_items': num_items,
+        'batch_size': batch_size,
+        'batches_per_sec': len(latencies) / total_seconds,
+        'getitem_p50_ms': _percentile_ms(latencies, 50),
+        'getitem_p99_ms': _percentile_ms(latencies, 99),
+        'on_epoch_end_ms': float(np.mean(epoch_end_seconds)) * 1000,
+    }
+
+
+def _write_provider_cache(provider: str, cache_dir: str) -> None:
+    """Fills the provider's on-disk cache with random data of the right shape."""
+    rng = np.random.default_rng(0)
+    names = ('x_train', 'y_train', 'x_test', 'y_test')
+    prefix = {'MNIST': 'mnist', 'CIFAR10': 'cifar10'}[provider]
+    for name, shape in zip(names, _PROVIDER_SHAPES[provider]):
+        high = 10 if name.startswith('y') else 256
+        array = rng.integers(0, high, size=shape, dtype=np.uint8)
+        np.save(os.path.join(cache_dir, f'{prefix}-{name}.npy'), array)
+
+
+def _provider_class(provider: str) -> Any:
+    if provider == 'MNIST':
+        sys.path.insert(0, os.path.join(_DATASETS_DIR, 'mnist'))
+        from mnist_keras import MNIST
+        return MNIST
+    else:
+        sys.path.insert(0, os.path.join(_DATASETS_DIR, 'cifar-10'))
+        from cifar10_keras import CIFAR10
+        return CIFAR10
+
+
+def _load_provider(provider: str, cache_dir: str, **kwargs) -> Any:
+    return _provider_class(provider)(cache_dir=cache_dir, **kwargs)
+
+
+def _benchmark_import(provider: str, cache_dir: str,
+                      eager_tensorflow: bool) -> Dict[str, Any]:
+    """Measures cold-start time: importing a provider and loading its cache.
+
+    With `eager_tensorflow`, TensorFlow is imported along with the provider, as
+    the providers did before importing it lazily, which gives a baseline.
+    """
+    start = time.perf_counter()
+    if eager_tensorflow:
+        import tensorflow  # noqa: F401
+    provider_class = _provider_class(provider)
+    import_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    provider_class(cache_dir=cache_dir)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    return {
+        'benchmark': 'import',
+        'provider': provider,
+        'eager_tensorflow': eager_tensorflow,
+        'import_ms': import_ms,
+        'load_ms': load_ms,
+        'tensorflow_imported': 'tensorflow' in sys.modules,
+    }
+
+
+def _benchmark_provider(provider: str, mode: str, batch_size: int,
+                        cache_dir: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    data = _load_provider(provider, cache_dir,
+                          scale_cache_bytes=2**32 if mode == 'memoized' else 0)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    latencies = []
+    start = time.perf_counter()
+    if mode == 'batch':
+        sequence = NumpyDataSequence(num_items=len(data.x_train_raw()),
+                                     batch_size=batch_size)
+        for index in range(len(sequence)):
+            _, positions = sequence[index]
+            before = time.perf_counter()
+            _ = data.x_train_scale_custom((-1.0, 1.0), positions)
+            latencies.append(time.perf_counter() - before)
+    else:
+        # Repeated calls, as training code typically makes, e.g., once for
+        # each model being trained.
+        for _ in range(3):
+            before = time.perf_counter()
+            _ = data.x_train_scale_custom((-1.0, 1.0))
+            latencies.append(time.perf_counter() - before)
+    total_seconds = time.perf_counter() - start
+
+    return {
+        'benchmark': 'provider',
+        'provider': provider,
+        'mode': mode,
+        'batch_size': batch_size if mode == 'batch' else None,
+        'load_ms': load_ms,
+        'calls_per_sec': len(latencies) / total_seconds,
+        'call_p50_ms': _percentile_ms(latencies, 50),
+        'call_p99_ms': _percentile_ms(latencies, 99),
+    }
+
+
+def _benchmark_input_path(provider: str, path: str, batch_size: int,
+                          num_epochs: int, cache_dir: str) -> Dict[str, Any]:
+    """Compares gathering training batches via Python and via `tf.data`."""
+    data = _load_provider(provider, cache_dir)
+    x, y = data.x_train_raw(), data.y_train_raw()
+    sequence = NumpyDataSequence(num_items=len(x), batch_size=batch_size)
+    if path == 'sequence':
+        batches: Any = NumpyBatchSequence(sequence, x, y)
+    else:
+        # Imported here, as importing TensorFlow is slow and memory-hungry.
+        from tf_dataset import make_dataset
+        batches = make_dataset(sequence, x, y)
+
+    start = time.perf_counter()
+    for _ in range(num_epochs):
+        if path == 'sequence':
+            for index in range(len(batches)):
+                _ = batches[index]
+            batches.on_epoch_end()
+        else:
+            for _ in batches:
+                pass
+    total_seconds = time.perf_counter() - start
+
+    return {
+        'benchmark': 'input_path',
+        'provider': provider,
+        'path': path,
+        'batch_size': batch_size,
+        'batches_per_sec': num_epochs * len(sequence) / total_seconds,
+    }
+
+
+def _run_child(function: Callable[..., Dict[str, Any]], args: tuple,
+               connection: Any) -> None:
+    result = function(*args)
+    result['peak_rss_bytes'] = _peak_rss_bytes()
+    connection.send(result)
+    connection.close()
+
+
+def _run_in_subprocess(function: Callable[..., Dict[str, Any]],
+                       *args: Any) -> Dict[str, Any]:
+    """Runs `function(*args)` in a new process and adds its peak RSS."""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=_run_child, args=(function, args, sender))
+    process.start()
+    sender.close()
+    result = receiver.recv()
+    process.join()
+    return result
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--num-items', type=int, nargs='+',
+                        default=[10_000, 1_000_000])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[32, 256])
+    parser.add_argument('--num-epochs', type=int, default=3)
+    parser.add_argument('--skip-providers', action='store_true',
+                        help='only benchmark the data sequences')
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in _SEQUENCES:
+        for num_items in args.num_items:
+            for batch_size in args.batch_sizes:
+                results.append(_run_in_subprocess(
+                    _benchmark_sequence, name, num_items, batch_size, args.num_epochs))
+
+    if not args.skip_providers:
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for provider in _PROVIDER_SHAPES:
+                _write_provider_cache(provider, cache_dir)
+                for eager_tensorflow in (True, False):
+                    results.append(_run_in_subprocess(
+                        _benchmark_import, provider, cache_dir, eager_tensorflow))
+                for mode in ('full', 'memoized'):
+                    results.append(_run_in_subprocess(
+                        _benchmark_provider, provider, mode, 0, cache_dir))
+                for batch_size in args.batch_sizes:
+                    results.append(_run_in_subprocess(
+                        _benchmark_provider, provider, 'batch', batch_size, cache_dir))
+                    for path in ('sequence', 'tf.data'):
+                        results.append(_run_in_subprocess(
+                            _benchmark_input_path, provider, path, batch_size,
+                            args.num_epochs, cache_dir))
+
+    report = {
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,124 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Reader for the IDX file format used to distribute the MNIST dataset.
+
+See the bottom of http://yann.lecun.com/exdb/mnist/ for the format description.
+Files may be either gzip-compressed (as distributed) or uncompressed.
+"""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import gzip
+import os
+import struct
+from typing import BinaryIO, Dict, Iterator
+
+import numpy as np
+
+# Shared with the other readers.
+from binary_io import readinto_exactly
+
+# Maps the type code in the IDX header to the (big-endian) element type.
+_IDX_DTYPES: Dict[int, np.dtype] = {
+    0x08: np.dtype('u1'),
+    0x09: np.dtype('i1'),
+    0x0B: np.dtype('>i2'),
+    0x0C: np.dtype('>i4'),
+    0x0D: np.dtype('>f4'),
+    0x0E: np.dtype('>f8'),
+}
+
+# Names of the files in the MNIST distribution, without the `.gz` suffix.
+TRAIN_IMAGES = 'train-images-idx3-ubyte'
+TRAIN_LABELS = 'train-labels-idx1-ubyte'
+TEST_IMAGES = 't10k-images-idx3-ubyte'
+TEST_LABELS = 't10k-labels-idx1-ubyte'
+
+
+class IdxFormatError(ValueError):
+    pass
+
+
+def _open(path: str) -> BinaryIO:
+    with open(path, 'rb') as raw_file:
+        is_gzip = raw_file.read(2) == b'\x1f\x8b'
+    return gzip.open(path, 'rb') if is_gzip else open(path, 'rb')  # type: ignore[return-value]
+
+
+def _read_header(idx_file: BinaryIO) -> tuple[np.dtype, tuple[int, ...]]:
+    magic = idx_file.read(4)
+    if len(magic) != 4 or magic[:2] != b'\0\0' or magic[2] not in _IDX_DTYPES:
+        raise IdxFormatError(f'not an IDX file; header: {magic!r}')
+    num_dims = magic[3]
+    shape = struct.unpack(f'>{num_dims}I', idx_file.read(4 * num_dims))
+    return _IDX_DTYPES[magic[2]], shape
+
+
+def _read_exactly(idx_file: BinaryIO, num_bytes: int) -> bytearray:
+    buffer = bytearray(num_bytes)
+    filled = readinto_exactly(idx_file, memoryview(buffer))
+    if filled < num_bytes:
+        raise IdxFormatError(f'file truncated: expected {num_bytes} bytes of data, '
+                             f'received {filled}')
+    return buffer
+
+
+def read_idx(path: str) -> np.ndarray:
+    """Reads an entire IDX file into an array.
+
+    The data is read directly into a single buffer, which the returned array
+    wraps without copying; multi-byte types are kept in big-endian byte order.
+    """
+    with _open(path) as idx_file:
+        dtype, shape = _read_header(idx_file)
+        num_bytes = int(np.prod(shape)) * dtype.itemsize
+        return np.frombuffer(_read_exactly(idx_file, num_bytes), dtype=dtype).reshape(shape)
+
+
+def iter_idx(path: str, chunk_size: int) -> Iterator[np.ndarray]:
+    """Yields the rows of an IDX file in chunks of up to `chunk_size` rows.
+
+    Only one chunk is held in memory at a time, so this can be used to process
+    files which are too large to load in full.
+    """
+    with _open(path) as idx_file:
+        dtype, shape = _read_header(idx_file)
+        row_shape = shape[1:]
+        row_bytes = int(np.prod(row_shape)) * dtype.itemsize
+        for low in range(0, shape[0], chunk_size):
+            num_rows = min(chunk_size, shape[0] - low)
+            buffer = _read_exactly(idx_file, num_rows * row_bytes)
+            yield np.frombuffer(buffer, dtype=dtype).reshape((num_rows,) + row_shape)
+
+
+def _find(data_dir: str, name: str) -> str:
+    for filename in (name, f'{name}.gz'):
+        path = os.path.join(data_dir, filename)
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f'neither {name} nor {name}.gz found in {data_dir}')
+
+
+def load_data(data_dir: str) -> tuple[tuple[np.ndarray, np.ndarray],
+                                      tuple[np.ndarray, np.ndarray]]:
+    """Loads MNIST from IDX files, like `keras.datasets.mnist.load_data()`."""
+    x_train, y_train, x_test, y_test = [
+        read_idx(_find(data_dir, name))
+        for name in (TRAIN_IMAGES, TRAIN_LABELS, TEST_IMAGES, TEST_LABELS)]
+    return (x_train, y_train), (x_test, y_test)
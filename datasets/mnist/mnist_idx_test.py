@@ -0,0 +1,100 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+# Provides `binary_io`, as imported by `mnist_idx`.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+import mnist_idx  # noqa: E402
+
+import gzip
+import struct
+import tempfile
+import unittest
+
+import numpy as np
+
+
+def write_idx(path, array, type_code, compress=False):
+    header = struct.pack('>BBBB', 0, 0, type_code, array.ndim)
+    header += struct.pack(f'>{array.ndim}I', *array.shape)
+    opener = gzip.open if compress else open
+    with opener(path, 'wb') as idx_file:
+        idx_file.write(header + array.tobytes())
+
+
+class MnistIdxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.images = np.arange(5 * 4 * 3, dtype=np.uint8).reshape((5, 4, 3))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.temp_dir.name, name)
+
+    def testReadRaw(self):
+        write_idx(self._path('images'), self.images, 0x08)
+        np.testing.assert_array_equal(mnist_idx.read_idx(self._path('images')), self.images)
+
+    def testReadGzip(self):
+        write_idx(self._path('images.gz'), self.images, 0x08, compress=True)
+        np.testing.assert_array_equal(mnist_idx.read_idx(self._path('images.gz')), self.images)
+
+    def testReadBigEndianInts(self):
+        array = np.array([[1, -2], [300, 70000]], dtype='>i4')
+        write_idx(self._path('ints'), array, 0x0C)
+        np.testing.assert_array_equal(mnist_idx.read_idx(self._path('ints')), array)
+
+    def testIterChunks(self):
+        write_idx(self._path('images.gz'), self.images, 0x08, compress=True)
+        chunks = list(mnist_idx.iter_idx(self._path('images.gz'), chunk_size=2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        np.testing.assert_array_equal(np.concatenate(chunks), self.images)
+
+    def testTruncatedFile(self):
+        write_idx(self._path('images'), self.images, 0x08)
+        with open(self._path('images'), 'r+b') as idx_file:
+            idx_file.truncate(20)
+        with self.assertRaises(mnist_idx.IdxFormatError):
+            mnist_idx.read_idx(self._path('images'))
+
+    def testNotIdxFile(self):
+        with open(self._path('other'), 'wb') as other_file:
+            other_file.write(b'hello world')
+        with self.assertRaises(mnist_idx.IdxFormatError):
+            mnist_idx.read_idx(self._path('other'))
+
+    def testLoadData(self):
+        labels = np.arange(5, dtype=np.uint8)
+        write_idx(self._path(mnist_idx.TRAIN_IMAGES + '.gz'), self.images, 0x08, compress=True)
+        write_idx(self._path(mnist_idx.TRAIN_LABELS + '.gz'), labels, 0x08, compress=True)
+        write_idx(self._path(mnist_idx.TEST_IMAGES), self.images[:2], 0x08)
+        write_idx(self._path(mnist_idx.TEST_LABELS), labels[:2], 0x08)
+
+        (x_train, y_train), (x_test, y_test) = mnist_idx.load_data(self.temp_dir.name)
+        np.testing.assert_array_equal(x_train, self.images)
+        np.testing.assert_array_equal(y_train, labels)
+        np.testing.assert_array_equal(x_test, self.images[:2])
+        np.testing.assert_array_equal(y_test, labels[:2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -20,56 +20,40 @@
 # (added in PEP 563) for Python 3.7 and higher.
 from __future__ import annotations
 
-import numpy as np
-from tensorflow import keras
-
-
-class MNIST:
-
-    x_train_raw_data: np.ndarray
-    x_test_raw_data: np.ndarray
-    y_train_raw_data: np.ndarray
-    y_test_raw_data: np.ndarray
-    num_classes: int
-
-    def __init__(self):
-        train_data, test_data = keras.datasets.mnist.load_data()
+from typing import Optional
+
+# Shared with the other providers; see `DatasetProvider` for the methods
+# returning the data.
+from dataset_provider import DatasetProvider
+
+
+class MNIST(DatasetProvider):
+
+    num_classes = 10
+    cache_prefix = 'mnist'
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 scale_cache_bytes: int = 0, data_dir: Optional[str] = None):
+        """Loads the MNIST dataset.
+
+        Args:
+          cache_dir: see `DatasetProvider`.
+          scale_cache_bytes: see `DatasetProvider`.
+          data_dir: optional directory containing the MNIST IDX files (as
+            distributed at http://yann.lecun.com/exdb/mnist/, either gzipped
+            or not); if provided, the dataset is read from there instead of
+            via Keras.
+        """
+        super().__init__(cache_dir, scale_cache_bytes, data_dir)
+
+    def _load(self, data_dir: Optional[str]) -> None:
+        if data_dir is None:
+            from tensorflow import keras
+            train_data, test_data = keras.datasets.mnist.load_data()
+        else:
+            # Imported here, as it's only needed when reading the files
+            # directly, rather than via Keras.
+            import mnist_idx
+            train_data, test_data = mnist_idx.load_data(data_dir)
         self.x_train_raw_data, self.y_train_raw_data = train_data
         self.x_test_raw_data, self.y_test_raw_data = test_data
-        self.num_classes = 10
-
-    def _scale_custom(self, array: np.ndarray,
-                      target_range: tuple[float, float]) -> np.ndarray:
-        lower_bound, upper_bound = target_range
-        assert lower_bound < upper_bound, f'range {target_range} must be (low, high) with low < high'
-        return array * (upper_bound - lower_bound) + lower_bound
-
-    def x_train_raw(self) -> np.ndarray:
-        return self.x_train_raw_data
-
-    def x_train_scale_0_1(self) -> np.ndarray:
-        return self.x_train_raw().astype('float32') / 255.0
-
-    def x_train_scale_custom(self, target_range: tuple[float, float]) -> np.ndarray:
-        return self._scale_custom(self.x_train_scale_0_1(), target_range)
-
-    def x_test_raw(self) -> np.ndarray:
-        return self.x_test_raw_data
-
-    def x_test_scale_0_1(self) -> np.ndarray:
-        return self.x_test_raw_data.astype('float32') / 255.0
-
-    def x_test_scale_custom(self, target_range: tuple[float, float]) -> np.ndarray:
-        return self._scale_custom(self.x_test_scale_0_1(), target_range)
-
-    def y_train_raw(self) -> np.ndarray:
-        return self.y_train_raw_data
-
-    def y_train_categorical(self) -> np.ndarray:
-        return keras.utils.to_categorical(self.y_train_raw(), self.num_classes)
-
-    def y_test_raw(self) -> np.ndarray:
-        return self.y_test_raw_data
-
-    def y_test_categorical(self) -> np.ndarray:
-        return keras.utils.to_categorical(self.y_test_raw(), self.num_classes)
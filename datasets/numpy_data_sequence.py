@@ -12,19 +12,135 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
 from data_sequence import DataSequenceWithShuffling, Strategy
 
+import itertools
+from typing import Any, Dict, Optional
+
 import numpy as np
 
 
 class NumpyStrategy(Strategy):
+    # Like `Strategy.rng`, a private generator rather than NumPy's global one.
+    generator: np.random.Generator
+
     def __init__(self):
-        super().__init__(range_fn=np.arange, shuffle_fn=np.random.shuffle)
+        self.generator = np.random.default_rng()
+        super().__init__(range_fn=np.arange, shuffle_fn=self.generator.shuffle,
+                         seeded_shuffle_fn=lambda seed: np.random.RandomState(seed).shuffle)
+
+    def state_dict(self) -> Dict[str, Any]:
+        return {'rng_state': self.generator.bit_generator.state}
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        self.generator.bit_generator.state = state['rng_state']
 
 
 class NumpyDataSequence(DataSequenceWithShuffling):
     """Numpy-based implementation of `keras.utils.Sequence`."""
 
-    def __init__(self, num_items: int, batch_size: int, shuffle: bool = True):
+    def __init__(self, num_items: int, batch_size: int, shuffle: bool = True,
+                 seed: Optional[int] = None):
         super().__init__(num_items=num_items, batch_size=batch_size,
-                         shuffle=shuffle, strategy=NumpyStrategy())
+                         shuffle=shuffle, strategy=NumpyStrategy(), seed=seed)
+
+
+def one_hot(labels: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Writes the one-hot encoding of `labels` into `out`, which it returns.
+
+    `out` must have shape `(len(labels), num_classes)`, and any numeric dtype.
+    """
+    out.fill(0)
+    out[np.arange(len(labels)), labels] = 1
+    return out
+
+
+class NumpyBatchSequence:
+    """Gathers each batch of a `DataSequenceWithShuffling` from `x` and `y`.
+
+    Rather than allocating new arrays for every batch, rows are gathered into
+    one of `num_buffers` preallocated buffers, used in rotation. The arrays
+    returned by `__getitem__()` are views into these buffers, so they are
+    overwritten `num_buffers` calls later; callers which need to hold onto more
+    batches at a time (e.g., when prefetching) should increase `num_buffers`,
+    or copy the batches they need to keep.
+
+    The last batch may be smaller than the others, if the total number of
+    items is not a multiple of batch size; it is returned as a shorter view
+    into the same buffer.
+
+    By default, labels `y` are returned as-is (e.g., as class ids, for use with
+    sparse losses); if `num_classes` is given, they are one-hot encoded into
+    buffers of `y_dtype`, one batch at a time, so the one-hot encoding of the
+    entire dataset never needs to be held in memory.
+    """
+
+    sequence: DataSequenceWithShuffling
+    x: np.ndarray
+    y: np.ndarray
+    num_classes: Optional[int]
+
+    def __init__(self, sequence: DataSequenceWithShuffling,
+                 x: np.ndarray, y: np.ndarray, num_buffers: int = 2,
+                 num_classes: Optional[int] = None, y_dtype: Any = 'float32'):
+        # Positions index all items, even when `sequence` only covers some of
+        # them, as with a `ShardedDataSequence`.
+        num_items = getattr(sequence, 'total_num_items', sequence.num_items)
+        assert len(x) == len(y) == num_items, (
+            f'len(x) = {len(x)} and len(y) = {len(y)} must both equal '
+            f'the number of items = {num_items}')
+        assert num_buffers >= 1, f'num_buffers must be >= 1; received: {num_buffers}'
+        self.sequence = sequence
+        self.x = x
+        self.num_classes = num_classes
+        self._x_buffers = [np.empty((sequence.batch_size,) + x.shape[1:], dtype=x.dtype)
+                           for _ in range(num_buffers)]
+        if num_classes is None:
+            self.y = y
+            self._label_buffers = None
+            self._y_buffers = [np.empty((sequence.batch_size,) + y.shape[1:], dtype=y.dtype)
+                               for _ in range(num_buffers)]
+        else:
+            # Labels of shape `(N, 1)`, as used by CIFAR-10, become `(N,)`.
+            self.y = y.reshape(len(y))
+            self._label_buffers = [np.empty((sequence.batch_size,), dtype=y.dtype)
+                                   for _ in range(num_buffers)]
+            self._y_buffers = [np.empty((sequence.batch_size, num_classes), dtype=y_dtype)
+                               for _ in range(num_buffers)]
+        # `next()` on a counter is atomic, so buffers are handed out correctly
+        # even when batches are being gathered on several threads at once.
+        self._buffer_counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self.sequence)
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        (low, high), positions = self.sequence[index]
+        buffer = next(self._buffer_counter) % len(self._x_buffers)
+
+        x_batch = self._x_buffers[buffer][:high - low]
+        y_batch = self._y_buffers[buffer][:high - low]
+        np.take(self.x, positions, axis=0, out=x_batch)
+        if self._label_buffers is None:
+            np.take(self.y, positions, axis=0, out=y_batch)
+        else:
+            labels = self._label_buffers[buffer][:high - low]
+            np.take(self.y, positions, out=labels)
+            one_hot(labels, out=y_batch)
+        return x_batch, y_batch
+
+    def on_epoch_end(self):
+        self.sequence.on_epoch_end()
+
+    def state_dict(self) -> Dict[str, Any]:
+        return self.sequence.state_dict()
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        self.sequence.load_state_dict(state)
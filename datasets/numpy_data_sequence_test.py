@@ -0,0 +1,138 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from data_sequence import DataSequenceWithShuffling, ShardedDataSequence
+from numpy_data_sequence import NumpyBatchSequence, NumpyDataSequence, one_hot
+
+import numpy as np
+import unittest
+
+
+class NumpyDataSequenceTest(unittest.TestCase):
+
+    def testResumeLeavesGlobalRandomStateAlone(self):
+        np.random.seed(0)
+        expected = np.random.random(2)
+        np.random.seed(0)
+        data = NumpyDataSequence(num_items=100, batch_size=16)
+        state = data.state_dict()
+        data.on_epoch_end()
+        next_epoch = [list(data[index][1]) for index in range(len(data))]
+        actual = [np.random.random()]
+
+        resumed = NumpyDataSequence(num_items=100, batch_size=16)
+        resumed.load_state_dict(state)
+        actual.append(np.random.random())
+        resumed.on_epoch_end()
+        self.assertEqual([list(resumed[index][1]) for index in range(len(resumed))], next_epoch)
+        np.testing.assert_array_equal(actual, expected)
+
+
+class NumpyBatchSequenceTest(unittest.TestCase):
+
+    def testWithoutShufflingUnequalBatches(self):
+        x = np.arange(100 * 3, dtype=np.uint8).reshape((100, 3))
+        y = np.arange(100, dtype=np.int64)
+        data = NumpyBatchSequence(
+            DataSequenceWithShuffling(num_items=100, batch_size=32, shuffle=False),
+            x, y)
+        self.assertEqual(len(data), 4)
+
+        for index, (low, high) in enumerate([(0, 32), (32, 64), (64, 96), (96, 100)]):
+            x_batch, y_batch = data[index]
+            np.testing.assert_array_equal(x_batch, x[low:high])
+            np.testing.assert_array_equal(y_batch, y[low:high])
+
+    def testWithShufflingMatchesPositions(self):
+        x = np.arange(75 * 2, dtype=np.float32).reshape((75, 2))
+        y = np.arange(75, dtype=np.int64)
+        sequence = NumpyDataSequence(num_items=75, batch_size=25, shuffle=True)
+        data = NumpyBatchSequence(sequence, x, y)
+
+        all_labels_seen = []
+        for index in range(len(data)):
+            _, positions = sequence[index]
+            x_batch, y_batch = data[index]
+            np.testing.assert_array_equal(x_batch, x[positions])
+            np.testing.assert_array_equal(y_batch, y[positions])
+            all_labels_seen.extend(y_batch)
+
+        # Ensure that each position was represented exactly once.
+        self.assertEqual(sorted(all_labels_seen), list(range(0, 75)))
+
+    def testOutOfRangePositionsRaise(self):
+        class OutOfRangeSequence(DataSequenceWithShuffling):
+            def __getitem__(self, index):
+                item_range, positions = super().__getitem__(index)
+                return item_range, [self.num_items] + list(positions[1:])
+
+        data = NumpyBatchSequence(OutOfRangeSequence(num_items=20, batch_size=10),
+                                  np.zeros((20, 2)), np.zeros((20,)))
+        with self.assertRaises(IndexError):
+            _ = data[0]
+
+    def testBuffersAreReusedInRotation(self):
+        x = np.zeros((40, 2), dtype=np.uint8)
+        y = np.zeros((40,), dtype=np.uint8)
+        data = NumpyBatchSequence(
+            DataSequenceWithShuffling(num_items=40, batch_size=10, shuffle=False),
+            x, y, num_buffers=3)
+
+        batches = [data[index][0] for index in range(4)]
+        self.assertFalse(np.shares_memory(batches[0], batches[1]))
+        self.assertFalse(np.shares_memory(batches[1], batches[2]))
+        self.assertTrue(np.shares_memory(batches[0], batches[3]))
+
+    def testOneHotLabels(self):
+        x = np.zeros((50, 2), dtype=np.uint8)
+        y = (np.arange(50, dtype=np.uint8) % 10).reshape((50, 1))
+        sequence = NumpyDataSequence(num_items=50, batch_size=16)
+        data = NumpyBatchSequence(sequence, x, y, num_classes=10, y_dtype=np.float16)
+
+        for index in range(len(data)):
+            _, positions = sequence[index]
+            _, y_batch = data[index]
+            self.assertEqual(y_batch.dtype, np.float16)
+            self.assertEqual(y_batch.shape, (len(positions), 10))
+            np.testing.assert_array_equal(np.argmax(y_batch, axis=1), y[positions, 0])
+            np.testing.assert_array_equal(y_batch.sum(axis=1), 1)
+
+    def testShardedSequence(self):
+        x = np.arange(10 * 2, dtype=np.uint8).reshape((10, 2))
+        y = np.arange(10, dtype=np.int64)
+        sequence = ShardedDataSequence(num_items=10, batch_size=2, rank=1, world_size=2)
+        data = NumpyBatchSequence(sequence, x, y)
+        self.assertEqual(len(data), 3)
+
+        for index in range(len(data)):
+            _, positions = sequence[index]
+            x_batch, y_batch = data[index]
+            np.testing.assert_array_equal(x_batch, x[positions])
+            np.testing.assert_array_equal(y_batch, y[positions])
+
+
+class OneHotTest(unittest.TestCase):
+
+    def testOneHot(self):
+        out = np.full((3, 4), 7, dtype=np.uint8)
+        result = one_hot(np.array([2, 0, 3]), out=out)
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(
+            out, [[0, 0, 1, 0], [1, 0, 0, 0], [0, 0, 0, 1]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Prefetches batches of a data sequence on background threads."""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+def _cancel_or_wait(futures: Iterable[Future]) -> None:
+    """Cancels the futures which haven't started, and waits for the others."""
+    for future in futures:
+        if not future.cancel():
+            future.exception()
+
+
+class PrefetchingSequence:
+    """Wraps a sequence to compute upcoming batches on a thread pool.
+
+    Works with any of the sequences in `data_sequence.py`, as well as with
+    `NumpyBatchSequence`: when batch `i` is requested, batches `i + 1` through
+    `i + queue_depth` are submitted to the thread pool, and each batch is
+    returned in order, as soon as it is ready.
+
+    Once every batch of an epoch has been returned, the wrapped sequence's
+    `on_epoch_end()` is run in the background, followed by the first
+    `queue_depth` batches of the next epoch, so they are prepared while the
+    last batch of the current epoch is still being consumed. Consequently,
+    callers must call `on_epoch_end()` between epochs (as Keras does), rather
+    than requesting batches of the finished epoch again; the only exception is
+    the batch returned last, which is returned again if requested, as when
+    Keras peeks at the first batch of a single-batch epoch.
+
+    Notes:
+
+    * When training with Keras, pass `shuffle=False` to `Model.fit()`, or it
+      will request batches in a random order, defeating the prefetching; this
+      is independent of shuffling the items within the sequence itself.
+
+    * When wrapping a `NumpyBatchSequence`, its `num_buffers` must be at least
+      `queue_depth + 2`, so that prefetched batches don't overwrite the one
+      being consumed.
+
+    * To save a checkpoint, use the `state_dict()` of this wrapper, rather
+      than that of the wrapped sequence, which is ahead of the caller.
+    """
+
+    sequence: Any
+    queue_depth: int
+
+    def __init__(self, sequence: Any, num_workers: int = 1, queue_depth: int = 2):
+        assert num_workers >= 1, f'num_workers must be >= 1; received: {num_workers}'
+        assert queue_depth >= 1, f'queue_depth must be >= 1; received: {queue_depth}'
+        self.sequence = sequence
+        self.queue_depth = queue_depth
+        self._executor = ThreadPoolExecutor(max_workers=num_workers,
+                                            thread_name_prefix='prefetch')
+        # Batches submitted for the current epoch, keyed by batch index.
+        self._pending: Dict[int, Future] = {}
+        # Indexes of batches already returned during the current epoch.
+        self._returned: Set[int] = set()
+        # Set once the current epoch has been fully returned, and the next one
+        # is being prepared in the background.
+        self._next_epoch: Optional[Future] = None
+        self._next_pending: Dict[int, Future] = {}
+        # The batch returned last, as `(index, batch)`, kept for re-requests
+        # once the epoch has been fully returned.
+        self._last: Optional[tuple[int, Any]] = None
+        # The wrapped sequence's state as of the last batch of the epoch, saved
+        # before it moves on to the next epoch in the background.
+        self._epoch_end_state: Optional[Dict[str, Any]] = None
+
+    def __len__(self) -> int:
+        return len(self.sequence)
+
+    def __getitem__(self, index: int) -> Any:
+        if self._next_epoch is not None:
+            # The wrapped sequence may already be reshuffled for the next
+            # epoch, so only the batch returned last is still available.
+            if self._last is not None and self._last[0] == index:
+                return self._last[1]
+            raise RuntimeError(
+                'All batches of this epoch have been returned; call '
+                '`on_epoch_end()` before requesting more.')
+
+        # Drop batches we have already moved past, e.g., if the caller skipped
+        # ahead; `cancel()` is a no-op for batches which have already started.
+        for stale in [i for i in self._pending if i < index]:
+            self._pending.pop(stale).cancel()
+
+        future = self._pending.pop(index, None)
+        self._submit(range(index + 1, min(index + 1 + self.queue_depth, len(self))))
+        batch = future.result() if future is not None else self.sequence[index]
+
+        self._returned.add(index)
+        self._last = (index, batch)
+        if len(self._returned) == len(self) and not self._pending:
+            self._prepare_next_epoch()
+        return batch
+
+    def _submit(self, indexes: range) -> None:
+        for i in indexes:
+            if i not in self._pending and i not in self._returned:
+                self._pending[i] = self._executor.submit(self.sequence.__getitem__, i)
+
+    def _prepare_next_epoch(self) -> None:
+        if hasattr(self.sequence, 'state_dict'):
+            self._epoch_end_state = self._returned_state()
+        next_epoch = self._executor.submit(self._sequence_on_epoch_end)
+
+        def get_batch(index: int) -> Any:
+            next_epoch.result()
+            return self.sequence[index]
+
+        self._next_epoch = next_epoch
+        self._next_pending = {
+            i: self._executor.submit(get_batch, i)
+            for i in range(min(self.queue_depth, len(self)))}
+
+    def _sequence_on_epoch_end(self) -> None:
+        # Like `keras.utils.Sequence`, `DataSequence` doesn't need to do
+        # anything between epochs, so it doesn't define `on_epoch_end()`.
+        on_epoch_end = getattr(self.sequence, 'on_epoch_end', None)
+        if on_epoch_end is not None:
+            on_epoch_end()
+
+    def on_epoch_end(self):
+        if self._next_epoch is not None:
+            self._next_epoch.result()
+            self._pending = self._next_pending
+        else:
+            # The epoch ended before all batches were requested: batches still
+            # in flight must finish before the sequence is reshuffled.
+            _cancel_or_wait(self._pending.values())
+            self._sequence_on_epoch_end()
+            self._pending = {}
+        self._next_epoch = None
+        self._next_pending = {}
+        self._returned = set()
+        self._last = None
+        self._epoch_end_state = None
+
+    def _returned_state(self) -> Dict[str, Any]:
+        state = self.sequence.state_dict()
+        state['cursor'] = self._last[0] + 1 if self._last is not None else 0
+        return state
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the wrapped sequence's state as of the batch returned last.
+
+        The wrapped sequence has already been asked for the batches prefetched
+        since, and perhaps moved on to the next epoch, so its own `cursor` (and
+        `epoch`) would skip them on resuming.
+        """
+        if self._epoch_end_state is not None:
+            return dict(self._epoch_end_state)
+        return self._returned_state()
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restores the state previously returned by `state_dict()`.
+
+        Batches already prefetched are discarded, once those in progress have
+        finished, so that they don't race with restoring the state.
+        """
+        _cancel_or_wait(self._next_pending.values())
+        _cancel_or_wait(self._pending.values())
+        if self._next_epoch is not None:
+            _cancel_or_wait([self._next_epoch])
+        self.sequence.load_state_dict(state)
+        self._pending = {}
+        self._next_epoch = None
+        self._next_pending = {}
+        # Batches before the cursor count as returned, so that the next epoch
+        # is still prepared ahead of time once the rest have been returned.
+        self._returned = set(range(state.get('cursor', 0)))
+        self._last = None
+        self._epoch_end_state = None
+
+    def close(self) -> None:
+        """Stops the worker threads; pending batches are discarded."""
+        for future in (*self._pending.values(), *self._next_pending.values()):
+            future.cancel()
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self) -> PrefetchingSequence:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from data_sequence import DataSequence, DataSequenceWithShuffling
+from prefetch_sequence import PrefetchingSequence
+
+import unittest
+
+
+class PrefetchingSequenceTest(unittest.TestCase):
+
+    def testMatchesWrappedSequence(self):
+        data = DataSequence(num_items=100, batch_size=32)
+        with PrefetchingSequence(data, num_workers=2, queue_depth=3) as prefetched:
+            self.assertEqual(len(prefetched), 4)
+            for index in range(len(prefetched)):
+                self.assertEqual(prefetched[index], data[index])
+
+    def testEachEpochSeesEachPositionOnce(self):
+        num_items = 100
+        data = DataSequenceWithShuffling(num_items=num_items, batch_size=32)
+        with PrefetchingSequence(data, num_workers=2) as prefetched:
+            epochs = []
+            for _ in range(3):
+                all_indices_seen = []
+                for index in range(len(prefetched)):
+                    _, positions = prefetched[index]
+                    all_indices_seen.extend(positions)
+                prefetched.on_epoch_end()
+                epochs.append(all_indices_seen)
+
+        for all_indices_seen in epochs:
+            self.assertEqual(sorted(all_indices_seen), list(range(0, num_items)))
+        # The next epoch's batches are prepared ahead of time, but only after
+        # the sequence has been reshuffled.
+        self.assertNotEqual(epochs[0], epochs[1])
+
+    def testPartialEpoch(self):
+        data = DataSequenceWithShuffling(num_items=100, batch_size=10)
+        with PrefetchingSequence(data, queue_depth=4) as prefetched:
+            _ = prefetched[0]
+            prefetched.on_epoch_end()
+            all_indices_seen = []
+            for index in range(len(prefetched)):
+                _, positions = prefetched[index]
+                all_indices_seen.extend(positions)
+            self.assertEqual(sorted(all_indices_seen), list(range(0, 100)))
+
+    def testRequestAfterEpochWithoutOnEpochEnd(self):
+        data = DataSequence(num_items=10, batch_size=5)
+        with PrefetchingSequence(data) as prefetched:
+            _ = prefetched[0]
+            _ = prefetched[1]
+            with self.assertRaises(RuntimeError):
+                _ = prefetched[0]
+
+    def testRequestLastBatchAgain(self):
+        # E.g., Keras peeks at the first batch before iterating over them.
+        data = DataSequenceWithShuffling(num_items=5, batch_size=8)
+        with PrefetchingSequence(data) as prefetched:
+            for _ in range(3):
+                peeked = prefetched[0]
+                self.assertIs(prefetched[0], peeked)
+                self.assertEqual(sorted(peeked[1]), list(range(5)))
+                prefetched.on_epoch_end()
+
+    def testResume(self):
+        def batches(prefetched, indexes):
+            return [(r, list(p)) for r, p in (prefetched[index] for index in indexes)]
+
+        def make_sequence():
+            # Without a seed, resuming needs the saved permutation and RNG.
+            return DataSequenceWithShuffling(num_items=100, batch_size=10)
+
+        with PrefetchingSequence(make_sequence(), num_workers=2, queue_depth=4) as prefetched:
+            _ = batches(prefetched, range(3))
+            # The wrapped sequence is ahead, but the state is as of batch 2.
+            mid_epoch = prefetched.state_dict()
+            self.assertEqual(mid_epoch['cursor'], 3)
+            expected = batches(prefetched, range(3, len(prefetched)))
+            # By now, the next epoch is being prepared in the background.
+            end_of_epoch = prefetched.state_dict()
+            self.assertEqual((end_of_epoch['epoch'], end_of_epoch['cursor']),
+                             (mid_epoch['epoch'], len(prefetched)))
+            prefetched.on_epoch_end()
+            expected_next_epoch = batches(prefetched, range(len(prefetched)))
+
+        for state, expected_rest in ((mid_epoch, expected), (end_of_epoch, [])):
+            with PrefetchingSequence(make_sequence(), queue_depth=4) as resumed:
+                # Batches being prefetched are discarded when loading.
+                _ = resumed[0]
+                resumed.load_state_dict(state)
+                self.assertEqual(batches(resumed, range(state['cursor'], len(resumed))),
+                                 expected_rest)
+                resumed.on_epoch_end()
+                self.assertEqual(batches(resumed, range(len(resumed))), expected_next_epoch)
+
+    def testRequestEarlierBatchAgainMidEpoch(self):
+        data = DataSequence(num_items=10, batch_size=5)
+        with PrefetchingSequence(data) as prefetched:
+            self.assertEqual(prefetched[0], data[0])
+            self.assertEqual(prefetched[0], data[0])
+            self.assertEqual(prefetched[1], data[1])
+            prefetched.on_epoch_end()
+            self.assertEqual(prefetched[0], data[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Caches the results of expensive, deterministic per-sample transforms."""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import collections
+import functools
+import tempfile
+import threading
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+
+
+class SampleCache:
+    """Least-recently-used cache of samples, within a memory budget.
+
+    Samples are kept in memory while their total size stays within
+    `max_bytes`. If `spill_bytes` is set, the least-recently-used samples
+    evicted from memory are moved into a memory-mapped temporary file (in
+    `spill_dir`, or the default temporary directory) of that size instead of
+    being dropped, as long as they have the same shape and dtype as the first
+    sample spilled, which is typical of, e.g., decoded and resized images.
+
+    Cached samples are read-only, as they are shared between callers. All
+    methods are thread-safe, so a cache can be used from the worker threads of
+    a `PrefetchingSequence`; samples are computed outside of the lock.
+    """
+
+    max_bytes: int
+    spill_bytes: int
+    hits: int
+    spill_hits: int
+    misses: int
+
+    def __init__(self, max_bytes: int, spill_bytes: int = 0,
+                 spill_dir: Optional[str] = None):
+        self.max_bytes = max_bytes
+        self.spill_bytes = spill_bytes
+        self.hits = 0
+        self.spill_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Entries are kept in least-recently-used order, oldest first.
+        self._memory: collections.OrderedDict[Hashable, np.ndarray] = collections.OrderedDict()
+        self._memory_bytes = 0
+        self._spill_dir = spill_dir
+        self._spill_file: Optional[Any] = None
+        self._spill: Optional[np.memmap] = None
+        self._spill_slots: collections.OrderedDict[Hashable, int] = collections.OrderedDict()
+        self._free_slots: List[int] = []
+
+    def get(self, key: Hashable, compute: Callable[[], np.ndarray]) -> np.ndarray:
+        """Returns the sample cached for `key`, calling `compute()` if needed."""
+        with self._lock:
+            sample = self._memory.get(key)
+            if sample is not None:
+                self.hits += 1
+                self._memory.move_to_end(key)
+                return sample
+            slot = self._spill_slots.pop(key, None)
+            if slot is not None:
+                self.spill_hits += 1
+                assert self._spill is not None
+                sample = np.array(self._spill[slot])
+                self._free_slots.append(slot)
+                self._insert(key, sample)
+                return sample
+            self.misses += 1
+
+        sample = np.array(compute())
+        with self._lock:
+            # Another thread may have computed the same sample meanwhile.
+            if key not in self._memory:
+                self._insert(key, sample)
+        return sample
+
+    def _insert(self, key: Hashable, sample: np.ndarray) -> None:
+        # If another thread computed the same sample, and it has been spilled
+        # since, free its slot, so that it isn't orphaned by the next spill.
+        slot = self._spill_slots.pop(key, None)
+        if slot is not None:
+            self._free_slots.append(slot)
+        sample.setflags(write=False)
+        self._memory[key] = sample
+        self._memory_bytes += sample.nbytes
+        while self._memory_bytes > self.max_bytes:
+            evicted_key, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+            self._spill_sample(evicted_key, evicted)
+
+    def _spill_sample(self, key: Hashable, sample: np.ndarray) -> None:
+        if self.spill_bytes < sample.nbytes:
+            return
+        if self._spill is None:
+            num_slots = self.spill_bytes // max(1, sample.nbytes)
+            self._spill_file = tempfile.NamedTemporaryFile(
+                dir=self._spill_dir, prefix='sample-cache-', suffix='.bin')
+            self._spill = np.memmap(self._spill_file, dtype=sample.dtype, mode='w+',
+                                    shape=(num_slots,) + sample.shape)
+            self._free_slots = list(range(num_slots - 1, -1, -1))
+        if sample.shape != self._spill.shape[1:] or sample.dtype != self._spill.dtype:
+            return
+        if not self._free_slots:
+            _, slot = self._spill_slots.popitem(last=False)
+            self._free_slots.append(slot)
+        slot = self._free_slots.pop()
+        self._spill[slot] = sample
+        self._spill_slots[key] = slot
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the hit and miss counters, and the current cache sizes."""
+        with self._lock:
+            return {'hits': self.hits, 'spill_hits': self.spill_hits,
+                    'misses': self.misses, 'memory_samples': len(self._memory),
+                    'memory_bytes': self._memory_bytes,
+                    'spill_samples': len(self._spill_slots)}
+
+    def clear(self) -> None:
+        """Drops all cached samples, and the spill file; counters are kept."""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+            self._spill_slots.clear()
+            self._free_slots = []
+            self._spill = None
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    def close(self) -> None:
+        self.clear()
+
+    def __enter__(self) -> SampleCache:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CachedTransformSequence:
+    """Returns batches of transformed samples, caching the transform's results.
+
+    For each batch of positions from `sequence` (e.g., a
+    `DataSequenceWithShuffling`), returns `(x, y)`, where `x` stacks
+    `transform(position)` for each position, and `y` holds the corresponding
+    rows of `y`. `transform` must be deterministic (e.g., decoding, resizing
+    and normalizing); its results are cached in `cache` under
+    `(fingerprint, position)`, so `fingerprint` must change whenever the
+    transform does, e.g., to a version string, or a hash of its parameters.
+
+    Random transforms, such as augmentation, belong after this sequence, so
+    that they still differ in each epoch; e.g., wrap it in an
+    `AugmentingSequence`.
+    """
+
+    sequence: Any
+    transform: Callable[[int], np.ndarray]
+    fingerprint: Hashable
+    y: np.ndarray
+    cache: SampleCache
+
+    def __init__(self, sequence: Any, transform: Callable[[int], np.ndarray],
+                 fingerprint: Hashable, y: np.ndarray, cache: SampleCache):
+        self.sequence = sequence
+        self.transform = transform
+        self.fingerprint = fingerprint
+        self.y = y
+        self.cache = cache
+
+    def __len__(self) -> int:
+        return len(self.sequence)
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, np.ndarray]:
+        _, positions = self.sequence[index]
+        x_batch = np.stack([
+            self.cache.get((self.fingerprint, position),
+                           functools.partial(self.transform, position))
+            for position in positions])
+        return x_batch, np.take(self.y, positions, axis=0)
+
+    def on_epoch_end(self):
+        # Like `keras.utils.Sequence`, `DataSequence` doesn't need to do
+        # anything between epochs, so it doesn't define `on_epoch_end()`.
+        on_epoch_end = getattr(self.sequence, 'on_epoch_end', None)
+        if on_epoch_end is not None:
+            on_epoch_end()
+
+    def state_dict(self) -> Dict[str, Any]:
+        return self.sequence.state_dict()
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        self.sequence.load_state_dict(state)
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from data_sequence import DataSequenceWithShuffling
+from prefetch_sequence import PrefetchingSequence
+from sample_cache import CachedTransformSequence, SampleCache
+
+import numpy as np
+import unittest
+
+
+def sample(index):
+    return np.full((4,), index, dtype=np.int64)
+
+
+class SampleCacheTest(unittest.TestCase):
+
+    def testLeastRecentlyUsedEviction(self):
+        # Room for exactly two samples of 32 bytes each.
+        with SampleCache(max_bytes=64) as cache:
+            for index in (0, 1, 0, 2):
+                np.testing.assert_array_equal(cache.get(index, lambda: sample(index)), sample(index))
+            # Sample 1 was the least recently used one when 2 was added.
+            self.assertEqual(cache.stats(), {
+                'hits': 1, 'spill_hits': 0, 'misses': 3, 'memory_samples': 2,
+                'memory_bytes': 64, 'spill_samples': 0})
+            cache.get(0, lambda: self.fail('sample 0 should be cached'))
+            cache.get(1, lambda: sample(1))
+            self.assertEqual(cache.misses, 4)
+
+    def testCachedSamplesAreReadOnly(self):
+        with SampleCache(max_bytes=1024) as cache:
+            cached = cache.get('key', lambda: sample(3))
+            with self.assertRaises(ValueError):
+                cached[0] = 0
+
+    def testSpillToMemoryMappedFile(self):
+        with SampleCache(max_bytes=32, spill_bytes=64) as cache:
+            for index in range(4):
+                cache.get(index, lambda: sample(index))
+            # Sample 3 is in memory, 1 and 2 were spilled, and 0 was dropped.
+            self.assertEqual(cache.stats()['spill_samples'], 2)
+            for index in (1, 2):
+                np.testing.assert_array_equal(
+                    cache.get(index, lambda: self.fail(f'sample {index} should be spilled')),
+                    sample(index))
+            self.assertEqual(cache.spill_hits, 2)
+            np.testing.assert_array_equal(cache.get(0, lambda: sample(0)), sample(0))
+            self.assertEqual(cache.misses, 5)
+
+    def testConcurrentComputeFreesSpillSlot(self):
+        with SampleCache(max_bytes=32, spill_bytes=64) as cache:
+            def compute():
+                # Meanwhile, another thread computes sample 0, which is then
+                # spilled to make room for sample 1.
+                cache.get(0, lambda: sample(0))
+                cache.get(1, lambda: sample(1))
+                return sample(0)
+
+            cache.get(0, compute)
+            # Sample 0 is back in memory, and only sample 1 is spilled.
+            self.assertEqual(cache.stats()['spill_samples'], 1)
+            cache.get(2, lambda: sample(2))
+            # Both spill slots are in use, by samples 0 and 1.
+            self.assertEqual(cache.stats()['spill_samples'], 2)
+            for index in (0, 1):
+                np.testing.assert_array_equal(
+                    cache.get(index, lambda: self.fail(f'sample {index} should be spilled')),
+                    sample(index))
+
+
+class CachedTransformSequenceTest(unittest.TestCase):
+
+    def testTransformRunsOncePerSample(self):
+        calls = []
+
+        def transform(position):
+            calls.append(position)
+            return sample(position)
+
+        y = np.arange(50) * 10
+        sequence = DataSequenceWithShuffling(num_items=50, batch_size=16)
+        cache = SampleCache(max_bytes=2**20)
+        with PrefetchingSequence(CachedTransformSequence(
+                sequence, transform, fingerprint='v1', y=y, cache=cache),
+                num_workers=2) as data:
+            for _ in range(3):
+                for index in range(len(data)):
+                    x_batch, y_batch = data[index]
+                    np.testing.assert_array_equal(x_batch[:, 0] * 10, y_batch)
+                data.on_epoch_end()
+
+        self.assertEqual(sorted(calls), list(range(50)))
+        self.assertEqual(cache.misses, 50)
+        # The prefetcher may also have started on the next epoch.
+        self.assertGreaterEqual(cache.hits, 100)
+
+    def testFingerprintSeparatesTransforms(self):
+        cache = SampleCache(max_bytes=2**20)
+        y = np.zeros(10)
+        sequence = DataSequenceWithShuffling(num_items=10, batch_size=10, shuffle=False)
+        doubled = CachedTransformSequence(sequence, lambda i: sample(2 * i), 'double', y, cache)
+        tripled = CachedTransformSequence(sequence, lambda i: sample(3 * i), 'triple', y, cache)
+        np.testing.assert_array_equal(doubled[0][0][:, 0], np.arange(10) * 2)
+        np.testing.assert_array_equal(tripled[0][0][:, 0], np.arange(10) * 3)
+        self.assertEqual(cache.misses, 20)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,285 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Prepares batches in worker processes, returning them via shared memory."""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import multiprocessing
+import os
+import queue
+import traceback
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from data_sequence import DataSequenceWithShuffling
+
+import numpy as np
+
+
+# Transforms a batch, given the positions of its items, into a tuple of arrays,
+# each with one row per position, e.g., `(x[positions], y[positions])`.
+_Transform = Callable[[Sequence[int]], Sequence[np.ndarray]]
+
+# Shape (excluding the batch dimension) and dtype of an output of `_Transform`.
+_OutputSpec = Tuple[Tuple[int, ...], Any]
+
+# The slot of a batch, and the `(low, high)` range of its items in the sequence.
+_SlotAndRange = Tuple[int, Tuple[int, int]]
+
+# How often to check that workers are still alive, while waiting for a batch.
+_POLL_INTERVAL_SECONDS = 1.0
+
+
+def _slot_arrays(blocks: List[SharedMemory], output_specs: Sequence[_OutputSpec],
+                 num_slots: int, batch_size: int) -> List[np.ndarray]:
+    return [np.ndarray((num_slots, batch_size) + tuple(shape), dtype=dtype,
+                       buffer=block.buf)
+            for block, (shape, dtype) in zip(blocks, output_specs)]
+
+
+def _worker(transform: _Transform, block_names: List[str],
+            output_specs: Sequence[_OutputSpec], num_slots: int,
+            batch_size: int, tasks: Any, results: Any) -> None:
+    blocks = [SharedMemory(name=name) for name in block_names]
+    arrays = _slot_arrays(blocks, output_specs, num_slots, batch_size)
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            epoch, index, slot, positions = task
+            try:
+                for array, output in zip(arrays, transform(positions)):
+                    array[slot, :len(positions)] = output
+                results.put((epoch, index, slot, None))
+            except Exception:
+                results.put((epoch, index, slot, traceback.format_exc()))
+    finally:
+        # Views into the shared memory must be released before closing it.
+        del arrays
+        for block in blocks:
+            block.close()
+
+
+class SharedMemoryBatchLoader:
+    """Prepares batches of a `DataSequenceWithShuffling` in worker processes.
+
+    Each batch is computed by `transform(positions)` in one of `num_workers`
+    processes, which writes its outputs into one of `num_slots` slots of a ring
+    buffer in shared memory; `__getitem__()` returns zero-copy views of that
+    slot, which remain valid until the next call to `__getitem__()`, at which
+    point the slot is recycled. Up to `num_slots - 1` upcoming batches are
+    prepared ahead of time.
+
+    `transform` is called in the worker processes, so it (and any data it
+    refers to) must be picklable when using the "spawn" or "forkserver" start
+    methods; with "fork", data such as memory-mapped arrays are shared with the
+    workers without copying.
+
+    Call `close()` (or use the loader as a context manager) to stop the workers
+    and release the shared memory. To save a checkpoint, use the loader's
+    `state_dict()`, rather than that of the sequence, which is ahead of the
+    caller.
+    """
+
+    sequence: DataSequenceWithShuffling
+    num_slots: int
+
+    def __init__(self, sequence: DataSequenceWithShuffling, transform: _Transform,
+                 output_specs: Sequence[_OutputSpec],
+                 num_workers: Optional[int] = None,
+                 num_slots: Optional[int] = None,
+                 start_method: Optional[str] = None):
+        """Starts the worker processes.
+
+        Args:
+          sequence: provides the positions of the items in each batch
+          transform: computes the outputs of a batch, given its positions
+          output_specs: `(shape, dtype)` of each output of `transform`, where
+            `shape` excludes the batch dimension
+          num_workers: number of worker processes; defaults to the CPU count
+          num_slots: number of batches in the ring buffer; must be at least 2,
+            and defaults to `2 * num_workers + 1`
+          start_method: `multiprocessing` start method to use for the workers
+        """
+        num_workers = num_workers or os.cpu_count() or 1
+        num_slots = num_slots or 2 * num_workers + 1
+        assert num_slots >= 2, f'num_slots must be >= 2; received: {num_slots}'
+
+        self.sequence = sequence
+        self.num_slots = num_slots
+        self._epoch = 0
+        # Batches submitted to the workers, mapped to their slots and ranges.
+        self._pending: Dict[int, _SlotAndRange] = {}
+        # Batches computed by the workers, mapped to their slots and ranges.
+        self._ready: Dict[int, _SlotAndRange] = {}
+        self._free_slots = list(range(num_slots))
+        # Number of tasks submitted to the workers, including stale ones.
+        self._in_flight = 0
+        self._slot_in_use: Optional[int] = None
+        # The index of the batch returned last during the current epoch.
+        self._last_index: Optional[int] = None
+        self._closed = False
+
+        batch_size = sequence.batch_size
+        self._blocks = [
+            SharedMemory(create=True,
+                         size=max(1, num_slots * batch_size *
+                                  int(np.prod(shape)) * np.dtype(dtype).itemsize))
+            for shape, dtype in output_specs]
+        self._arrays = _slot_arrays(self._blocks, output_specs, num_slots, batch_size)
+
+        context: Any = multiprocessing.get_context(start_method)
+        self._tasks = context.Queue()
+        self._results = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_worker, daemon=True,
+                args=(transform, [block.name for block in self._blocks],
+                      output_specs, num_slots, batch_size,
+                      self._tasks, self._results))
+            for _ in range(num_workers)]
+        for worker in self._workers:
+            worker.start()
+
+    def __len__(self) -> int:
+        return len(self.sequence)
+
+    def __getitem__(self, index: int) -> tuple[np.ndarray, ...]:
+        assert not self._closed, 'loader has been closed'
+        if self._slot_in_use is not None:
+            self._free_slots.append(self._slot_in_use)
+            self._slot_in_use = None
+
+        # Batches we have moved past (e.g., if the caller skipped ahead) will
+        # never be requested, so their slots can be reused.
+        for stale in [i for i in self._ready if i < index]:
+            self._free_slots.append(self._ready.pop(stale)[0])
+
+        if index not in self._pending and index not in self._ready:
+            while not self._free_slots:
+                if self._in_flight:
+                    self._receive()
+                else:
+                    # All slots hold batches further ahead than this one (e.g.,
+                    # if the caller went back), so we give up the furthest one.
+                    self._free_slots.append(self._ready.pop(max(self._ready))[0])
+            self._submit(index)
+        for upcoming in range(index + 1, min(index + self.num_slots, len(self))):
+            if not self._free_slots:
+                break
+            if upcoming not in self._pending and upcoming not in self._ready:
+                self._submit(upcoming)
+
+        while index not in self._ready:
+            self._receive()
+        slot, (low, high) = self._ready.pop(index)
+        self._slot_in_use = slot
+        self._last_index = index
+        return tuple(array[slot, :high - low] for array in self._arrays)
+
+    def _submit(self, index: int) -> None:
+        slot = self._free_slots.pop()
+        item_range, positions = self.sequence[index]
+        self._pending[index] = (slot, item_range)
+        self._in_flight += 1
+        self._tasks.put((self._epoch, index, slot, list(positions)))
+
+    def _receive(self) -> None:
+        """Waits for a single batch from the workers."""
+        while True:
+            try:
+                epoch, index, slot, error = self._results.get(
+                    timeout=_POLL_INTERVAL_SECONDS)
+                break
+            except queue.Empty:
+                if not all(worker.is_alive() for worker in self._workers):
+                    raise RuntimeError('a batch worker process exited unexpectedly')
+
+        self._in_flight -= 1
+        if epoch != self._epoch:
+            # Left over from a previous epoch; see `on_epoch_end()`.
+            self._free_slots.append(slot)
+            return
+        _, item_range = self._pending.pop(index)
+        if error is not None:
+            self._free_slots.append(slot)
+            raise RuntimeError(f'computing batch {index} failed:\n{error}')
+        self._ready[index] = (slot, item_range)
+
+    def _discard_batches(self) -> None:
+        # Any batches still pending were computed from the old permutation; we
+        # discard them as they arrive, by checking the epoch they belong to.
+        self._epoch += 1
+        self._free_slots.extend(slot for slot, _ in self._ready.values())
+        self._ready = {}
+        self._pending = {}
+        self._last_index = None
+
+    def on_epoch_end(self):
+        self._discard_batches()
+        self.sequence.on_epoch_end()
+
+    def state_dict(self) -> Dict[str, Any]:
+        """Returns the sequence's state as of the batch returned last.
+
+        The upcoming batches have already been requested from the sequence, so
+        its own `cursor` would skip them on resuming.
+        """
+        state = self.sequence.state_dict()
+        state['cursor'] = self._last_index + 1 if self._last_index is not None else 0
+        return state
+
+    def load_state_dict(self, state: Dict[str, Any]) -> None:
+        """Restores the state previously returned by `state_dict()`.
+
+        Batches already submitted to the workers are discarded, once they
+        have been computed.
+        """
+        assert not self._closed, 'loader has been closed'
+        self._discard_batches()
+        while self._in_flight:
+            self._receive()
+        self.sequence.load_state_dict(state)
+
+    def close(self) -> None:
+        """Stops the worker processes and releases the shared memory."""
+        if self._closed:
+            return
+        self._closed = True
+        for _ in self._workers:
+            self._tasks.put(None)
+        for worker in self._workers:
+            worker.join(timeout=10)
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._tasks.close()
+        self._results.close()
+        # Views into the shared memory must be released before closing it.
+        self._arrays = []
+        for block in self._blocks:
+            block.close()
+            block.unlink()
+
+    def __enter__(self) -> SharedMemoryBatchLoader:
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,120 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from data_sequence import DataSequenceWithShuffling
+from shared_memory_loader import SharedMemoryBatchLoader
+
+import numpy as np
+import unittest
+
+NUM_ITEMS = 100
+
+X = np.arange(NUM_ITEMS * 3, dtype=np.float32).reshape((NUM_ITEMS, 3))
+Y = np.arange(NUM_ITEMS, dtype=np.int64)
+
+OUTPUT_SPECS = [((3,), np.float32), ((), np.int64)]
+
+
+def gather(positions):
+    return X[positions] * 2, Y[positions]
+
+
+def fail(positions):
+    raise ValueError('bad batch')
+
+
+class SharedMemoryBatchLoaderTest(unittest.TestCase):
+
+    def testMatchesTransformAcrossEpochs(self):
+        sequence = DataSequenceWithShuffling(num_items=NUM_ITEMS, batch_size=32)
+        with SharedMemoryBatchLoader(sequence, gather, OUTPUT_SPECS,
+                                     num_workers=2, num_slots=3) as loader:
+            self.assertEqual(len(loader), 4)
+            for _ in range(2):
+                all_labels_seen = []
+                for index in range(len(loader)):
+                    _, positions = sequence[index]
+                    x_batch, y_batch = loader[index]
+                    np.testing.assert_array_equal(x_batch, X[positions] * 2)
+                    np.testing.assert_array_equal(y_batch, Y[positions])
+                    all_labels_seen.extend(y_batch)
+                loader.on_epoch_end()
+
+                # Ensure that each position was represented exactly once.
+                self.assertEqual(sorted(all_labels_seen), list(range(0, NUM_ITEMS)))
+
+    def testOutOfOrderAccess(self):
+        sequence = DataSequenceWithShuffling(num_items=NUM_ITEMS, batch_size=10)
+        with SharedMemoryBatchLoader(sequence, gather, OUTPUT_SPECS,
+                                     num_workers=2, num_slots=2) as loader:
+            for index in (5, 9, 2, 0, 7):
+                _, positions = sequence[index]
+                _, y_batch = loader[index]
+                np.testing.assert_array_equal(y_batch, Y[positions])
+
+    def testRequestsEachBatchOnce(self):
+        requested = []
+
+        class CountingSequence(DataSequenceWithShuffling):
+            def __getitem__(self, index):
+                requested.append(index)
+                return super().__getitem__(index)
+
+        sequence = CountingSequence(num_items=NUM_ITEMS, batch_size=10)
+        with SharedMemoryBatchLoader(sequence, gather, OUTPUT_SPECS,
+                                     num_workers=2, num_slots=3) as loader:
+            for index in range(len(loader)):
+                _, y_batch = loader[index]
+                self.assertEqual(len(y_batch), 10)
+        self.assertEqual(sorted(requested), list(range(len(sequence))))
+
+    def testResume(self):
+        def labels(loader, indexes):
+            return [list(loader[index][1]) for index in indexes]
+
+        def make_loader():
+            # Without a seed, resuming needs the saved permutation and RNG.
+            sequence = DataSequenceWithShuffling(num_items=NUM_ITEMS, batch_size=10)
+            return SharedMemoryBatchLoader(sequence, gather, OUTPUT_SPECS,
+                                           num_workers=2, num_slots=5)
+
+        with make_loader() as loader:
+            _ = labels(loader, range(3))
+            # The sequence is ahead, but the state is as of batch 2.
+            state = loader.state_dict()
+            self.assertEqual(state['cursor'], 3)
+            expected = labels(loader, range(3, len(loader)))
+            loader.on_epoch_end()
+            expected_next_epoch = labels(loader, range(len(loader)))
+
+        with make_loader() as resumed:
+            # Batches being computed are discarded when loading.
+            _ = resumed[0]
+            resumed.load_state_dict(state)
+            self.assertEqual(labels(resumed, range(state['cursor'], len(resumed))), expected)
+            resumed.on_epoch_end()
+            self.assertEqual(labels(resumed, range(len(resumed))), expected_next_epoch)
+
+    def testTransformErrorIsReported(self):
+        sequence = DataSequenceWithShuffling(num_items=NUM_ITEMS, batch_size=32)
+        with SharedMemoryBatchLoader(sequence, fail, OUTPUT_SPECS,
+                                     num_workers=1) as loader:
+            with self.assertRaisesRegex(RuntimeError, 'bad batch'):
+                _ = loader[0]
+
+
+if __name__ == '__main__':
+    unittest.main()
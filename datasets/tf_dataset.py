@@ -0,0 +1,101 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Builds a `tf.data.Dataset` from a data sequence and in-memory arrays."""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+import tensorflow as tf
+
+
+def make_dataset(sequence: Any, x: np.ndarray, y: np.ndarray,
+                 preprocess: Optional[Callable[[tf.Tensor, tf.Tensor], Any]] = None,
+                 num_parallel_calls: Optional[int] = tf.data.AUTOTUNE,
+                 cache: Optional[str] = None,
+                 prefetch: bool = True) -> tf.data.Dataset:
+    """Returns a dataset of the `(x, y)` batches described by `sequence`.
+
+    `sequence` is any of the sequences in `data_sequence.py` (or a subclass,
+    such as `NumpyDataSequence`): each epoch, batch `i` of the dataset holds
+    the rows of `x` and `y` at the positions of `sequence[i]`, so shuffling
+    and batch boundaries are the same as when using the sequence directly.
+    After the last batch of each epoch, `sequence.on_epoch_end()` is called,
+    as Keras does between epochs.
+
+    Args:
+      sequence: provides the positions of the rows in each batch.
+      x, y: the arrays to gather the rows from; e.g., a provider's raw arrays.
+      preprocess: optional function mapping a batch `(x, y)` to a new
+        `(x, y)`, e.g., to scale or one-hot encode it; it must only depend on
+        its inputs, so that it gives the same result for the same rows.
+      num_parallel_calls: number of batches gathered (and preprocessed) in
+        parallel; by default, tuned automatically by `tf.data`.
+      cache: if set, `preprocess` (which is then required) is applied to all
+        of `x` and `y`, a batch at a time in their original order, during the
+        first epoch, and the result is cached in memory (if `cache` is `''`)
+        or in files with this path prefix, which later epochs, and later
+        datasets with the same `cache`, read instead; caching the batches
+        themselves would instead freeze the order of the first epoch. So
+        `preprocess` must give the same result for every epoch, i.e., it
+        can't be a random augmentation. Each epoch gathers its batches from
+        the whole preprocessed split, which it reads into memory: a file
+        cache saves the preprocessing, not memory.
+      prefetch: whether to prepare upcoming batches while the current one is
+        in use, with a buffer size tuned automatically by `tf.data`.
+    """
+    if cache is not None and preprocess is None:
+        raise ValueError('cache requires preprocess: without it, there is nothing to cache')
+    num_batches = len(sequence)
+
+    def batch_positions() -> Iterator[np.ndarray]:
+        for index in range(num_batches):
+            _, positions = sequence[index]
+            yield np.asarray(positions, dtype=np.int64)
+        # Like `DataSequence`, some sequences have nothing to do between epochs.
+        on_epoch_end = getattr(sequence, 'on_epoch_end', None)
+        if on_epoch_end is not None:
+            on_epoch_end()
+
+    positions_dataset = tf.data.Dataset.from_generator(
+        batch_positions,
+        output_signature=tf.TensorSpec(shape=(None,), dtype=tf.int64))
+
+    def gather(x_split: tf.Tensor, y_split: tf.Tensor) -> tf.data.Dataset:
+        return positions_dataset.map(
+            lambda positions: (tf.gather(x_split, positions), tf.gather(y_split, positions)),
+            num_parallel_calls=num_parallel_calls)
+
+    if cache is not None:
+        split = tf.data.Dataset.from_tensor_slices((x, y)).batch(sequence.batch_size)
+        split = split.map(preprocess, num_parallel_calls=num_parallel_calls).cache(cache)
+        # Reads the whole split as a single element, once per epoch. The batch
+        # size is one more than the number of rows, so that the cache is read
+        # to its end: only then is it complete, and a file cache written.
+        split = split.unbatch().batch(len(x) + 1)
+        dataset = split.flat_map(gather)
+    else:
+        dataset = gather(tf.constant(x), tf.constant(y))
+        if preprocess is not None:
+            dataset = dataset.map(preprocess, num_parallel_calls=num_parallel_calls)
+    dataset = dataset.apply(tf.data.experimental.assert_cardinality(num_batches))
+    if prefetch:
+        dataset = dataset.prefetch(tf.data.AUTOTUNE)
+    return dataset
@@ -0,0 +1,104 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from data_sequence import DataSequenceWithShuffling
+from tf_dataset import make_dataset
+
+import os
+import tempfile
+
+import numpy as np
+import tensorflow as tf
+import unittest
+
+
+def scale(x, y):
+    return tf.cast(x, tf.float32) / 255.0, y
+
+
+class MakeDatasetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.x = np.arange(100 * 4, dtype=np.uint8).reshape((100, 2, 2))
+        self.y = np.arange(100, dtype=np.int64)
+
+    def expectedBatches(self, num_epochs, preprocess=lambda x, y: (x, y)):
+        sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+        epochs = []
+        for _ in range(num_epochs):
+            batches = []
+            for index in range(len(sequence)):
+                _, positions = sequence[index]
+                x_batch, y_batch = preprocess(self.x[positions], self.y[positions])
+                batches.append((np.asarray(x_batch), np.asarray(y_batch)))
+            sequence.on_epoch_end()
+            epochs.append(batches)
+        return epochs
+
+    def assertEpochsEqual(self, dataset, expected_epochs):
+        self.assertEqual(len(dataset), len(expected_epochs[0]))
+        for expected_batches in expected_epochs:
+            batches = list(dataset.as_numpy_iterator())
+            self.assertEqual(len(batches), len(expected_batches))
+            for (x_batch, y_batch), (x_expected, y_expected) in zip(batches, expected_batches):
+                np.testing.assert_allclose(x_batch, x_expected)
+                np.testing.assert_array_equal(y_batch, y_expected)
+
+    def testMatchesSequenceAcrossEpochs(self):
+        sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+        dataset = make_dataset(sequence, self.x, self.y, num_parallel_calls=4)
+        self.assertEpochsEqual(dataset, self.expectedBatches(num_epochs=3))
+
+    def testPreprocess(self):
+        sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+        dataset = make_dataset(sequence, self.x, self.y, preprocess=scale, prefetch=False)
+        self.assertEpochsEqual(dataset, self.expectedBatches(num_epochs=2, preprocess=scale))
+
+    def testCachedPreprocessKeepsShuffling(self):
+        expected = self.expectedBatches(num_epochs=2, preprocess=scale)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for cache in ['', os.path.join(temp_dir, 'cache')]:
+                sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+                dataset = make_dataset(sequence, self.x, self.y, preprocess=scale, cache=cache)
+                self.assertEpochsEqual(dataset, expected)
+
+    def testFileCacheIsReused(self):
+        expected = self.expectedBatches(num_epochs=1, preprocess=scale)
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = os.path.join(temp_dir, 'cache')
+            sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+            dataset = make_dataset(sequence, self.x, self.y, preprocess=scale, cache=cache)
+            # The preprocessing happens during the first epoch, not before.
+            self.assertEqual(os.listdir(temp_dir), [])
+            self.assertEpochsEqual(dataset, expected)
+            self.assertNotEqual(os.listdir(temp_dir), [])
+
+            # A new dataset reads the cached split rather than preprocessing it.
+            def zeros(x, y):
+                return tf.zeros(tf.shape(x), dtype=tf.float32), y
+
+            sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+            dataset = make_dataset(sequence, self.x, self.y, preprocess=zeros, cache=cache)
+            self.assertEpochsEqual(dataset, expected)
+
+    def testCacheWithoutPreprocess(self):
+        sequence = DataSequenceWithShuffling(num_items=100, batch_size=32, seed=3)
+        with self.assertRaises(ValueError):
+            make_dataset(sequence, self.x, self.y, cache='')
+
+
+if __name__ == '__main__':
+    unittest.main()
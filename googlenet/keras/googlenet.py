@@ -13,8 +13,9 @@
 # limitations under the License.
 
 from __future__ import annotations
-from typing import Callable, Optional, List, Tuple, Union
+from typing import Callable, Dict, Optional, List, Tuple, Union
 
+import numpy as np
 import tensorflow as tf
 from tensorflow import keras
 from keras import Input, Model, Sequential
@@ -23,6 +24,15 @@ from keras.layers import Activation, AvgPool2D, Concatenate, Conv2D, Dense, Drop
 from local_response_normalization import LocalResponseNormalization
 
 class Inception(Layer):
+    """Inception module, concatenating its 1x1, 3x3, 5x5 and pooling branches.
+
+    With `fused_1x1`, the three 1x1 convolutions of the input (the 1x1 branch,
+    and the reductions before the 3x3 and 5x5 convolutions) are computed as a
+    single, wider 1x1 convolution, whose output is then split, so the input is
+    read once rather than three times. Use `copy_inception_weights()` to
+    convert the weights between the fused and unfused layers.
+    """
+
     filters_1x1: int
     filters_1x1_reduce_3x3: int
     filters_3x3: int
@@ -30,12 +40,20 @@ class Inception(Layer):
     filters_5x5: int
     pool_proj: int
     module_name: str
+    fused_1x1: bool
 
     conv_1x1: Conv2D
     conv_1x1_3x3: Sequential
     conv_1x1_5x5: Sequential
     max_pool_conv: Sequential
 
+    # Only with `fused_1x1`, in place of the above 1x1 convolutions.
+    conv_1x1_fused: Conv2D
+    conv_3x3: Conv2D
+    conv_5x5: Conv2D
+
+    concat: Concatenate
+
     def __init__(self,
                  filters_1x1: int,
                  filters_1x1_reduce_3x3: int,
@@ -44,6 +62,7 @@ class Inception(Layer):
                  filters_5x5: int,
                  pool_proj: int,
                  name: str,
+                 fused_1x1: bool = False,
                  **kwargs):
         super().__init__(name=name, **kwargs)
 
@@ -54,40 +73,120 @@ class Inception(Layer):
         self.filters_5x5 = filters_5x5
         self.pool_proj = pool_proj
         self.module_name = name
+        self.fused_1x1 = fused_1x1
 
     def _conv2d(self, filters: int, kernel_size: int, name: str) -> Conv2D:
         return Conv2D(filters=filters, kernel_size=kernel_size,
                       padding='same', activation='relu',
-                      name=f'{self.module_name}_{name}')
+                      name=f'{self.module_name}_{name}', dtype=self.dtype_policy)
 
     def build(
         self, input_shape: Union[List[Optional[int]],
                                  Tuple[Optional[int], int, int, int]]) -> None:
         """Builds internal structures to prepare for model training."""
-        self.conv_1x1 = self._conv2d(self.filters_1x1, 1, 'Conv_1x1')
+        if self.fused_1x1:
+            self.conv_1x1_fused = self._conv2d(
+                self.filters_1x1 + self.filters_1x1_reduce_3x3 + self.filters_1x1_reduce_5x5,
+                1, 'Conv_1x1_fused')
+            self.conv_3x3 = self._conv2d(self.filters_3x3, 3, 'Conv_3x3')
+            self.conv_5x5 = self._conv2d(self.filters_5x5, 5, 'Conv_5x5')
+        else:
+            self.conv_1x1 = self._conv2d(self.filters_1x1, 1, 'Conv_1x1')
 
-        self.conv_1x1_3x3 = Sequential([
-            self._conv2d(self.filters_1x1_reduce_3x3, 1, 'Conv_1x1_3x3'),
-            self._conv2d(self.filters_3x3, 3, 'Conv_3x3'),
-        ])
+            self.conv_1x1_3x3 = Sequential([
+                self._conv2d(self.filters_1x1_reduce_3x3, 1, 'Conv_1x1_3x3'),
+                self._conv2d(self.filters_3x3, 3, 'Conv_3x3'),
+            ])
 
-        self.conv_1x1_5x5 = Sequential([
-            self._conv2d(self.filters_1x1_reduce_5x5, 1, 'Conv_1x1_5x5'),
-            self._conv2d(self.filters_5x5, 5, 'Conv_5x5'),
-        ])
+            self.conv_1x1_5x5 = Sequential([
+                self._conv2d(self.filters_1x1_reduce_5x5, 1, 'Conv_1x1_5x5'),
+                self._conv2d(self.filters_5x5, 5, 'Conv_5x5'),
+            ])
 
         self.max_pool_conv = Sequential([
-            MaxPool2D(3, 1, padding='same', name=f"{self.module_name}_MaxPool"),
+            MaxPool2D(3, 1, padding='same', name=f"{self.module_name}_MaxPool",
+                      dtype=self.dtype_policy),
             self._conv2d(self.pool_proj, 1, 'MaxPool_Conv_1x1'),
         ])
 
+        self.concat = Concatenate(axis=-1, name=f'{self.module_name}_Concat',
+                                  dtype=self.dtype_policy)
+
     def call(self, inputs: tf.Tensor) -> tf.Tensor:
-        return Concatenate(axis=-1)([
-            self.conv_1x1(inputs),
-            self.conv_1x1_3x3(inputs),
-            self.conv_1x1_5x5(inputs),
-            self.max_pool_conv(inputs),
+        if self.fused_1x1:
+            # ReLU applies elementwise, so it commutes with the split.
+            conv_1x1, reduce_3x3, reduce_5x5 = tf.split(
+                self.conv_1x1_fused(inputs),
+                [self.filters_1x1, self.filters_1x1_reduce_3x3, self.filters_1x1_reduce_5x5],
+                axis=-1)
+            branches = [conv_1x1, self.conv_3x3(reduce_3x3), self.conv_5x5(reduce_5x5)]
+        else:
+            branches = [
+                self.conv_1x1(inputs),
+                self.conv_1x1_3x3(inputs),
+                self.conv_1x1_5x5(inputs),
+            ]
+        return self.concat(branches + [self.max_pool_conv(inputs)])
+
+
+def _inception_filters(inception: Inception) -> Tuple[int, ...]:
+    return (inception.filters_1x1, inception.filters_1x1_reduce_3x3, inception.filters_3x3,
+            inception.filters_1x1_reduce_5x5, inception.filters_5x5, inception.pool_proj)
+
+
+def _inception_weights(inception: Inception) -> Dict[str, List[np.ndarray]]:
+    """Returns the kernel and bias of each convolution of `inception`, by role."""
+    if inception.fused_1x1:
+        kernel, bias = inception.conv_1x1_fused.get_weights()
+        sections = np.cumsum([inception.filters_1x1, inception.filters_1x1_reduce_3x3])
+        kernels = np.split(kernel, sections, axis=-1)
+        biases = np.split(bias, sections, axis=-1)
+        weights = {
+            name: [kernel, bias]
+            for name, kernel, bias in zip(('1x1', 'reduce_3x3', 'reduce_5x5'), kernels, biases)
+        }
+        weights['3x3'] = inception.conv_3x3.get_weights()
+        weights['5x5'] = inception.conv_5x5.get_weights()
+    else:
+        weights = {
+            '1x1': inception.conv_1x1.get_weights(),
+            'reduce_3x3': inception.conv_1x1_3x3.layers[0].get_weights(),
+            '3x3': inception.conv_1x1_3x3.layers[1].get_weights(),
+            'reduce_5x5': inception.conv_1x1_5x5.layers[0].get_weights(),
+            '5x5': inception.conv_1x1_5x5.layers[1].get_weights(),
+        }
+    weights['pool_proj'] = inception.max_pool_conv.layers[1].get_weights()
+    return weights
+
+
+def copy_inception_weights(source: Inception, target: Inception) -> None:
+    """Copies the weights of `source` to `target`, fused or not.
+
+    Both layers must have the same numbers of filters and be built, e.g., by
+    calling them on an input or building the model they are part of; the
+    kernels of the separate 1x1 convolutions are concatenated into the fused
+    one, or split back out of it, as needed.
+    """
+    assert source.built and target.built, 'both Inception layers must be built'
+    assert _inception_filters(source) == _inception_filters(target), (
+        f'filters differ: {_inception_filters(source)} vs. {_inception_filters(target)}')
+
+    weights = _inception_weights(source)
+    if target.fused_1x1:
+        branches = [weights[name] for name in ('1x1', 'reduce_3x3', 'reduce_5x5')]
+        target.conv_1x1_fused.set_weights([
+            np.concatenate([kernel for kernel, _ in branches], axis=-1),
+            np.concatenate([bias for _, bias in branches], axis=-1),
         ])
+        target.conv_3x3.set_weights(weights['3x3'])
+        target.conv_5x5.set_weights(weights['5x5'])
+    else:
+        target.conv_1x1.set_weights(weights['1x1'])
+        target.conv_1x1_3x3.layers[0].set_weights(weights['reduce_3x3'])
+        target.conv_1x1_3x3.layers[1].set_weights(weights['3x3'])
+        target.conv_1x1_5x5.layers[0].set_weights(weights['reduce_5x5'])
+        target.conv_1x1_5x5.layers[1].set_weights(weights['5x5'])
+    target.max_pool_conv.layers[1].set_weights(weights['pool_proj'])
 
 
 def SequentialPassthrough(layers: List[Layer]) -> Callable[[tf.Tensor], tf.Tensor]:
@@ -105,65 +204,88 @@ def SequentialPassthrough(layers: List[Layer]) -> Callable[[tf.Tensor], tf.Tenso
 
     return process_layers
 
-def GoogLeNet() -> Model:
-    """GoogLeNet model implementation."""
 
+def GoogLeNet(precision: Optional[str] = None, lrn_implementation: str = 'tf',
+              fused_inception: bool = False) -> Model:
+    """GoogLeNet model implementation.
+
+    Args:
+      precision: dtype policy of all layers but the softmax outputs, e.g.,
+        `'mixed_bfloat16'`; by default, the global policy is used
+      lrn_implementation: implementation of the LRN layers; see
+        `LocalResponseNormalization`
+      fused_inception: whether the Inception modules fuse their 1x1
+        convolutions; see `Inception`, and `copy_googlenet_weights()` to
+        convert the weights between the two variants
+    """
     input_: Input = Input(shape=(224, 224, 3), name='Input')
 
     x = SequentialPassthrough([
-        Conv2D(64, 7, 2, activation='relu', padding='same', name='Conv1'),
-        MaxPool2D(3, 2, padding='same', name='MaxPool_1'),
-        LocalResponseNormalization(name='LRN1'),
-        Conv2D(192, 1, activation='relu', padding='valid', name='Conv_2'),
-        Conv2D(192, 3, activation='relu', padding='same', name='Conv_3'),
-        LocalResponseNormalization(name='LRN2'),
-        MaxPool2D(3, 2, padding='same', name='MaxPool_2'),
-        Inception(64, 96, 128, 16, 32, 32, name='Inception_3a'),
-        Inception(128, 128, 192, 32, 96, 64, name='Inception_3b'),
-        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='same', name='MaxPool_3'),
-        Inception(192, 96, 208, 16, 48, 64, name='Inception_4a'),
+        Conv2D(64, 7, 2, activation='relu', padding='same', name='Conv1', dtype=precision),
+        MaxPool2D(3, 2, padding='same', name='MaxPool_1', dtype=precision),
+        LocalResponseNormalization(implementation=lrn_implementation, name='LRN1', dtype=precision),
+        Conv2D(192, 1, activation='relu', padding='valid', name='Conv_2', dtype=precision),
+        Conv2D(192, 3, activation='relu', padding='same', name='Conv_3', dtype=precision),
+        LocalResponseNormalization(implementation=lrn_implementation, name='LRN2', dtype=precision),
+        MaxPool2D(3, 2, padding='same', name='MaxPool_2', dtype=precision),
+        Inception(64, 96, 128, 16, 32, 32, name='Inception_3a', fused_1x1=fused_inception, dtype=precision),
+        Inception(128, 128, 192, 32, 96, 64, name='Inception_3b', fused_1x1=fused_inception, dtype=precision),
+        MaxPool2D(pool_size=(3, 3), strides=(2, 2), padding='same', name='MaxPool_3', dtype=precision),
+        Inception(192, 96, 208, 16, 48, 64, name='Inception_4a', fused_1x1=fused_inception, dtype=precision),
     ])(input_)
 
     # Output 0 branch
     output0 = SequentialPassthrough([
-        AvgPool2D(5, 3, padding='valid', name='AvgPool_out0'),
-        Conv2D(128, 1, padding='same', activation='relu', name='Conv2D_out0'),
-        Flatten(name='Flatten_out0'),
-        Dense(1000, activation='relu', name='FC_1_out0'), ## params
-        Dropout(0.7, name='Dropout_out0'),
-        Dense(1000, activation='relu', name='FC_2_out0'), ## params
-        Activation('softmax', name='Activation_out0'),
+        AvgPool2D(5, 3, padding='valid', name='AvgPool_out0', dtype=precision),
+        Conv2D(128, 1, padding='same', activation='relu', name='Conv2D_out0', dtype=precision),
+        Flatten(name='Flatten_out0', dtype=precision),
+        Dense(1000, activation='relu', name='FC_1_out0', dtype=precision), ## params
+        Dropout(0.7, name='Dropout_out0', dtype=precision),
+        Dense(1000, activation='relu', name='FC_2_out0', dtype=precision), ## params
+        Activation('softmax', name='Activation_out0', dtype='float32'),
     ])(x)
 
     # Continue with more Inception modules
     y = SequentialPassthrough([
-        Inception(160, 112, 224, 24, 64, 64, name='Inception_4b'),
-        Inception(128, 128, 256, 24, 64, 64, name='Inception_4c'),
-        Inception(112, 144, 288, 32, 96, 64, name='Inception_4d'),
+        Inception(160, 112, 224, 24, 64, 64, name='Inception_4b', fused_1x1=fused_inception, dtype=precision),
+        Inception(128, 128, 256, 24, 64, 64, name='Inception_4c', fused_1x1=fused_inception, dtype=precision),
+        Inception(112, 144, 288, 32, 96, 64, name='Inception_4d', fused_1x1=fused_inception, dtype=precision),
     ])(x)
 
     # Output 1 branch
     output1 = SequentialPassthrough([
-        AvgPool2D(5, 3, padding='valid', name='AvgPool_out1'),
-        Conv2D(128, 1, padding='same', activation='relu', name='Conv2D_out1'),
-        Flatten(name='Flatten_out1'),
-        Dense(1000, activation='relu', name='FC_1_out1'), ## params
-        Dropout(0.7, name='Dropout_out1'),
-        Dense(1000, activation='relu', name='FC_2_out1'), ## params
-        Activation('softmax', name='Activation_out1'),
+        AvgPool2D(5, 3, padding='valid', name='AvgPool_out1', dtype=precision),
+        Conv2D(128, 1, padding='same', activation='relu', name='Conv2D_out1', dtype=precision),
+        Flatten(name='Flatten_out1', dtype=precision),
+        Dense(1000, activation='relu', name='FC_1_out1', dtype=precision), ## params
+        Dropout(0.7, name='Dropout_out1', dtype=precision),
+        Dense(1000, activation='relu', name='FC_2_out1', dtype=precision), ## params
+        Activation('softmax', name='Activation_out1', dtype='float32'),
     ])(y)
 
     # Continue with more Inception modules
     output2 = SequentialPassthrough([
-        Inception(256, 160, 320, 32, 128, 128, name='Inception_4e'),
-        MaxPool2D(3, 2, padding='same', name='MaxPool_4'),
-        Inception(256, 160, 320, 32, 128, 128, name='Inception_5a'),
-        Inception(384, 192, 384, 48, 128, 128, name='Inception_5b'),
-        AvgPool2D(7, padding='valid', name='AvgPool_out2'),
-        Flatten(name='Flatten_out2'),
-        Dropout(0.4, name='Dropout_out2'),
-        Dense(1000, activation='relu', name='FC_out2'),
-        Activation('softmax', name='Activation_out2'),
+        Inception(256, 160, 320, 32, 128, 128, name='Inception_4e', fused_1x1=fused_inception, dtype=precision),
+        MaxPool2D(3, 2, padding='same', name='MaxPool_4', dtype=precision),
+        Inception(256, 160, 320, 32, 128, 128, name='Inception_5a', fused_1x1=fused_inception, dtype=precision),
+        Inception(384, 192, 384, 48, 128, 128, name='Inception_5b', fused_1x1=fused_inception, dtype=precision),
+        AvgPool2D(7, padding='valid', name='AvgPool_out2', dtype=precision),
+        Flatten(name='Flatten_out2', dtype=precision),
+        Dropout(0.4, name='Dropout_out2', dtype=precision),
+        Dense(1000, activation='relu', name='FC_out2', dtype=precision),
+        Activation('softmax', name='Activation_out2', dtype='float32'),
     ])(y)
 
     return Model(inputs=input_, outputs=[output0, output1, output2], name='GoogLeNet')
+
+
+def copy_googlenet_weights(source: Model, target: Model) -> None:
+    """Copies the weights of GoogLeNet `source` to `target`, layer by layer.
+
+    The models may differ in `fused_inception`; see `copy_inception_weights()`.
+    """
+    for layer in source.layers:
+        if isinstance(layer, Inception):
+            copy_inception_weights(layer, target.get_layer(layer.name))
+        else:
+            target.get_layer(layer.name).set_weights(layer.get_weights())
@@ -0,0 +1,110 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+# Provides `local_response_normalization`, as imported by `googlenet`.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, os.pardir, 'alexnet'))
+
+from googlenet import GoogLeNet, Inception, copy_googlenet_weights, copy_inception_weights
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+import unittest
+
+
+class InceptionTest(unittest.TestCase):
+
+    def inception(self, fused_1x1):
+        layer = Inception(16, 8, 12, 4, 6, 5, name='Inception', fused_1x1=fused_1x1)
+        return layer, keras.Sequential([keras.Input(shape=(7, 7, 10)), layer])
+
+    def testFusedMatchesUnfused(self):
+        inputs = tf.random.stateless_normal((2, 7, 7, 10), seed=(1, 2))
+        unfused, unfused_model = self.inception(fused_1x1=False)
+        fused, fused_model = self.inception(fused_1x1=True)
+        copy_inception_weights(unfused, fused)
+
+        gradients = []
+        for model in (unfused_model, fused_model):
+            with tf.GradientTape() as tape:
+                tape.watch(inputs)
+                outputs = model(inputs)
+                loss = tf.reduce_sum(outputs * outputs)
+            self.assertEqual(outputs.shape, (2, 7, 7, 16 + 12 + 6 + 5))
+            gradients.append((outputs, tape.gradient(loss, inputs)))
+        for expected, actual in zip(*gradients):
+            np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-5)
+
+    def testCopyRoundTrip(self):
+        unfused, _ = self.inception(fused_1x1=False)
+        fused, _ = self.inception(fused_1x1=True)
+        copy = self.inception(fused_1x1=False)[0]
+        copy_inception_weights(unfused, fused)
+        copy_inception_weights(fused, copy)
+        self.assertEqual(len(unfused.get_weights()), len(copy.get_weights()))
+        for expected, actual in zip(unfused.get_weights(), copy.get_weights()):
+            np.testing.assert_array_equal(actual, expected)
+
+    def testConcatenateCreatedOnce(self):
+        layer, model = self.inception(fused_1x1=True)
+        concat = layer.concat
+        model(tf.zeros((1, 7, 7, 10)))
+        model(tf.zeros((3, 7, 7, 10)))
+        self.assertIs(layer.concat, concat)
+
+
+class GoogLeNetTest(unittest.TestCase):
+
+    def testFusedMatchesUnfused(self):
+        unfused = GoogLeNet()
+        fused = GoogLeNet(fused_inception=True)
+        self.assertEqual(unfused.count_params(), fused.count_params())
+        copy_googlenet_weights(unfused, fused)
+
+        inputs = tf.random.stateless_uniform((1, 224, 224, 3), seed=(3, 4))
+        for expected, actual in zip(unfused(inputs), fused(inputs)):
+            np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-6)
+
+    def testMixedPrecision(self):
+        policy = keras.mixed_precision.global_policy().name
+        model = GoogLeNet(precision='mixed_bfloat16', fused_inception=True)
+        self.assertEqual(keras.mixed_precision.global_policy().name, policy)
+
+        outputs = {layer.name for layer in model.layers if layer.name.startswith('Activation_out')}
+        self.assertEqual(len(outputs), 3)
+        for layer in model.layers:
+            if isinstance(layer, keras.layers.InputLayer):
+                continue
+            expected = 'float32' if layer.name in outputs else 'bfloat16'
+            self.assertEqual(layer.compute_dtype, expected, layer.name)
+            if isinstance(layer, Inception):
+                # The `Sequential` containers within only chain their layers.
+                for sublayer in layer.submodules:
+                    if (isinstance(sublayer, keras.layers.Layer) and
+                            not isinstance(sublayer, keras.Model)):
+                        self.assertEqual(sublayer.compute_dtype, 'bfloat16', sublayer.name)
+        for variable in model.weights:
+            self.assertEqual(variable.dtype, tf.float32, variable.name)
+        for output in model(tf.zeros((1, 224, 224, 3))):
+            self.assertEqual(output.dtype, tf.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()
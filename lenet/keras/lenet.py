@@ -17,21 +17,31 @@ from tensorflow import keras
 from keras import Input, Sequential
 from keras.layers import Activation, AveragePooling2D, Conv2D, Dense, Flatten, Layer, MaxPooling2D
 
-from typing import Callable, Type
+from typing import Callable, Optional, Type
 
 
 def LeNet(subsampling: Type[keras.layers.Layer] = AveragePooling2D,
-          activation: Callable[[tf.Tensor], tf.Tensor] = keras.activations.tanh) -> Sequential:
+          activation: Callable[[tf.Tensor], tf.Tensor] = keras.activations.tanh,
+          precision: Optional[str] = None) -> Sequential:
+    """Constructs LeNet-5 with the given subsampling layer and activation.
+
+    Args:
+      subsampling: class of the S2 and S4 layers
+      activation: activation function of all but the output layer
+      precision: dtype policy of all but the output layer, e.g.,
+        `'mixed_bfloat16'`, to compute in 16 bits with float32 variables; by
+        default, the global policy is used. The output is always float32.
+    """
     return Sequential([
         Input(shape=(28, 28, 1)),
-        Conv2D(filters=6, kernel_size=(5, 5), padding='same', activation=activation, name='C1'),
-        subsampling(pool_size=(2, 2), strides=(2, 2), name='S2'),
-        Activation(activation, name='S2_act'),
-        Conv2D(filters=16, kernel_size=(5, 5), activation=activation, name='C3'),
-        subsampling(pool_size=(2, 2), strides=(2, 2), name='S4'),
-        Activation(activation, name='S4_act'),
-        Conv2D(filters=120, kernel_size=(5, 5), activation=activation, name='C5'),
-        Flatten(name='Flatten'),
-        Dense(84, activation=activation, name='F6'),
-        Dense(10, activation=keras.activations.softmax, name='Output'),
+        Conv2D(filters=6, kernel_size=(5, 5), padding='same', activation=activation, name='C1', dtype=precision),
+        subsampling(pool_size=(2, 2), strides=(2, 2), name='S2', dtype=precision),
+        Activation(activation, name='S2_act', dtype=precision),
+        Conv2D(filters=16, kernel_size=(5, 5), activation=activation, name='C3', dtype=precision),
+        subsampling(pool_size=(2, 2), strides=(2, 2), name='S4', dtype=precision),
+        Activation(activation, name='S4_act', dtype=precision),
+        Conv2D(filters=120, kernel_size=(5, 5), activation=activation, name='C5', dtype=precision),
+        Flatten(name='Flatten', dtype=precision),
+        Dense(84, activation=activation, name='F6', dtype=precision),
+        Dense(10, activation=keras.activations.softmax, name='Output', dtype='float32'),
     ], name='LeNet-5')
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from activations import scaled_tanh
+from lenet import LeNet
+from subsampling import Subsampling
+
+import tensorflow as tf
+from tensorflow import keras
+import unittest
+
+
+class LeNetTest(unittest.TestCase):
+
+    def testMixedPrecision(self):
+        policy = keras.mixed_precision.global_policy().name
+        model = LeNet(subsampling=Subsampling, activation=scaled_tanh,
+                      precision='mixed_bfloat16')
+        self.assertEqual(keras.mixed_precision.global_policy().name, policy)
+
+        for layer in model.layers[:-1]:
+            self.assertEqual(layer.compute_dtype, 'bfloat16', layer.name)
+        for variable in model.weights:
+            self.assertEqual(variable.dtype, tf.float32, variable.name)
+        outputs = model(tf.zeros((2, 28, 28, 1)))
+        self.assertEqual(outputs.dtype, tf.float32)
+        self.assertEqual(model.get_layer('S2')(tf.zeros((1, 28, 28, 6))).dtype, tf.bfloat16)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -37,11 +37,22 @@ def identity(x: tf.Tensor) -> tf.Tensor:
     return x
 
 
+def window_sum(inputs: tf.Tensor, pool_size: tuple[int, int]) -> tf.Tensor:
+    """Sums non-overlapping `pool_size` windows, dropping any partial ones."""
+    _, in_rows, in_cols, in_chan = inputs.shape
+    out_rows, out_cols = in_rows // pool_size[0], in_cols // pool_size[1]
+    windows = tf.reshape(inputs[:, :out_rows * pool_size[0], :out_cols * pool_size[1], :],
+                         (-1, out_rows, pool_size[0], out_cols, pool_size[1], in_chan))
+    return tf.reduce_sum(windows, axis=(2, 4))
+
+
 class Subsampling(Layer):
     pool_size: tuple[int, int]
     strides: tuple[int, int]
     padding: str
     activation: Callable[[tf.Tensor], tf.Tensor]
+    fused: bool
+    jit_compile: bool
     w: np.ndarray
     b: np.ndarray
 
@@ -51,6 +62,8 @@ class Subsampling(Layer):
         strides: Optional[Union[int, list[int], tuple[int, int]]] = None,
         padding: str = 'VALID',
         activation: Callable[[tf.Tensor], tf.Tensor] = identity,
+        fused: bool = False,
+        jit_compile: bool = False,
         **kwargs):
         """Subsampling layer as described in the LeNet paper.
 
@@ -66,7 +79,15 @@ class Subsampling(Layer):
           pool_size: int or 2-tuple specifying pool size (aka kernel size)
           strides: int or 2-tuple; if unspecified, will be copied from
             `pool_size`
-          padding:
+          padding: the string "VALID" or the string "SAME"
+          fused: if set, computes the layer with fewer passes over its inputs:
+            with "VALID" padding and equal strides, pooling and multiplying by
+            `w` is a single depthwise convolution; otherwise, the pooling scale
+            is folded into `w`; the result is the same, up to floating-point
+            rounding
+          jit_compile: if set, compiles the layer with XLA, which requires
+            `fused`; if the pooling windows don't overlap, they are then summed
+            in the same pass as the multiplication by `w`, bias and activation
         """
         super().__init__(**kwargs)
 
@@ -80,7 +101,7 @@ class Subsampling(Layer):
                 f"`pool_size` must be an int or 2-tuple; received: {pool_size}")
 
         if strides is None:
-            self.strides == self.pool_size
+            self.strides = self.pool_size
         elif isinstance(strides, int):
             self.strides = (strides, strides)
         elif (isinstance(strides, list) or
@@ -94,7 +115,14 @@ class Subsampling(Layer):
             f"`padding` must be either 'VALID' or 'SAME'; received: {padding}")
         self.padding = padding.upper()
 
+        if jit_compile and not fused:
+            raise ArgumentError('`jit_compile` requires `fused`')
+
         self.activation = activation
+        self.fused = fused
+        self.jit_compile = jit_compile
+        self._fused_call = (tf.function(self._fused, jit_compile=True)
+                            if jit_compile else self._fused)
 
     def build(
         self, input_shape: tuple[Optional[int], int, int, int]) -> None:
@@ -124,12 +152,14 @@ class Subsampling(Layer):
 
     def call(self, inputs: tf.Tensor) -> tf.Tensor:
         """Computes subsampling value: `w * (sum of window entries) + b`."""
+        if self.fused:
+            return self._fused_call(inputs)
 
         # `scale` here undoes the average pooling by getting the original sum,
         # which is what we need, but there isn't a pooling mechanism that just
         # gets us the sum of products.
         scale = self.pool_size[0] * self.pool_size[1]
-        tf_scale = tf.constant(scale, dtype='float32')
+        tf_scale = tf.constant(scale, dtype=self.compute_dtype)
 
         avg = tf.nn.pool(inputs,
                          window_shape=self.pool_size,
@@ -138,3 +168,29 @@ class Subsampling(Layer):
                          padding=self.padding)
 
         return self.activation(self.w * tf_scale * avg + self.b)
+
+    def _fused(self, inputs: tf.Tensor) -> tf.Tensor:
+        in_chan = self.w.shape[-1]
+        if self.jit_compile and self.padding == 'VALID' and self.strides == self.pool_size:
+            # XLA fuses this reshape and sum with the rest of the layer, but
+            # without XLA, it's slower than the convolution below.
+            weighted_sum = self.w * window_sum(inputs, self.pool_size)
+        elif self.padding == 'VALID' and self.strides[0] == self.strides[1]:
+            # A depthwise convolution with every tap set to `w` computes
+            # `w * (sum of window entries)` directly, in a single pass.
+            kernel = tf.broadcast_to(tf.reshape(self.w, (1, 1, in_chan, 1)),
+                                     self.pool_size + (in_chan, 1))
+            weighted_sum = tf.nn.depthwise_conv2d(inputs, kernel,
+                                                  strides=(1,) + self.strides + (1,),
+                                                  padding='VALID')
+        else:
+            # With "SAME" padding, average pooling divides by the number of
+            # window entries within the input, which may be fewer than
+            # `scale` at the borders, so it can't be replaced by a sum.
+            scaled_w = self.w * float(self.pool_size[0] * self.pool_size[1])
+            weighted_sum = scaled_w * tf.nn.pool(inputs,
+                                                 window_shape=self.pool_size,
+                                                 pooling_type='AVG',
+                                                 strides=self.strides,
+                                                 padding=self.padding)
+        return self.activation(tf.nn.bias_add(weighted_sum, tf.reshape(self.b, (in_chan,))))
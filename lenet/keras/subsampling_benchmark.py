@@ -0,0 +1,124 @@
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the fused and unfused Subsampling layers; prints JSON results.
+
+Measures the time of a forward and backward pass through each layer, on the
+input shapes of the S2 and S4 layers of LeNet-5, on whatever device TensorFlow
+picks by default (e.g., CPU).
+
+Usage:
+
+    python subsampling_benchmark.py [--batch-size B] [--iterations N]
+"""
+
+# From Python 3.9 and onward, `tuple`, `list` and other collection classes can
+# also function as generic class types (see PEP 585).
+#
+# Once we no longer need to support Python 3.7 or 3.8, we can remove this syntax
+# (added in PEP 563) for Python 3.7 and higher.
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List
+
+import tensorflow as tf
+from tensorflow import keras
+
+from activations import scaled_tanh
+from subsampling import Subsampling
+from subsampling_ext import SubsamplingPerKernelParam
+
+# Input shapes of the subsampling layers of LeNet-5, without the batch size.
+_LAYER_SHAPES = {
+    'S2': (28, 28, 6),
+    'S4': (10, 10, 16),
+}
+
+_VARIANTS = {
+    'unfused': {},
+    'fused': {'fused': True},
+    'fused_xla': {'fused': True, 'jit_compile': True},
+}
+
+
+def _benchmark(layer_class: Any, layer_name: str, variant: str,
+               batch_size: int, iterations: int) -> Dict[str, Any]:
+    shape = _LAYER_SHAPES[layer_name]
+    layer = layer_class(pool_size=(2, 2), strides=(2, 2), activation=scaled_tanh,
+                        **_VARIANTS[variant])
+    model = keras.Sequential([keras.Input(shape=shape), layer])
+    inputs = tf.random.normal((batch_size,) + shape)
+
+    @tf.function
+    def step() -> tf.Tensor:
+        with tf.GradientTape() as tape:
+            tape.watch(inputs)
+            loss = tf.reduce_sum(model(inputs))
+        return tape.gradient(loss, [inputs] + model.trainable_weights)
+
+    # Trace (and compile) before timing.
+    step()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        gradients = step()
+    # Wait for the last step to finish, in case it runs asynchronously.
+    _ = [gradient.numpy() for gradient in gradients]
+    seconds = time.perf_counter() - start
+
+    return {
+        'layer': layer_class.__name__,
+        'shape': layer_name,
+        'variant': variant,
+        'batch_size': batch_size,
+        'step_ms': seconds / iterations * 1000,
+    }
+
+
+def main(argv: List[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--output', help='write JSON here instead of stdout')
+    args = parser.parse_args(argv)
+
+    results = []
+    for layer_class in (Subsampling, SubsamplingPerKernelParam):
+        for layer_name in _LAYER_SHAPES:
+            for variant in _VARIANTS:
+                # Fusing `SubsamplingPerKernelParam` requires XLA.
+                if layer_class is SubsamplingPerKernelParam and variant == 'fused':
+                    continue
+                results.append(_benchmark(layer_class, layer_name, variant,
+                                          args.batch_size, args.iterations))
+
+    report = {
+        'python': platform.python_version(),
+        'tensorflow': tf.__version__,
+        'platform': platform.platform(),
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
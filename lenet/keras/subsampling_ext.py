@@ -34,6 +34,8 @@ import tensorflow as tf
 from tensorflow import keras
 from keras.layers import Layer
 
+from subsampling import window_sum
+
 
 class ArgumentError(ValueError):
     pass
@@ -48,6 +50,8 @@ class SubsamplingPerKernelParam(Layer):
     strides: tuple[int, int]
     padding: str
     activation: Callable[[tf.Tensor], tf.Tensor]
+    fused: bool
+    jit_compile: bool
     w: np.ndarray
     b: np.ndarray
 
@@ -57,6 +61,8 @@ class SubsamplingPerKernelParam(Layer):
         strides: Optional[Union[int, list[int], tuple[int, int]]] = None,
         padding: str = 'VALID',
         activation: Callable[[tf.Tensor], tf.Tensor] = identity,
+        fused: bool = False,
+        jit_compile: bool = False,
         **kwargs):
         """Extended version of the Subsampling layer described in the LeNet paper.
 
@@ -77,6 +83,13 @@ class SubsamplingPerKernelParam(Layer):
           strides: int or 2-tuple; if unspecified, will be copied from
             `pool_size`
           padding: the string "VALID" or the string "SAME"
+          fused: if set, compiles the layer with XLA, which requires
+            `jit_compile`; if the pooling windows don't overlap, they are then
+            summed in the same pass as the multiplication by `w`, bias and
+            activation; the result is the same, up to floating-point rounding
+          jit_compile: must be set along with `fused`; without XLA, there is
+            no pass to save, as `w` has a value per output cell, so it can't be
+            folded into the pooling, unlike in `Subsampling`
         """
         super().__init__(**kwargs)
 
@@ -90,7 +103,7 @@ class SubsamplingPerKernelParam(Layer):
                 f"`pool_size` must be an int or 2-tuple; received: {pool_size}")
 
         if strides is None:
-            self.strides == self.pool_size
+            self.strides = self.pool_size
         elif isinstance(strides, int):
             self.strides = (strides, strides)
         elif (isinstance(strides, list) or
@@ -104,7 +117,16 @@ class SubsamplingPerKernelParam(Layer):
             f"`padding` must be either 'VALID' or 'SAME'; received: {padding}")
         self.padding = padding.upper()
 
+        if fused and not jit_compile:
+            raise ArgumentError('`fused` requires `jit_compile`')
+        if jit_compile and not fused:
+            raise ArgumentError('`jit_compile` requires `fused`')
+
         self.activation = activation
+        self.fused = fused
+        self.jit_compile = jit_compile
+        self._fused_call = (tf.function(self._fused, jit_compile=True)
+                            if jit_compile else self._fused)
 
     def build(self, input_shape: tuple[Optional[int], int, int, int]) -> None:
         """Builds internal structures to prepare for model training.
@@ -144,12 +166,14 @@ class SubsamplingPerKernelParam(Layer):
 
     def call(self, inputs: tf.Tensor) -> tf.Tensor:
         """Computes subsampling value: `w * (sum of window entries) + b`."""
+        if self.fused:
+            return self._fused_call(inputs)
 
         # `scale` here undoes the average pooling by getting the original sum,
         # which is what we need, but there isn't a pooling mechanism that just
         # gets us the sum of products.
         scale = self.pool_size[0] * self.pool_size[1]
-        tf_scale = tf.constant(scale, dtype='float32')
+        tf_scale = tf.constant(scale, dtype=self.compute_dtype)
 
         avg = tf.nn.pool(inputs,
                          window_shape=self.pool_size,
@@ -158,3 +182,17 @@ class SubsamplingPerKernelParam(Layer):
                          padding=self.padding)
 
         return self.activation(self.w * tf_scale * avg + self.b)
+
+    def _fused(self, inputs: tf.Tensor) -> tf.Tensor:
+        if self.padding == 'VALID' and self.strides == self.pool_size:
+            # XLA fuses this reshape and sum with the rest of the layer.
+            return self.activation(self.w * window_sum(inputs, self.pool_size) + self.b)
+        # XLA still fuses the elementwise operations after the pooling; see
+        # `call()` for why the scale is needed.
+        scaled_w = self.w * float(self.pool_size[0] * self.pool_size[1])
+        avg = tf.nn.pool(inputs,
+                         window_shape=self.pool_size,
+                         pooling_type='AVG',
+                         strides=self.strides,
+                         padding=self.padding)
+        return self.activation(scaled_w * avg + self.b)
@@ -0,0 +1,85 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from activations import scaled_tanh
+import subsampling
+from subsampling import Subsampling
+import subsampling_ext
+from subsampling_ext import SubsamplingPerKernelParam
+
+import itertools
+
+import numpy as np
+import tensorflow as tf
+from tensorflow import keras
+import unittest
+
+
+class FusedSubsamplingTest(unittest.TestCase):
+
+    def assertFusedMatchesUnfused(self, layer_class, shape, jit_compile_options=(False, True),
+                                  **kwargs):
+        unfused = keras.Sequential([
+            keras.Input(shape=shape), layer_class(activation=scaled_tanh, **kwargs)])
+        inputs = tf.random.stateless_normal((4,) + shape, seed=(1, 2))
+        for jit_compile in jit_compile_options:
+            fused = keras.Sequential([
+                keras.Input(shape=shape),
+                layer_class(activation=scaled_tanh, fused=True, jit_compile=jit_compile,
+                            **kwargs)])
+            fused.set_weights(unfused.get_weights())
+
+            gradients = []
+            for model in (unfused, fused):
+                with tf.GradientTape() as tape:
+                    tape.watch(inputs)
+                    outputs = model(inputs)
+                    loss = tf.reduce_sum(outputs * outputs)
+                gradients.append((outputs, *tape.gradient(loss, [inputs] + model.trainable_weights)))
+            for expected, actual in zip(*gradients):
+                np.testing.assert_allclose(actual, expected, rtol=1e-5, atol=1e-5)
+
+    def testSubsampling(self):
+        for padding, strides in itertools.product(('VALID', 'SAME'), ((2, 2), (2, 1))):
+            with self.subTest(padding=padding, strides=strides):
+                self.assertFusedMatchesUnfused(Subsampling, (11, 10, 3), pool_size=(2, 2),
+                                               strides=strides, padding=padding)
+
+    def testSubsamplingPerKernelParam(self):
+        for padding, strides in itertools.product(('VALID', 'SAME'), ((2, 2), (2, 1))):
+            with self.subTest(padding=padding, strides=strides):
+                self.assertFusedMatchesUnfused(SubsamplingPerKernelParam, (11, 10, 3),
+                                               jit_compile_options=(True,),
+                                               pool_size=(2, 2), strides=strides,
+                                               padding=padding)
+
+    def testSubsamplingPerKernelParamFusedRequiresJit(self):
+        with self.assertRaises(subsampling_ext.ArgumentError):
+            SubsamplingPerKernelParam(fused=True)
+
+    def testJitCompileRequiresFused(self):
+        with self.assertRaises(subsampling.ArgumentError):
+            Subsampling(jit_compile=True)
+        with self.assertRaises(subsampling_ext.ArgumentError):
+            SubsamplingPerKernelParam(jit_compile=True)
+
+    def testStridesDefaultToPoolSize(self):
+        self.assertEqual(Subsampling(pool_size=3).strides, (3, 3))
+        self.assertEqual(SubsamplingPerKernelParam(pool_size=3).strides, (3, 3))
+
+
+if __name__ == '__main__':
+    unittest.main()
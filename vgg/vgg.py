@@ -12,6 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from typing import Optional
+
 from tensorflow import keras
 from keras import Input, Sequential
 from keras.layers import Activation, Conv2D, Dense, Dropout, Flatten, MaxPool2D
@@ -52,8 +54,17 @@ MODEL_D = 'D'
 MODEL_E = 'E'
 
 
-def VGG(model: str) -> Sequential:
-    """Defines a specific VGG model, given one of the valid model types."""
+def VGG(model: str, precision: Optional[str] = None,
+        lrn_implementation: str = 'tf') -> Sequential:
+    """Defines a specific VGG model, given one of the valid model types.
+
+    Args:
+      model: one of the model types above, e.g., `MODEL_A`
+      precision: dtype policy of all layers but the final softmax, e.g.,
+        `'mixed_bfloat16'`; by default, the global policy is used
+      lrn_implementation: implementation of the LRN layer of `MODEL_A_LRN`;
+        see `LocalResponseNormalization`
+    """
     assert model in (MODEL_A, MODEL_A_LRN, MODEL_B, MODEL_C, MODEL_D, MODEL_E)
 
     vgg = Sequential([
@@ -61,108 +72,111 @@ def VGG(model: str) -> Sequential:
     ], name=f'VGG-{model}')
 
     # First block
-    vgg.add(Conv(64, 3, name='Conv2D_1_1'))
+    vgg.add(Conv(64, 3, name='Conv2D_1_1', dtype=precision))
     if model == MODEL_A:
         # No other layers are added here.
         pass
     elif model == MODEL_A_LRN:
-        vgg.add(LocalResponseNormalization(name='LRN'))
+        vgg.add(LocalResponseNormalization(implementation=lrn_implementation, name='LRN', dtype=precision))
     else:
-        vgg.add(Conv(64, 3, name='Conv2D_1_2'))
+        vgg.add(Conv(64, 3, name='Conv2D_1_2', dtype=precision))
 
-    vgg.add(MaxPool(name='MaxPool_1'))
+    vgg.add(MaxPool(name='MaxPool_1', dtype=precision))
 
     # Second block
-    vgg.add(Conv(128, 3, name='Conv2D_2_1'))
+    vgg.add(Conv(128, 3, name='Conv2D_2_1', dtype=precision))
     if model in (MODEL_B, MODEL_C, MODEL_D, MODEL_E):
-        vgg.add(Conv(128, 3, name='Conv2D_2_2'))
+        vgg.add(Conv(128, 3, name='Conv2D_2_2', dtype=precision))
 
-    vgg.add(MaxPool(name='MaxPool_2'))
+    vgg.add(MaxPool(name='MaxPool_2', dtype=precision))
 
     # Third block
-    vgg.add(Conv(256, 3, name='Conv2D_3_1'))
-    vgg.add(Conv(256, 3, name='Conv2D_3_2'))
+    vgg.add(Conv(256, 3, name='Conv2D_3_1', dtype=precision))
+    vgg.add(Conv(256, 3, name='Conv2D_3_2', dtype=precision))
 
     if model == MODEL_C:
-        vgg.add(Conv(256, 1, name='Conv2D_3_3'))
+        vgg.add(Conv(256, 1, name='Conv2D_3_3', dtype=precision))
     elif model in (MODEL_D, MODEL_E):
-        vgg.add(Conv(256, 3, name='Conv2D_3_3'))
+        vgg.add(Conv(256, 3, name='Conv2D_3_3', dtype=precision))
 
     # Model E gets an extra layer.
     if model == MODEL_E:
-        vgg.add(Conv(256, 3, name='Conv2D_3_4'))
+        vgg.add(Conv(256, 3, name='Conv2D_3_4', dtype=precision))
 
-    vgg.add(MaxPool(name='MaxPool_3'))
+    vgg.add(MaxPool(name='MaxPool_3', dtype=precision))
 
     # Fourth block
-    vgg.add(Conv(512, 3, name='Conv2D_4_1'))
-    vgg.add(Conv(512, 3, name='Conv2D_4_2'))
+    vgg.add(Conv(512, 3, name='Conv2D_4_1', dtype=precision))
+    vgg.add(Conv(512, 3, name='Conv2D_4_2', dtype=precision))
 
     if model == MODEL_C:
-        vgg.add(Conv(512, 1, name='Conv2D_4_3'))
+        vgg.add(Conv(512, 1, name='Conv2D_4_3', dtype=precision))
     elif model in (MODEL_D, MODEL_E):
-        vgg.add(Conv(512, 3, name='Conv2D_4_4'))
+        vgg.add(Conv(512, 3, name='Conv2D_4_4', dtype=precision))
 
     # Model E gets an extra layer.
     if model == MODEL_E:
-        vgg.add(Conv(512, 3, name='Conv2D_4_5'))
+        vgg.add(Conv(512, 3, name='Conv2D_4_5', dtype=precision))
 
-    vgg.add(MaxPool(name='MaxPool_4'))
+    vgg.add(MaxPool(name='MaxPool_4', dtype=precision))
 
     # Fifth block
-    vgg.add(Conv(512, 3, name='Conv2D_5_1'))
-    vgg.add(Conv(512, 3, name='Conv2D_5_2'))
+    vgg.add(Conv(512, 3, name='Conv2D_5_1', dtype=precision))
+    vgg.add(Conv(512, 3, name='Conv2D_5_2', dtype=precision))
     if model == MODEL_C:
-        vgg.add(Conv(512, 1, name='Conv2D_5_3'))
+        vgg.add(Conv(512, 1, name='Conv2D_5_3', dtype=precision))
     elif model in (MODEL_D, MODEL_E):
-        vgg.add(Conv(512, 3, name='Conv2D_5_3'))
+        vgg.add(Conv(512, 3, name='Conv2D_5_3', dtype=precision))
 
     # Model E gets an extra layer.
     if model == MODEL_E:
-        vgg.add(Conv(512, 3, name='Conv2D_5_4'))
+        vgg.add(Conv(512, 3, name='Conv2D_5_4', dtype=precision))
 
-    vgg.add(MaxPool(name='MaxPool_5'))
+    vgg.add(MaxPool(name='MaxPool_5', dtype=precision))
 
-    vgg.add(Flatten(name='Flatten'))
+    vgg.add(Flatten(name='Flatten', dtype=precision))
     vgg.add(Dense(4096, name='FC_1',
                   activation=keras.activations.relu,
-                  kernel_regularizer=keras.regularizers.L2(0.0005)))
-    vgg.add(Dropout(0.5, name='FC_1_dropout'))
+                  kernel_regularizer=keras.regularizers.L2(0.0005),
+                  dtype=precision))
+    vgg.add(Dropout(0.5, name='FC_1_dropout', dtype=precision))
     vgg.add(Dense(4096, name='FC_2',
                   activation=keras.activations.relu,
-                  kernel_regularizer=keras.regularizers.L2(0.0005)))
-    vgg.add(Dropout(0.5, name='FC_2_dropout'))
-    vgg.add(Dense(1000, name='FC_3', activation=keras.activations.relu))
-    vgg.add(Activation(keras.activations.softmax, name='Softmax'))
+                  kernel_regularizer=keras.regularizers.L2(0.0005),
+                  dtype=precision))
+    vgg.add(Dropout(0.5, name='FC_2_dropout', dtype=precision))
+    vgg.add(Dense(1000, name='FC_3', activation=keras.activations.relu, dtype=precision))
+    vgg.add(Activation(keras.activations.softmax, name='Softmax', dtype='float32'))
 
     return vgg
 
 
-def VGG_A():
+def VGG_A(precision: Optional[str] = None) -> Sequential:
     """Constructs VGG model variant A."""
-    return VGG(MODEL_A)
+    return VGG(MODEL_A, precision)
 
 
-def VGG_A_LRN():
+def VGG_A_LRN(precision: Optional[str] = None,
+              lrn_implementation: str = 'tf') -> Sequential:
     """Constructs VGG model variant A with LocalResponseNormalization."""
-    return VGG(MODEL_A)
+    return VGG(MODEL_A_LRN, precision, lrn_implementation)
 
 
-def VGG_B():
+def VGG_B(precision: Optional[str] = None) -> Sequential:
     """Constructs VGG model variant B."""
-    return VGG(MODEL_B)
+    return VGG(MODEL_B, precision)
 
 
-def VGG_C():
+def VGG_C(precision: Optional[str] = None) -> Sequential:
     """Constructs VGG model variant C."""
-    return VGG(MODEL_C)
+    return VGG(MODEL_C, precision)
 
 
-def VGG_D():
+def VGG_D(precision: Optional[str] = None) -> Sequential:
     """Constructs VGG model variant D."""
-    return VGG(MODEL_D)
+    return VGG(MODEL_D, precision)
 
 
-def VGG_E():
+def VGG_E(precision: Optional[str] = None) -> Sequential:
     """Constructs VGG model variant E."""
-    return VGG(MODEL_E)
+    return VGG(MODEL_E, precision)
@@ -0,0 +1,59 @@
+#!/usr/bin/python
+#
+# Copyright 2022 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import sys
+
+# Provides `local_response_normalization`, as imported by `vgg`.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir, 'alexnet'))
+
+from local_response_normalization import LocalResponseNormalization
+import vgg
+
+import tensorflow as tf
+from tensorflow import keras
+import unittest
+
+
+class VGGTest(unittest.TestCase):
+
+    def lrn_layers(self, model):
+        return [layer for layer in model.layers
+                if isinstance(layer, LocalResponseNormalization)]
+
+    def testModelALRN(self):
+        model = vgg.VGG_A_LRN()
+        self.assertEqual(model.name, f'VGG-{vgg.MODEL_A_LRN}')
+        self.assertEqual(len(self.lrn_layers(model)), 1)
+
+    def testModelAHasNoLRN(self):
+        self.assertEqual(self.lrn_layers(vgg.VGG_A()), [])
+
+    def testMixedPrecision(self):
+        policy = keras.mixed_precision.global_policy().name
+        model = vgg.VGG_A_LRN(precision='mixed_bfloat16')
+        self.assertEqual(keras.mixed_precision.global_policy().name, policy)
+
+        for layer in model.layers[:-1]:
+            self.assertEqual(layer.compute_dtype, 'bfloat16', layer.name)
+        for variable in model.weights:
+            self.assertEqual(variable.dtype, tf.float32, variable.name)
+        self.assertEqual(model(tf.zeros((1, 224, 224, 3))).dtype, tf.float32)
+
+
+if __name__ == '__main__':
+    unittest.main()